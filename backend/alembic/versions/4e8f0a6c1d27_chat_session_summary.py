@@ -0,0 +1,30 @@
+"""chat session rolling summary
+
+Revision ID: 4e8f0a6c1d27
+Revises: 7c41d2e9a8b3
+Create Date: 2026-10-19 11:03:27.540912
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4e8f0a6c1d27'
+down_revision: Union[str, Sequence[str], None] = '7c41d2e9a8b3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('chat_sessions', sa.Column('summary', sa.Text(), nullable=True))
+    op.add_column('chat_sessions', sa.Column('summary_message_count', sa.Integer(), server_default='0', nullable=False))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('chat_sessions', 'summary_message_count')
+    op.drop_column('chat_sessions', 'summary')
@@ -0,0 +1,29 @@
+"""chat messages keyset indexes
+
+Revision ID: 7c41d2e9a8b3
+Revises: 2b6e1046540a
+Create Date: 2026-10-19 09:12:40.118203
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7c41d2e9a8b3'
+down_revision: Union[str, Sequence[str], None] = '2b6e1046540a'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_chat_messages_farm_created_id', 'chat_messages', ['farm_id', 'created_at', 'id'], unique=False)
+    op.create_index('ix_chat_messages_session_created_id', 'chat_messages', ['session_id', 'created_at', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_chat_messages_session_created_id', table_name='chat_messages')
+    op.drop_index('ix_chat_messages_farm_created_id', table_name='chat_messages')
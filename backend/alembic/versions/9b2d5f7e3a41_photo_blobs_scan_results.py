@@ -0,0 +1,47 @@
+"""content-addressed photos and reusable scan results
+
+Revision ID: 9b2d5f7e3a41
+Revises: 4e8f0a6c1d27
+Create Date: 2026-10-19 15:42:08.219374
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9b2d5f7e3a41'
+down_revision: Union[str, Sequence[str], None] = '4e8f0a6c1d27'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('photo_blobs',
+    sa.Column('sha256', sa.String(), nullable=False),
+    sa.Column('path', sa.String(), nullable=False),
+    sa.Column('mime_type', sa.String(), nullable=False),
+    sa.Column('size', sa.Integer(), nullable=False),
+    sa.Column('ref_count', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=True),
+    sa.PrimaryKeyConstraint('sha256')
+    )
+    op.create_table('scan_results',
+    sa.Column('id', sa.String(), nullable=False),
+    sa.Column('sha256', sa.String(), nullable=False),
+    sa.Column('lang', sa.String(), nullable=False),
+    sa.Column('model_version', sa.String(), nullable=False),
+    sa.Column('result', sa.Text(), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('sha256', 'lang', 'model_version', name='uq_scan_results_sha256_lang_model')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('scan_results')
+    op.drop_table('photo_blobs')
@@ -0,0 +1,28 @@
+"""perceptual hash on photo blobs
+
+Revision ID: c3a7e9f1b254
+Revises: 9b2d5f7e3a41
+Create Date: 2026-10-19 17:20:51.604183
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c3a7e9f1b254'
+down_revision: Union[str, Sequence[str], None] = '9b2d5f7e3a41'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('photo_blobs', sa.Column('dhash', sa.String(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('photo_blobs', 'dhash')
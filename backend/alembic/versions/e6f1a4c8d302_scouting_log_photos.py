@@ -0,0 +1,47 @@
+"""every photo of a scouting log
+
+Revision ID: e6f1a4c8d302
+Revises: c3a7e9f1b254
+Create Date: 2026-10-19 22:14:05.317026
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e6f1a4c8d302'
+down_revision: Union[str, Sequence[str], None] = 'c3a7e9f1b254'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('scouting_log_photos',
+    sa.Column('scouting_log_id', sa.String(), nullable=False),
+    sa.Column('sha256', sa.String(), nullable=False),
+    sa.Column('position', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['scouting_log_id'], ['scouting_logs.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['sha256'], ['photo_blobs.sha256'], ),
+    sa.PrimaryKeyConstraint('scouting_log_id', 'sha256')
+    )
+    op.create_index(op.f('ix_scouting_log_photos_sha256'), 'scouting_log_photos', ['sha256'], unique=False)
+    # Existing logs only recorded their first photo
+    op.execute(
+        "INSERT INTO scouting_log_photos (scouting_log_id, sha256, position) "
+        "SELECT scouting_logs.id, photo_blobs.sha256, 0 FROM scouting_logs "
+        "JOIN photo_blobs ON photo_blobs.path = scouting_logs.photo_path"
+    )
+    op.execute(
+        "UPDATE photo_blobs SET ref_count = "
+        "(SELECT COUNT(*) FROM scouting_log_photos WHERE scouting_log_photos.sha256 = photo_blobs.sha256)"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_scouting_log_photos_sha256'), table_name='scouting_log_photos')
+    op.drop_table('scouting_log_photos')
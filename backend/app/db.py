@@ -1,4 +1,5 @@
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.orm import sessionmaker, declarative_base
 import os
 from dotenv import load_dotenv
@@ -28,6 +29,21 @@ else:
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
+# Async engine for async def routes, so queries don't block the event loop
+# sqlite:// -> sqlite+aiosqlite://, postgresql:// -> postgresql+asyncpg://
+if DATABASE_URL.startswith("sqlite:"):
+    ASYNC_DATABASE_URL = DATABASE_URL.replace("sqlite:", "sqlite+aiosqlite:", 1)
+    async_engine = create_async_engine(ASYNC_DATABASE_URL)
+else:
+    ASYNC_DATABASE_URL = DATABASE_URL.replace("postgresql:", "postgresql+asyncpg:", 1).replace("postgresql+psycopg2:", "postgresql+asyncpg:", 1)
+    async_engine = create_async_engine(
+        ASYNC_DATABASE_URL,
+        pool_pre_ping=True
+    )
+
+# expire_on_commit=False: async sessions can't lazy-load attributes after commit
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
 def get_db():
     db = SessionLocal()
     try:
@@ -35,8 +51,16 @@ def get_db():
     finally:
         db.close()
 
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
 def init_db():
     """Initialize database tables"""
     from app.models import Farm, Block, ScoutingLog, IrrigationLog, BrixSample, SprayLog, CropStatus
     Base.metadata.create_all(bind=engine)
 
+async def close_db():
+    """Dispose pooled async connections (called on app shutdown)"""
+    await async_engine.dispose()
+
@@ -1,7 +1,11 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from app.db import init_db
-from app.routers import farms, blocks, logs, weather, plan, geocoding, status, ai, scan, chat
+from app.db import init_db, close_db
+from app.services.llm_gateway import llm
+from app.services.llm_cache import llm_cache
+from app.services.write_behind import write_behind
+from app.services.image_pipeline import image_pipeline
+from app.routers import farms, blocks, logs, weather, plan, geocoding, status, ai, scan, chat, photos, diagnostics
 import os
 from dotenv import load_dotenv
 
@@ -22,6 +26,17 @@ app.add_middleware(
 @app.on_event("startup")
 async def startup_event():
     init_db()
+    await llm.start()
+    await write_behind.start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await llm.close()
+    llm_cache.close()
+    image_pipeline.close()
+    # Pending chat writes must land before the engine is disposed
+    await write_behind.close()
+    await close_db()
 
 # Include routers
 app.include_router(farms.router, prefix="/api/farms", tags=["farms"])
@@ -34,6 +49,8 @@ app.include_router(status.router, prefix="/api/status", tags=["status"])
 app.include_router(ai.router, prefix="/api/ai", tags=["ai"])
 app.include_router(scan.router, prefix="/api", tags=["scan"])
 app.include_router(chat.router, prefix="/api", tags=["chat"])
+app.include_router(photos.router, prefix="/api/photos", tags=["photos"])
+app.include_router(diagnostics.router, prefix="/api/diagnostics", tags=["diagnostics"])
 
 @app.get("/health")
 async def health():
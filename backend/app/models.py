@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Float, Integer, DateTime, ForeignKey, Text, Boolean, Index
+from sqlalchemy import Column, String, Float, Integer, DateTime, ForeignKey, Text, Boolean, Index, UniqueConstraint
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.db import Base
@@ -109,6 +109,8 @@ class ChatSession(Base):
     id = Column(String, primary_key=True, default=generate_uuid)
     farm_id = Column(String, ForeignKey("farms.id"), nullable=False, index=True)
     title = Column(String, nullable=True)
+    summary = Column(Text, nullable=True)  # Rolling summary of older messages
+    summary_message_count = Column(Integer, nullable=False, default=0, server_default="0")  # Messages covered by summary
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
     
@@ -127,4 +129,43 @@ class ChatMessage(Base):
     
     # Relationships
     session = relationship("ChatSession", back_populates="messages")
+    
+    # Keyset pagination for history (latest first, stable by id)
+    __table_args__ = (
+        Index("ix_chat_messages_farm_created_id", "farm_id", "created_at", "id"),
+        Index("ix_chat_messages_session_created_id", "session_id", "created_at", "id"),
+    )
+
+class PhotoBlob(Base):
+    __tablename__ = "photo_blobs"
+    
+    # Uploads are stored once per content hash and shared by every scan of the same photo
+    sha256 = Column(String, primary_key=True)
+    path = Column(String, nullable=False)  # e.g. uploads/<sha256>.jpg
+    mime_type = Column(String, nullable=False)
+    size = Column(Integer, nullable=False)
+    ref_count = Column(Integer, nullable=False, default=0, server_default="0")  # Scouting logs using this photo
+    dhash = Column(String, nullable=True)  # 64-bit perceptual hash (hex), for near-duplicate scans
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+class ScoutingLogPhoto(Base):
+    __tablename__ = "scouting_log_photos"
+    
+    # Every photo of a scan (a batch has several; the log's photo_path is the first)
+    scouting_log_id = Column(String, ForeignKey("scouting_logs.id", ondelete="CASCADE"), primary_key=True)
+    sha256 = Column(String, ForeignKey("photo_blobs.sha256"), primary_key=True, index=True)
+    position = Column(Integer, nullable=False, default=0)
 
+class ScanResult(Base):
+    __tablename__ = "scan_results"
+    
+    id = Column(String, primary_key=True, default=generate_uuid)
+    sha256 = Column(String, nullable=False)
+    lang = Column(String, nullable=False)
+    model_version = Column(String, nullable=False)  # Vision model + prompt version
+    result = Column(Text, nullable=False)  # JSON: stage, issues, summary, next_actions
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    
+    __table_args__ = (
+        UniqueConstraint("sha256", "lang", "model_version", name="uq_scan_results_sha256_lang_model"),
+    )
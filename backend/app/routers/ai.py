@@ -1,23 +1,23 @@
 from fastapi import APIRouter, Depends, Query, HTTPException
-from sqlalchemy.orm import Session
-from app.db import get_db
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db import get_async_db
 from app.models import Farm, CropStatus, ScoutingLog, IrrigationLog
 from app.services.weather_service import get_forecast
+from app.services.jobs import jobs
+from app.services.llm_gateway import llm, estimate_tokens
+from app.services.llm_cache import llm_cache
+from app.services.model_router import model_router
+from app.services.admission import admission
+from app.services.prompt_context import prompt_stats
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional
-import os
 import json
 import logging
+import time
 
 logger = logging.getLogger(__name__)
 
-try:
-    from openai import AsyncOpenAI
-    OPENAI_AVAILABLE = True
-except ImportError:
-    OPENAI_AVAILABLE = False
-    logger.warning("OpenAI SDK not available. Install with: pip install openai")
-
 router = APIRouter()
 
 # Simple in-memory cache (6 hours TTL)
@@ -116,21 +116,13 @@ def get_rule_based_advice(farm: Farm, latest_status: Optional[CropStatus], forec
 
 async def get_ai_advice(farm: Farm, latest_status: Optional[CropStatus], forecast: Dict, tasks: List[Dict], lang: str) -> Optional[Dict]:
     """Call OpenAI API to generate advice using the latest model"""
-    if not OPENAI_AVAILABLE:
-        logger.info("AI advice: OpenAI SDK not available, using fallback")
-        return None
-    
-    api_key = os.getenv("OPENAI_API_KEY")
-    if not api_key:
-        logger.info("AI advice: OPENAI_API_KEY not set, using fallback")
+    if not llm.available:
+        logger.info("AI advice: OpenAI SDK or OPENAI_API_KEY not available, using fallback")
         return None
     
-    # Get model from env var, default to gpt-5.2
-    model = os.getenv("OPENAI_MODEL", "gpt-5.2")
-    logger.info(f"AI advice: Using model {model} for farm {farm.id}")
-    
     # Prepare context
     context_parts = []
+    issues = []
     
     # Farm info
     context_parts.append(f"Farm location: {farm.lat}, {farm.lon}")
@@ -180,6 +172,11 @@ async def get_ai_advice(farm: Farm, latest_status: Optional[CropStatus], forecas
     
     context = "\n".join(context_parts)
     
+    # Routine weeks use the fast tier; flagged issues need the quality tier
+    decision = model_router.route_advice(issues, tasks)
+    model = decision.model
+    logger.info(f"AI advice: Using model {model} ({decision.tier} tier, {decision.reason}) for farm {farm.id}")
+    
     # Language mapping
     lang_map = {
         "en": "English",
@@ -218,21 +215,32 @@ Example format:
 }}
 """
     
+    system_message = "You are a helpful agricultural advisor. Always respond with valid JSON only."
+    prompt_stats.record("advice", estimate_tokens(system_message, prompt), estimate_tokens(context))
+    
+    # Farms in the same region and stage often produce identical prompts.
+    # Keys are per model: an escalated reply is stored under the quality model's key
+    cached = await llm_cache.get("advice", llm_cache.make_key(model, system_message, prompt, lang))
+    if not cached and decision.can_escalate:
+        cached = await llm_cache.get("advice", llm_cache.make_key(decision.escalate().model, system_message, prompt, lang))
+    if cached:
+        return json.loads(cached)
+    
     # Retry logic for JSON parsing
     max_retries = 2
     for attempt in range(max_retries):
+        started = time.perf_counter()
         try:
-            client = AsyncOpenAI(api_key=api_key)
-            
             # On retry, add stricter JSON instruction
-            system_message = "You are a helpful agricultural advisor. Always respond with valid JSON only."
             user_message = prompt
             if attempt > 0:
                 user_message = prompt + "\n\nIMPORTANT: Return ONLY valid JSON. Do not include any text before or after the JSON object."
             
             # Use Responses API
-            response = await client.responses.create(
-                model=model,
+            response = await llm.responses_create(
+                "advice",
+                estimate_tokens(system_message, user_message) + 300,
+                model=decision.model,
                 input=[
                     {"role": "system", "content": system_message},
                     {"role": "user", "content": user_message}
@@ -259,34 +267,113 @@ Example format:
             if "summary" not in result or "bullets" not in result:
                 raise ValueError("Invalid response format: missing 'summary' or 'bullets'")
             
-            logger.info(f"AI advice: Successfully generated advice using {model}")
-            return {
+            model_router.record("advice", decision, time.perf_counter() - started, True)
+            logger.info(f"AI advice: Successfully generated advice using {decision.model}")
+            advice = {
                 "summary": result["summary"][:200],
                 "bullets": result["bullets"][:6]
             }
+            await llm_cache.set("advice", llm_cache.make_key(decision.model, system_message, prompt, lang), json.dumps(advice))
+            return advice
             
         except json.JSONDecodeError as e:
+            model_router.record("advice", decision, time.perf_counter() - started, False)
             logger.warning(f"AI advice: JSON decode error on attempt {attempt + 1}: {e}")
             if attempt < max_retries - 1:
+                # Retry on the quality tier if the fast model could not produce valid JSON
+                if decision.can_escalate:
+                    model_router.record_escalation("advice", decision)
+                    decision = decision.escalate()
                 continue
             else:
                 logger.error(f"AI advice: Failed to parse JSON after {max_retries} attempts")
                 return None
         except Exception as e:
+            model_router.record("advice", decision, time.perf_counter() - started, False)
             logger.error(f"OpenAI API error: {e}")
             return None
     
     return None
 
+async def _load_advice_inputs(farm: Farm, db: AsyncSession):
+    """Gather latest status, forecast and a simple task summary for advice"""
+    # Get latest status
+    latest_status = (await db.execute(
+        select(CropStatus).where(
+            CropStatus.farm_id == farm.id
+        ).order_by(CropStatus.recorded_at.desc()).limit(1)
+    )).scalars().first()
+    
+    # Get weather forecast
+    forecast = await get_forecast(farm.lat, farm.lon, days=7)
+    
+    # Get recent activity for context
+    seven_days_ago = datetime.now() - timedelta(days=7)
+    recent_scouting_count = (await db.execute(
+        select(func.count()).select_from(ScoutingLog).where(
+            ScoutingLog.farm_id == farm.id,
+            ScoutingLog.observed_at >= seven_days_ago
+        )
+    )).scalar_one()
+    recent_irrigation_count = (await db.execute(
+        select(func.count()).select_from(IrrigationLog).where(
+            IrrigationLog.farm_id == farm.id,
+            IrrigationLog.irrigated_at >= seven_days_ago
+        )
+    )).scalar_one()
+    
+    # Create simple task summary for context
+    tasks = []
+    if recent_scouting_count == 0:
+        tasks.append({"title": "Perform field scouting", "priority": "high"})
+    if recent_irrigation_count == 0:
+        tasks.append({"title": "Check irrigation needs", "priority": "medium"})
+    
+    return latest_status, forecast, tasks
+
+async def _generate_advice_job(cache_key: str, farm: Farm, latest_status: Optional[CropStatus], forecast: Dict, tasks: List[Dict], lang: str, fallback: Dict) -> Dict:
+    """Background worker: produce AI advice and cache it for subsequent loads
+    
+    Admitted like the sync path: under LLM backpressure the job finishes
+    with the rule-based advice, uncached, so a later load can still get AI
+    advice.
+    """
+    if llm.available and not admission.admit("advice"):
+        logger.info(f"AI advice: Background job shed under backpressure for farm {farm.id}")
+        return {**fallback, "source": "rule_based", "degraded": True}
+    
+    started = time.perf_counter()
+    try:
+        advice = await get_ai_advice(farm, latest_status, forecast, tasks, lang)
+    finally:
+        if llm.available:
+            admission.release("advice", time.perf_counter() - started)
+    
+    if not advice:
+        logger.info(f"AI advice: Background job fell back to rule-based advice for farm {farm.id}")
+        advice = {**fallback, "source": "rule_based"}
+    else:
+        logger.info(f"AI advice: Background job generated AI advice for farm {farm.id}")
+        advice = {**advice, "source": "ai"}
+    
+    cache.set(cache_key, advice)
+    return advice
+
 @router.post("/weekly-advice")
 async def get_weekly_advice(
     farm_id: str = Query(...),
-    db: Session = Depends(get_db)
+    mode: str = Query("sync", pattern="^(sync|async)$"),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Generate AI weekly advice for a farm"""
+    """Generate AI weekly advice for a farm
+    
+    mode=async returns rule-based advice immediately together with a job_id;
+    the AI version is produced in the background and can be fetched from
+    GET /weekly-advice/jobs/{job_id} (it is also cached for later loads).
+    """
     
     # Get farm first (needed for language and validation)
-    farm = db.query(Farm).filter(Farm.id == farm_id).first()
+    farm = await db.get(Farm, farm_id)
     if not farm:
         raise HTTPException(status_code=404, detail="Farm not found")
     
@@ -299,34 +386,35 @@ async def get_weekly_advice(
     if cached:
         return cached
     
-    # Get latest status
-    latest_status = db.query(CropStatus).filter(
-        CropStatus.farm_id == farm_id
-    ).order_by(CropStatus.recorded_at.desc()).first()
-    
-    # Get weather forecast
-    forecast = await get_forecast(farm.lat, farm.lon, days=7)
+    latest_status, forecast, tasks = await _load_advice_inputs(farm, db)
     
-    # Get recent activity for context
-    seven_days_ago = datetime.now() - timedelta(days=7)
-    recent_scouting_count = db.query(ScoutingLog).filter(
-        ScoutingLog.farm_id == farm_id,
-        ScoutingLog.observed_at >= seven_days_ago
-    ).count()
-    recent_irrigation_count = db.query(IrrigationLog).filter(
-        IrrigationLog.farm_id == farm_id,
-        IrrigationLog.irrigated_at >= seven_days_ago
-    ).count()
+    if mode == "async":
+        advice = get_rule_based_advice(farm, latest_status, forecast, tasks, lang)
+        
+        # Reuse an in-flight job for this farm instead of starting another LLM call
+        job_id = jobs.find_pending(cache_key)
+        if not job_id:
+            job_id = jobs.submit(
+                "weekly_advice",
+                _generate_advice_job(cache_key, farm, latest_status, forecast, tasks, lang, advice),
+                key=cache_key
+            )
+            logger.info(f"AI advice: Started background job {job_id} for farm {farm_id}")
+        
+        return {**advice, "source": "rule_based", "job_id": job_id, "status": "pending"}
     
-    # Create simple task summary for context
-    tasks = []
-    if recent_scouting_count == 0:
-        tasks.append({"title": "Perform field scouting", "priority": "high"})
-    if recent_irrigation_count == 0:
-        tasks.append({"title": "Check irrigation needs", "priority": "medium"})
+    # Under LLM backpressure serve rule-based advice now (not cached, so AI advice follows later)
+    if llm.available and not admission.admit("advice"):
+        advice = get_rule_based_advice(farm, latest_status, forecast, tasks, lang)
+        return {**advice, "degraded": True}
     
     # Try AI first, fallback to rule-based
-    advice = await get_ai_advice(farm, latest_status, forecast, tasks, lang)
+    started = time.perf_counter()
+    try:
+        advice = await get_ai_advice(farm, latest_status, forecast, tasks, lang)
+    finally:
+        if llm.available:
+            admission.release("advice", time.perf_counter() - started)
     
     if not advice:
         logger.info(f"AI advice: Using rule-based fallback for farm {farm_id}")
@@ -339,3 +427,28 @@ async def get_weekly_advice(
     
     return advice
 
+@router.get("/weekly-advice/jobs/{job_id}")
+async def get_weekly_advice_job(
+    job_id: str,
+    wait: float = Query(0, ge=0, le=30, description="Seconds to long-poll for completion")
+):
+    """Poll a background weekly-advice job"""
+    if wait > 0:
+        job = await jobs.wait(job_id, timeout=wait)
+    else:
+        job = jobs.get(job_id)
+    
+    if not job or job["kind"] != "weekly_advice":
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    return job
+
+@router.get("/llm-metrics")
+async def get_llm_metrics():
+    """Concurrency, queue-wait and service-time metrics for LLM calls, plus cache, routing and admission"""
+    return {
+        **llm.get_metrics(),
+        "cache": llm_cache.get_stats(),
+        "routing": model_router.get_stats(),
+        "admission": admission.get_stats(),
+    }
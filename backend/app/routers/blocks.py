@@ -3,6 +3,9 @@ from sqlalchemy.orm import Session
 from app.db import get_db
 from app.models import Block
 from app.schemas import BlockCreate, BlockResponse
+from app.services.farm_context_cache import farm_context_cache
+from app.services.farm_retrieval import farm_retrieval
+from app.services.farm_events import farm_events
 from typing import List, Optional
 
 router = APIRouter()
@@ -13,6 +16,9 @@ def create_block(block: BlockCreate, db: Session = Depends(get_db)):
     db.add(db_block)
     db.commit()
     db.refresh(db_block)
+    farm_context_cache.invalidate(db_block.farm_id)
+    farm_retrieval.index_record(db_block)
+    farm_events.publish_record(db_block)
     return db_block
 
 @router.get("", response_model=List[BlockResponse])
@@ -1,31 +1,46 @@
-from fastapi import APIRouter, Depends, Query, HTTPException
-from sqlalchemy.orm import Session
-from app.db import get_db
+from fastapi import APIRouter, Depends, Query, HTTPException, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select, delete, update, or_, and_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db import get_async_db, AsyncSessionLocal
 from app.models import (
     Farm, Block, CropStatus, ScoutingLog, IrrigationLog, BrixSample, ChatMessage, ChatSession
 )
 from app.schemas import ChatMessageRequest, ChatMessageReply, ChatMessageResponse
 from app.services.weather_service import get_forecast
-from datetime import datetime, timedelta
-from typing import Dict, List, Optional
+from app.services.llm_gateway import llm, estimate_tokens
+from app.services.llm_cache import llm_cache
+from app.services.model_router import model_router, RouteDecision
+from app.services.admission import admission
+from app.services.farm_context_cache import farm_context_cache, FarmContextSnapshot
+from app.services.prompt_context import select_sections, build_context_json, prompt_stats, SECTION_PRIORITY
+from app.services import chat_memory
+from app.services.farm_retrieval import farm_retrieval
+from app.services.write_behind import write_behind
+from app.services.farm_events import farm_events
+from app.services import intent_router as intents
+from app.services.intent_router import intent_router
+from app.routers.plan import build_today_plan
+from datetime import datetime, timedelta, timezone
+from typing import AsyncIterator, Dict, List, Optional, Tuple
 import os
 import json
+import asyncio
 import logging
+import time
 import uuid
 
 logger = logging.getLogger(__name__)
 
-try:
-    from openai import AsyncOpenAI
-    OPENAI_AVAILABLE = True
-except ImportError:
-    OPENAI_AVAILABLE = False
-    logger.warning("OpenAI SDK not available. Install with: pip install openai")
-
 router = APIRouter()
 
-def build_farm_context(farm: Farm, db: Session) -> Dict:
-    """Build compact context JSON for the AI"""
+# Frames buffered per chat WebSocket before replies wait / pushed updates are dropped
+WS_SEND_QUEUE_SIZE = int(os.getenv("CHAT_WS_SEND_QUEUE", "64"))
+WS_PLAN_DEBOUNCE_SECONDS = 1.0
+
+async def build_farm_context(farm: Farm, db: AsyncSession) -> Dict:
+    """Build compact context JSON for the AI (weather is added per turn)"""
     context = {
         "farm": {
             "name": farm.name or "My Farm",
@@ -37,21 +52,22 @@ def build_farm_context(farm: Farm, db: Session) -> Dict:
         "recent_scouting": [],
         "recent_irrigation": [],
         "recent_brix": [],
-        "last_scan": None,
-        "weather_forecast": None
+        "last_scan": None
     }
     
     # Get main block (first block or "Main Block")
-    main_block = db.query(Block).filter(
-        Block.farm_id == farm.id
-    ).filter(
-        (Block.name == "Main Block") | (Block.name.like("%Main%"))
-    ).first()
+    main_block = (await db.execute(
+        select(Block).where(
+            Block.farm_id == farm.id
+        ).where(
+            (Block.name == "Main Block") | (Block.name.like("%Main%"))
+        ).limit(1)
+    )).scalars().first()
     
     if not main_block:
-        main_block = db.query(Block).filter(
-            Block.farm_id == farm.id
-        ).first()
+        main_block = (await db.execute(
+            select(Block).where(Block.farm_id == farm.id).limit(1)
+        )).scalars().first()
     
     if main_block:
         context["block"] = {
@@ -61,9 +77,11 @@ def build_farm_context(farm: Farm, db: Session) -> Dict:
         }
     
     # Get latest crop status
-    latest_status = db.query(CropStatus).filter(
-        CropStatus.farm_id == farm.id
-    ).order_by(CropStatus.recorded_at.desc()).first()
+    latest_status = (await db.execute(
+        select(CropStatus).where(
+            CropStatus.farm_id == farm.id
+        ).order_by(CropStatus.recorded_at.desc()).limit(1)
+    )).scalars().first()
     
     if latest_status:
         issues = []
@@ -88,9 +106,11 @@ def build_farm_context(farm: Farm, db: Session) -> Dict:
         }
     
     # Get last 5 scouting logs
-    scouting_logs = db.query(ScoutingLog).filter(
-        ScoutingLog.farm_id == farm.id
-    ).order_by(ScoutingLog.observed_at.desc()).limit(5).all()
+    scouting_logs = (await db.execute(
+        select(ScoutingLog).where(
+            ScoutingLog.farm_id == farm.id
+        ).order_by(ScoutingLog.observed_at.desc()).limit(5)
+    )).scalars().all()
     
     context["recent_scouting"] = [
         {
@@ -104,10 +124,12 @@ def build_farm_context(farm: Farm, db: Session) -> Dict:
     ]
     
     # Get last scan result (most recent scouting log with photo)
-    last_scan_log = db.query(ScoutingLog).filter(
-        ScoutingLog.farm_id == farm.id,
-        ScoutingLog.photo_path.isnot(None)
-    ).order_by(ScoutingLog.observed_at.desc()).first()
+    last_scan_log = (await db.execute(
+        select(ScoutingLog).where(
+            ScoutingLog.farm_id == farm.id,
+            ScoutingLog.photo_path.isnot(None)
+        ).order_by(ScoutingLog.observed_at.desc()).limit(1)
+    )).scalars().first()
     
     if last_scan_log:
         context["last_scan"] = {
@@ -118,9 +140,11 @@ def build_farm_context(farm: Farm, db: Session) -> Dict:
         }
     
     # Get last 5 irrigation logs
-    irrigation_logs = db.query(IrrigationLog).filter(
-        IrrigationLog.farm_id == farm.id
-    ).order_by(IrrigationLog.irrigated_at.desc()).limit(5).all()
+    irrigation_logs = (await db.execute(
+        select(IrrigationLog).where(
+            IrrigationLog.farm_id == farm.id
+        ).order_by(IrrigationLog.irrigated_at.desc()).limit(5)
+    )).scalars().all()
     
     context["recent_irrigation"] = [
         {
@@ -132,9 +156,11 @@ def build_farm_context(farm: Farm, db: Session) -> Dict:
     ]
     
     # Get last 3 brix samples
-    brix_samples = db.query(BrixSample).filter(
-        BrixSample.farm_id == farm.id
-    ).order_by(BrixSample.sampled_at.desc()).limit(3).all()
+    brix_samples = (await db.execute(
+        select(BrixSample).where(
+            BrixSample.farm_id == farm.id
+        ).order_by(BrixSample.sampled_at.desc()).limit(3)
+    )).scalars().all()
     
     context["recent_brix"] = [
         {
@@ -146,17 +172,23 @@ def build_farm_context(farm: Farm, db: Session) -> Dict:
     
     return context
 
-async def get_ai_reply(user_message: str, farm_context: Dict, lang: str) -> Optional[str]:
-    """Get AI reply using OpenAI Responses API"""
-    if not OPENAI_AVAILABLE:
-        return None
-    
-    api_key = os.getenv("OPENAI_API_KEY")
-    if not api_key:
-        return None
-    
-    model = os.getenv("OPENAI_MODEL", "gpt-5.2")
+def needs_farm_context(user_message: str) -> bool:
+    """Only include context if the question seems to need it"""
+    return bool(select_sections(user_message))
+
+def build_chat_prompt(
+    user_message: str,
+    farm_context: Dict,
+    lang: str,
+    context_json: Optional[str] = None,
+    history: Optional[str] = None
+) -> Tuple[str, str]:
+    """Build the (system, user) messages for a chat turn
     
+    context_json, when given, is the already-serialised (and budgeted)
+    farm context; otherwise the relevant sections of farm_context are encoded.
+    history is the session summary plus recent turns (see chat_memory).
+    """
     # Language mapping
     lang_map = {
         "en": "English",
@@ -166,11 +198,8 @@ async def get_ai_reply(user_message: str, farm_context: Dict, lang: str) -> Opti
     }
     language = lang_map.get(lang, "English")
     
-    try:
-        client = AsyncOpenAI(api_key=api_key)
-        
-        # Build system message
-        system_message = f"""You are TableGrape Agent, a friendly and helpful assistant for table grape farmers. Be warm, conversational, and human-like.
+    # Build system message
+    system_message = f"""You are TableGrape Agent, a friendly and helpful assistant for table grape farmers. Be warm, conversational, and human-like.
 
 STYLE RULES:
 - Keep answers 2-6 lines by default (unless user asks for detail)
@@ -192,30 +221,121 @@ SAFETY RULES:
 - DO provide general advice like: "consult local agri officer", "monitor for issues", "improve airflow", "avoid irrigating before heavy rain"
 
 Respond in {language} language. Keep it friendly, concise, and practical."""
-        
-        # Build user message with context (only include relevant context)
-        # Only include context if the question seems to need it
-        needs_context = any(keyword in user_message.lower() for keyword in [
-            "stage", "status", "weather", "forecast", "irrigation", "spray", 
-            "issue", "problem", "mildew", "sunburn", "crack", "pest", "brix",
-            "harvest", "variety", "block", "farm"
-        ])
-        
-        if needs_context:
-            context_json = json.dumps(farm_context, indent=2)
-            user_message_with_context = f"""Farm context (use only if relevant):
+    
+    # Earlier turns let follow-up questions ("and tomorrow?") make sense
+    conversation = f"""Conversation so far:
+{history}
+
+""" if history else ""
+    
+    # Build user message with context (only include relevant context)
+    context_tokens = 0
+    sections = select_sections(user_message)
+    if sections or context_json:
+        if context_json is None:
+            context_json, context_tokens = build_context_json(farm_context or {}, sections)
+        else:
+            context_tokens = estimate_tokens(context_json)
+        user_message_with_context = f"""Farm context (use only if relevant):
 {context_json}
 
-User question: {user_message}
+{conversation}User question: {user_message}
 
 Answer naturally and concisely in {language}."""
-        else:
-            user_message_with_context = f"""User question: {user_message}
+    else:
+        user_message_with_context = f"""{conversation}User question: {user_message}
 
 Answer naturally and concisely in {language}."""
+    
+    prompt_stats.record("chat", estimate_tokens(system_message, user_message_with_context), context_tokens)
+    return system_message, user_message_with_context
+
+async def get_ai_reply(
+    user_message: str,
+    farm_context: Dict,
+    lang: str,
+    context_json: Optional[str] = None,
+    history: Optional[str] = None
+) -> Optional[str]:
+    """Get AI reply using OpenAI Responses API"""
+    if not llm.available:
+        return None
+    
+    try:
+        system_message, user_message_with_context = build_chat_prompt(user_message, farm_context, lang, context_json, history)
+        
+        # Simple questions go to the fast tier; fall back to the quality tier if it fails
+        decision = model_router.route_chat(user_message, needs_farm_context(user_message))
+        reply = await _create_reply(decision, system_message, user_message_with_context, lang)
+        if not reply and decision.can_escalate:
+            model_router.record_escalation("chat", decision)
+            reply = await _create_reply(decision.escalate(), system_message, user_message_with_context, lang)
+        return reply
         
+    except Exception as e:
+        logger.error(f"OpenAI API error: {e}")
+        return None
+
+async def stream_ai_reply(
+    user_message: str,
+    farm_context: Dict,
+    lang: str,
+    context_json: Optional[str] = None,
+    history: Optional[str] = None
+) -> AsyncIterator[str]:
+    """Yield AI reply text as the model produces it (yields nothing on failure)"""
+    if not llm.available:
+        return
+    
+    system_message, user_message_with_context = build_chat_prompt(user_message, farm_context, lang, context_json, history)
+    decision = model_router.route_chat(user_message, needs_farm_context(user_message))
+    
+    cache_key = llm_cache.make_key(decision.model, system_message, user_message_with_context, lang)
+    cached = await llm_cache.get("chat", cache_key)
+    if cached:
+        yield cached
+        return
+    
+    started = time.perf_counter()
+    parts = []
+    try:
+        async for delta in llm.responses_stream(
+            "chat",
+            estimate_tokens(system_message, user_message_with_context) + 300,
+            model=decision.model,
+            input=[
+                {"role": "system", "content": system_message},
+                {"role": "user", "content": user_message_with_context}
+            ],
+            max_output_tokens=300
+        ):
+            parts.append(delta)
+            yield delta
+    except Exception as e:
+        logger.error(f"OpenAI streaming error ({decision.tier} tier, {decision.model}): {e}")
+    finally:
+        model_router.record("chat", decision, time.perf_counter() - started, bool(parts))
+    
+    reply = "".join(parts).strip()
+    if reply:
+        logger.info(f"Chat: Streamed reply using {decision.model} ({decision.tier} tier, {decision.reason})")
+        await llm_cache.set("chat", cache_key, reply)
+
+async def _create_reply(decision: RouteDecision, system_message: str, user_message_with_context: str, lang: str) -> Optional[str]:
+    """Call the routed model (via the response cache) and record tier stats"""
+    model = decision.model
+    cache_key = llm_cache.make_key(model, system_message, user_message_with_context, lang)
+    cached = await llm_cache.get("chat", cache_key)
+    if cached:
+        return cached
+    
+    started = time.perf_counter()
+    reply = None
+    try:
         # Use Responses API (text-only, not JSON mode)
-        response = await client.responses.create(
+        response = await llm.responses_create(
+            "chat",
+            estimate_tokens(system_message, user_message_with_context) + 300,
             model=model,
             input=[
                 {"role": "system", "content": system_message},
@@ -223,50 +343,16 @@ Answer naturally and concisely in {language}."""
             ],
             max_output_tokens=300
         )
-        
         reply = response.output_text.strip()
-        logger.info(f"Chat: Successfully generated reply using {model}")
-        return reply
-        
     except Exception as e:
-        logger.error(f"OpenAI API error: {e}")
-        return None
-
-def is_greeting(text: str) -> bool:
-    """Check if the text is a greeting"""
-    if not text:
-        return False
-    
-    # Normalize: lowercase and strip
-    normalized = text.lower().strip()
-    
-    # Must be short (<= 20 chars)
-    if len(normalized) > 20:
-        return False
-    
-    # Common greetings in English, Hindi, Spanish, Marathi
-    greetings = {
-        # English
-        "hi", "hello", "hey", "namaste", "good morning", "good evening", 
-        "good afternoon", "good night", "greetings", "hi there", "hey there",
-        # Hindi
-        "हाय", "नमस्ते", "नमस्कार", "नमस्कार", "प्रणाम",
-        # Spanish
-        "hola", "buenos días", "buenas tardes", "buenas noches", "saludos",
-        # Marathi
-        "नमस्कार", "हॅलो", "हाय"
-    }
+        logger.error(f"OpenAI API error ({decision.tier} tier, {model}): {e}")
+    finally:
+        model_router.record("chat", decision, time.perf_counter() - started, bool(reply))
     
-    # Check exact match
-    if normalized in greetings:
-        return True
-    
-    # Check if it starts with a greeting (e.g., "hi there", "hello friend")
-    for greeting in greetings:
-        if normalized.startswith(greeting + " ") or normalized == greeting:
-            return True
-    
-    return False
+    if reply:
+        logger.info(f"Chat: Successfully generated reply using {model} ({decision.tier} tier, {decision.reason})")
+        await llm_cache.set("chat", cache_key, reply)
+    return reply or None
 
 def get_greeting_reply(lang: str) -> str:
     """Return a friendly greeting reply with options"""
@@ -303,41 +389,6 @@ How can I help you today?
 • Report an issue (cracks / mildew / sunburn)
 • Ask about weather and what to do"""
 
-def is_acknowledgement(text: str) -> bool:
-    """Check if the text is an acknowledgement/small-talk"""
-    if not text:
-        return False
-    
-    # Normalize: lowercase and strip
-    normalized = text.lower().strip()
-    
-    # Must be short (<= 20 chars)
-    if len(normalized) > 20:
-        return False
-    
-    # Common acknowledgements
-    acknowledgements = {
-        "ok", "okay", "kk", "k", "sure", "cool", "great", "nice", 
-        "thanks", "thank you", "thx", "ty", "👍", "👌", 
-        "hmm", "hmmm", "yes", "yep"
-    }
-    
-    # Check exact match
-    return normalized in acknowledgements
-
-def is_whats_new(text: str) -> bool:
-    """Check if the text is asking for updates/what's new"""
-    if not text:
-        return False
-    
-    normalized = text.lower().strip()
-    whats_new_phrases = {
-        "what's new", "whats new", "what is new", "update", "updates",
-        "anything new", "what happened", "what changed"
-    }
-    
-    return normalized in whats_new_phrases or normalized.startswith("what's new") or normalized.startswith("whats new")
-
 def get_whats_new_reply(lang: str) -> str:
     """Return a reply with options for 'what's new' queries"""
     if lang == "hi":
@@ -390,148 +441,659 @@ def get_fallback_reply(user_message: str, lang: str) -> str:
 @router.get("/chat/history", response_model=List[ChatMessageResponse])
 async def get_chat_history(
     farm_id: str = Query(...),
+    session_id: Optional[str] = Query(None, description="Only messages from this chat session"),
     limit: int = Query(30, ge=1, le=100),
-    db: Session = Depends(get_db)
+    before: Optional[str] = Query(None, description="Message id cursor: return messages older than this one"),
+    after: Optional[str] = Query(None, description="Message id cursor: return messages newer than this one"),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Get chat message history for a farm"""
+    """Get chat message history for a farm
+    
+    Without a cursor this returns the latest `limit` messages. To page back,
+    pass the id of the first message you have as `before`; to fetch newer
+    messages pass the id of the last one as `after`. Results are always in
+    chronological order (oldest first, stable by ID).
+    """
+    if before and after:
+        raise HTTPException(status_code=400, detail="Use either 'before' or 'after', not both")
     
     # Validate farm
-    farm = db.query(Farm).filter(Farm.id == farm_id).first()
+    farm = await db.get(Farm, farm_id)
     if not farm:
         raise HTTPException(status_code=404, detail="Farm not found")
     
-    # Get messages in chronological order with stable sort
-    messages = db.query(ChatMessage).filter(
-        ChatMessage.farm_id == farm_id
-    ).order_by(ChatMessage.created_at.asc(), ChatMessage.id.asc()).limit(limit).all()
+    # Queued chat writes must be visible to the reader
+    await write_behind.flush()
+    
+    # Lean projection: no ORM identity map work, no lazy attributes
+    query = select(
+        ChatMessage.id, ChatMessage.farm_id, ChatMessage.role, ChatMessage.content, ChatMessage.created_at
+    )
+    query = query.where(ChatMessage.farm_id == farm_id)
+    if session_id:
+        query = query.where(ChatMessage.session_id == session_id)
+    
+    # Keyset cursor on (created_at, id), served by the composite indexes
+    cursor_id = before or after
+    if cursor_id:
+        cursor = (await db.execute(
+            select(ChatMessage.created_at, ChatMessage.id).where(
+                ChatMessage.id == cursor_id,
+                ChatMessage.farm_id == farm_id
+            )
+        )).first()
+        if not cursor:
+            raise HTTPException(status_code=400, detail="Unknown cursor message")
+        if before:
+            query = query.where(or_(
+                ChatMessage.created_at < cursor.created_at,
+                and_(ChatMessage.created_at == cursor.created_at, ChatMessage.id < cursor.id)
+            ))
+        else:
+            query = query.where(or_(
+                ChatMessage.created_at > cursor.created_at,
+                and_(ChatMessage.created_at == cursor.created_at, ChatMessage.id > cursor.id)
+            ))
+    
+    if after:
+        rows = (await db.execute(
+            query.order_by(ChatMessage.created_at.asc(), ChatMessage.id.asc()).limit(limit)
+        )).all()
+    else:
+        # Newest first from the index, then flip to chronological order
+        rows = (await db.execute(
+            query.order_by(ChatMessage.created_at.desc(), ChatMessage.id.desc()).limit(limit)
+        )).all()
+        rows.reverse()
     
     # Normalize roles to lowercase (in case of old data)
-    for msg in messages:
-        if msg.role:
-            msg.role = msg.role.lower()
+    return [
+        ChatMessageResponse(
+            id=row.id,
+            farm_id=row.farm_id,
+            role=(row.role or "").lower(),
+            content=row.content,
+            created_at=row.created_at
+        )
+        for row in rows
+    ]
+
+async def get_local_reply(message: str, farm: Farm, db: AsyncSession, lang: str) -> Optional[str]:
+    """Answer small talk and simple farm lookups without the LLM
+    
+    Greetings, acknowledgements and "what's new" get a fixed reply; weather,
+    today's plan, latest status and last scan are answered from the cached
+    forecast and farm snapshot. Returns None when the message (or missing
+    data) needs the LLM.
+    """
+    intent = intent_router.match(message)
+    if intent is None:
+        return None
+    logger.info(f"Chat: Detected local intent '{intent}'")
+    
+    if intent == intents.WHATS_NEW:
+        return get_whats_new_reply(lang)
+    if intent == intents.ACKNOWLEDGEMENT:
+        return get_ack_reply(lang)
+    if intent == intents.GREETING:
+        return get_greeting_reply(lang)
+    if intent == intents.WEATHER:
+        return get_weather_reply(await get_weather_context(farm), lang)
+    if intent == intents.TODAY_PLAN:
+        try:
+            plan = await build_today_plan(farm, db)
+        except Exception as e:
+            logger.warning(f"Error building today's plan for chat: {e}")
+            return None
+        return get_plan_reply(plan, lang)
     
-    # Return in chronological order (oldest first, stable by ID)
-    return messages
+    snapshot = await get_farm_snapshot(farm, db)
+    if intent == intents.LATEST_STATUS:
+        return get_status_reply(snapshot.context.get("latest_status"), lang)
+    if intent == intents.LAST_SCAN:
+        return get_last_scan_reply(snapshot.context.get("last_scan"), lang)
+    return None
 
-@router.post("/chat/message", response_model=ChatMessageReply)
-async def send_message(
-    request: ChatMessageRequest,
-    db: Session = Depends(get_db)
-):
-    """Send a message and get AI reply"""
+LOCAL_REPLY_TEXT = {
+    "en": {
+        "today": "Today", "tomorrow": "Tomorrow", "rain_days": "Rain expected on",
+        "no_rain": "No significant rain in the next 7 days.",
+        "plan": "Today's plan:", "no_tasks": "No tasks for today. Everything looks up to date.",
+        "stage": "Current stage", "brix": "Brix", "issues": "Issues", "no_issues": "No issues reported",
+        "recorded": "recorded", "scan": "Last scan", "severity": "severity",
+    },
+    "hi": {
+        "today": "आज", "tomorrow": "कल", "rain_days": "बारिश की संभावना",
+        "no_rain": "अगले 7 दिनों में खास बारिश नहीं।",
+        "plan": "आज की योजना:", "no_tasks": "आज कोई काम नहीं। सब कुछ अद्यतन है।",
+        "stage": "वर्तमान अवस्था", "brix": "ब्रिक्स", "issues": "समस्याएं", "no_issues": "कोई समस्या दर्ज नहीं",
+        "recorded": "दर्ज", "scan": "पिछला स्कैन", "severity": "गंभीरता",
+    },
+    "es": {
+        "today": "Hoy", "tomorrow": "Mañana", "rain_days": "Lluvia prevista el",
+        "no_rain": "Sin lluvia significativa en los próximos 7 días.",
+        "plan": "Plan de hoy:", "no_tasks": "No hay tareas para hoy. Todo está al día.",
+        "stage": "Etapa actual", "brix": "Brix", "issues": "Problemas", "no_issues": "Sin problemas reportados",
+        "recorded": "registrado", "scan": "Último escaneo", "severity": "severidad",
+    },
+    "mr": {
+        "today": "आज", "tomorrow": "उद्या", "rain_days": "पावसाची शक्यता",
+        "no_rain": "पुढील 7 दिवसांत विशेष पाऊस नाही.",
+        "plan": "आजची योजना:", "no_tasks": "आज कोणतेही काम नाही. सर्व काही अद्ययावत आहे.",
+        "stage": "सध्याची अवस्था", "brix": "ब्रिक्स", "issues": "समस्या", "no_issues": "कोणतीही समस्या नोंदवली नाही",
+        "recorded": "नोंद", "scan": "शेवटचा स्कॅन", "severity": "तीव्रता",
+    },
+}
+
+def _local_text(lang: str) -> Dict[str, str]:
+    return LOCAL_REPLY_TEXT.get(lang, LOCAL_REPLY_TEXT["en"])
+
+def _day_line(label: str, day: Dict) -> str:
+    return f"• {label}: {day.get('temp_min')}–{day.get('temp_max')}°C, {day.get('precipitation') or 0:.1f} mm"
+
+def get_weather_reply(weather: Optional[Dict], lang: str) -> Optional[str]:
+    """Today/tomorrow temperatures and rainy days from the 7-day forecast"""
+    days = (weather or {}).get("next_7_days") or []
+    if not days:
+        return None
+    text = _local_text(lang)
+    lines = [_day_line(text["today"], days[0])]
+    if len(days) > 1:
+        lines.append(_day_line(text["tomorrow"], days[1]))
+    rain_days = [day.get("date") for day in days if (day.get("precipitation") or 0) >= 1.0]
+    lines.append(f"{text['rain_days']}: {', '.join(rain_days)}" if rain_days else text["no_rain"])
+    return "\n".join(lines)
+
+def get_plan_reply(plan: Dict, lang: str) -> str:
+    """Top tasks from today's plan"""
+    text = _local_text(lang)
+    tasks = plan.get("tasks") or []
+    if not tasks:
+        return text["no_tasks"]
+    lines = [text["plan"]]
+    for task in tasks[:5]:
+        lines.append(f"• {task['title']} ({task['priority']}) - {task['reason']}")
+    return "\n".join(lines)
+
+def get_status_reply(status: Optional[Dict], lang: str) -> Optional[str]:
+    """Latest crop status check-in"""
+    if not status:
+        return None
+    text = _local_text(lang)
+    lines = [f"{text['stage']}: {status.get('stage')}"]
+    if status.get("brix") is not None:
+        lines.append(f"{text['brix']}: {status['brix']}")
+    issues = status.get("issues") or []
+    lines.append(f"{text['issues']}: {', '.join(issues)}" if issues else text["no_issues"])
+    if status.get("recorded_at"):
+        lines.append(f"({text['recorded']} {status['recorded_at'][:10]})")
+    return "\n".join(lines)
+
+def get_last_scan_reply(scan: Optional[Dict], lang: str) -> Optional[str]:
+    """Most recent photo scan result"""
+    if not scan:
+        return None
+    text = _local_text(lang)
+    date = (scan.get("observed_at") or "")[:10]
+    lines = [f"{text['scan']} ({date}): {scan.get('issue')}, {text['severity']} {scan.get('severity')}/3"]
+    if scan.get("summary"):
+        lines.append(scan["summary"])
+    return "\n".join(lines)
+
+async def _timed(coro) -> Tuple[object, float]:
+    """Await a coroutine and return (result, elapsed milliseconds)"""
+    started = time.perf_counter()
+    result = await coro
+    return result, (time.perf_counter() - started) * 1000
+
+async def get_weather_context(farm: Farm) -> Optional[Dict]:
+    """7-day forecast in the compact shape used by the chat context"""
+    try:
+        forecast = await get_forecast(farm.lat, farm.lon, days=7)
+    except Exception as e:
+        logger.warning(f"Error fetching weather for chat: {e}")
+        return None
+    if not forecast.get("days"):
+        return None
+    return {
+        "next_7_days": [
+            {
+                "date": day.get("date"),
+                "temp_max": day.get("temp_max"),
+                "temp_min": day.get("temp_min"),
+                "precipitation": day.get("precipitation_sum", 0) or 0
+            }
+            for day in forecast["days"][:7]
+        ]
+    }
+
+async def get_farm_snapshot(farm: Farm, db: AsyncSession) -> FarmContextSnapshot:
+    """Cached DB context for a farm (rebuilt after any write to the farm)"""
+    snapshot = farm_context_cache.get(farm.id)
+    if snapshot is None:
+        generation = farm_context_cache.generation(farm.id)
+        snapshot = farm_context_cache.set(farm.id, await build_farm_context(farm, db), generation)
+    return snapshot
+
+async def retrieve_records(farm: Farm, user_message: str, session_id: Optional[str]) -> List[str]:
+    """Farm history snippets for a message ([] if retrieval fails)
+    
+    Uses its own session, so a first-use index build can run alongside
+    the snapshot query on the request's session.
+    """
+    try:
+        async with AsyncSessionLocal() as db:
+            return await farm_retrieval.search(farm, db, user_message, exclude_session=session_id)
+    except Exception as e:
+        logger.warning(f"Farm retrieval failed for farm {farm.id}: {e}")
+        return []
+
+async def build_chat_context(
+    farm: Farm,
+    db: AsyncSession,
+    user_message: str,
+    session_id: Optional[str] = None
+) -> Tuple[Dict, Optional[str]]:
+    """Relevant farm context for an LLM-bound message
+    
+    Returns (context, compact JSON). Only the sections for the message's
+    topics are included, plus "records" retrieved from the farm's full
+    history, trimmed to the context token budget. The forecast is fetched
+    only when weather is relevant. The DB snapshot (usually cached), the
+    forecast fetch and the retrieval search run concurrently.
+    """
+    sections = select_sections(user_message)
+    retrieval = _timed(retrieve_records(farm, user_message, session_id))
+    if not sections:
+        records, retrieval_ms = await retrieval
+        snapshot, context_ms = None, 0.0
+        weather, weather_ms = None, 0.0
+        if not records:
+            logger.info(f"Chat timings for farm {farm.id}: context skipped")
+            return {}, None
+    elif "weather_forecast" in sections:
+        (snapshot, context_ms), (weather, weather_ms), (records, retrieval_ms) = await asyncio.gather(
+            _timed(get_farm_snapshot(farm, db)),
+            _timed(get_weather_context(farm)),
+            retrieval
+        )
+    else:
+        (snapshot, context_ms), (records, retrieval_ms) = await asyncio.gather(
+            _timed(get_farm_snapshot(farm, db)),
+            retrieval
+        )
+        weather, weather_ms = None, 0.0
+    
+    farm_context = {name: snapshot.context.get(name) for name in sections if name != "weather_forecast"}
+    if "weather_forecast" in sections:
+        farm_context["weather_forecast"] = weather
+    if records:
+        farm_context["records"] = records
+        sections = [name for name in SECTION_PRIORITY if name in sections or name == "records"]
+    # Cached per-section JSON is reused; only the weather and records are encoded per turn
+    context_json, context_tokens = build_context_json(farm_context, sections, snapshot.sections if snapshot else None)
+    
+    logger.info(
+        f"Chat timings for farm {farm.id}: context={context_ms:.0f}ms weather={weather_ms:.0f}ms "
+        f"retrieval={retrieval_ms:.0f}ms sections={','.join(sections)} context_tokens={context_tokens}"
+    )
+    return farm_context, context_json
+
+async def ensure_chat_session(db: AsyncSession, farm_id: str, session_id: str):
+    """Create the ChatSession row now, before the (slow) reply
+    
+    Committed straight away so queued write-behind messages always have
+    their session. A concurrent request creating the same new session
+    first is not an error.
+    """
+    db.add(ChatSession(id=session_id, farm_id=farm_id, title=None))
+    try:
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+    else:
+        logger.info(f"Chat: Created ChatSession {session_id} for farm {farm_id}")
+
+def new_turn_rows(farm_id: str, session_id: str, message: str) -> List:
+    """The user message for a turn
+    
+    IDs and explicit microsecond timestamps are set here, so the insert
+    needs no flush/refresh round trips and turns stay in order.
+    """
+    return [ChatMessage(
+        id=str(uuid.uuid4()),
+        farm_id=farm_id,
+        session_id=session_id,
+        role="user",
+        content=message,
+        created_at=datetime.now(timezone.utc)
+    )]
+
+async def start_chat_turn(request: ChatMessageRequest, db: AsyncSession) -> Tuple[Farm, str, str, List]:
+    """Validate the farm, create the session if new and prepare the turn's rows
     
+    Returns (farm, session_id, lang, rows). rows holds the user message;
+    it is written with the reply by save_chat_turn, in one transaction.
+    """
     # Validate farm
-    farm = db.query(Farm).filter(Farm.id == request.farm_id).first()
+    farm = await db.get(Farm, request.farm_id)
     if not farm:
         raise HTTPException(status_code=404, detail="Farm not found")
     
-    # Generate session_id if missing
+    # Generate session_id if missing (a new session needs no lookup)
     session_id = request.session_id
     if not session_id:
         session_id = str(uuid.uuid4())
         logger.info(f"Chat: Generated new session_id {session_id} for farm {request.farm_id}")
-    
-    # Ensure ChatSession exists
-    session = db.query(ChatSession).filter(ChatSession.id == session_id).first()
-    if not session:
-        session = ChatSession(
-            id=session_id,
-            farm_id=request.farm_id,
-            title=None
-        )
-        db.add(session)
-        db.flush()
-        logger.info(f"Chat: Created new ChatSession {session_id} for farm {request.farm_id}")
+    if not request.session_id or await db.get(ChatSession, session_id) is None:
+        await ensure_chat_session(db, request.farm_id, session_id)
     
     # Use farm's preferred language if lang not provided
     lang = request.lang or farm.preferred_language or "en"
     
-    # Save user message first (ensures it gets earlier timestamp/ID)
-    user_msg = ChatMessage(
-        farm_id=request.farm_id,
+    return farm, session_id, lang, new_turn_rows(request.farm_id, session_id, request.message)
+
+def _message_values(message: ChatMessage) -> Dict:
+    return {
+        "id": message.id,
+        "farm_id": message.farm_id,
+        "session_id": message.session_id,
+        "role": message.role,
+        "content": message.content,
+        "created_at": message.created_at,
+    }
+
+async def save_chat_turn(db: AsyncSession, rows: List, farm_id: str, session_id: str, reply_text: str):
+    """Persist the turn: user message and reply in one commit
+    
+    With CHAT_WRITE_BEHIND=1, the user message is still written now, so
+    history reads right after the turn see it; only the reply is queued
+    and inserted in batches across requests (the session row already
+    exists).
+    """
+    reply = ChatMessage(
+        id=str(uuid.uuid4()),
+        farm_id=farm_id,
         session_id=session_id,
-        role="user",
-        content=request.message
+        role="assistant",
+        content=reply_text,
+        created_at=datetime.now(timezone.utc)
     )
-    db.add(user_msg)
-    db.flush()  # Flush to get ID/timestamp before commit
-    db.commit()
-    db.refresh(user_msg)  # Refresh to ensure all fields are populated
+    if write_behind.enabled:
+        db.add_all(rows)
+        await db.commit()
+        write_behind.enqueue(ChatMessage, [_message_values(reply)])
+    else:
+        db.add_all(rows + [reply])
+        await db.commit()
+    
+    for row in rows + [reply]:
+        farm_retrieval.index_record(row)
+    chat_memory.schedule_refresh(session_id)
+
+@router.post("/chat/message", response_model=ChatMessageReply)
+async def send_message(
+    request: ChatMessageRequest,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Send a message and get AI reply"""
+    farm, session_id, lang, rows = await start_chat_turn(request, db)
+    
+    degraded = False
     
     # Check for intent handlers (before building context)
-    # Check if it's asking "what's new"
-    if is_whats_new(request.message):
-        logger.info(f"Chat: Detected 'what's new' query for farm {request.farm_id}")
-        reply_text = get_whats_new_reply(lang)
-    # Check if it's a short acknowledgement with options
-    elif len(request.message.strip()) <= 20 and is_acknowledgement(request.message):
-        logger.info(f"Chat: Detected short acknowledgement for farm {request.farm_id}")
-        reply_text = get_ack_reply(lang)
-    # Check if it's a greeting
-    elif is_greeting(request.message):
-        logger.info(f"Chat: Detected greeting for farm {request.farm_id}")
-        reply_text = get_greeting_reply(lang)
+    reply_text = await get_local_reply(request.message, farm, db, lang)
+    
+    if reply_text:
+        pass
+    elif llm.available and not admission.admit("chat"):
+        # Model is backed up: answer from the fallback now instead of queueing
+        reply_text = get_fallback_reply(request.message, lang)
+        degraded = True
     else:
-        # Build farm context for non-greeting messages
-        farm_context = build_farm_context(farm, db)
-        
-        # Get weather forecast
+        admitted = llm.available
+        started = time.perf_counter()
         try:
-            forecast = await get_forecast(farm.lat, farm.lon, days=7)
-            if forecast.get("days"):
-                farm_context["weather_forecast"] = {
-                    "next_7_days": [
-                        {
-                            "date": day.get("date"),
-                            "temp_max": day.get("temp_max"),
-                            "temp_min": day.get("temp_min"),
-                            "precipitation": day.get("precipitation_sum", 0) or 0
-                        }
-                        for day in forecast["days"][:7]
-                    ]
-                }
-        except Exception as e:
-            logger.warning(f"Error fetching weather for chat: {e}")
-        
-        # Get AI reply
-        reply_text = await get_ai_reply(request.message, farm_context, lang)
+            # Build farm context for non-greeting messages
+            farm_context, context_json = await build_chat_context(farm, db, request.message, session_id)
+            history = await chat_memory.get_history_block(db, session_id)
+            
+            # Get AI reply
+            llm_started = time.perf_counter()
+            reply_text = await get_ai_reply(request.message, farm_context, lang, context_json, history)
+        finally:
+            if admitted:
+                admission.release("chat", time.perf_counter() - started)
+        logger.info(f"Chat timings for farm {request.farm_id}: llm={(time.perf_counter() - llm_started) * 1000:.0f}ms")
         
         if not reply_text:
             logger.info(f"Chat: Using fallback reply for farm {request.farm_id}")
             reply_text = get_fallback_reply(request.message, lang)
     
-    # Save assistant reply (after user message is committed)
-    assistant_msg = ChatMessage(
-        farm_id=request.farm_id,
-        session_id=session_id,
-        role="assistant",
-        content=reply_text
+    await save_chat_turn(db, rows, request.farm_id, session_id, reply_text)
+    
+    return ChatMessageReply(reply=reply_text, session_id=session_id, degraded=degraded)
+
+def _sse(event: str, data: Dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+async def chat_turn_events(
+    farm: Farm,
+    session_id: str,
+    lang: str,
+    rows: List,
+    message: str
+) -> AsyncIterator[Tuple[str, Dict]]:
+    """Run one streamed chat turn: yields ("delta", {"text"}) events, then ("done", {...})
+    
+    Uses its own DB session: an SSE response outlives the request's session
+    and a WebSocket connection outlives any single turn. Local intent
+    replies arrive as a single delta.
+    """
+    async with AsyncSessionLocal() as db:
+        reply_text = await get_local_reply(message, farm, db, lang)
+        degraded = False
+        
+        if reply_text is None and llm.available and not admission.admit("chat"):
+            # Model is backed up: answer from the fallback now instead of queueing
+            reply_text = get_fallback_reply(message, lang)
+            degraded = True
+        
+        if reply_text is None:
+            admitted = llm.available
+            started = time.perf_counter()
+            parts = []
+            try:
+                farm_context, context_json = await build_chat_context(farm, db, message, session_id)
+                history = await chat_memory.get_history_block(db, session_id)
+                async for delta in stream_ai_reply(message, farm_context, lang, context_json, history):
+                    parts.append(delta)
+                    yield "delta", {"text": delta}
+            finally:
+                if admitted:
+                    admission.release("chat", time.perf_counter() - started)
+            reply_text = "".join(parts).strip()
+            if not reply_text:
+                logger.info(f"Chat: Using fallback reply for farm {farm.id}")
+                reply_text = get_fallback_reply(message, lang)
+                yield "delta", {"text": reply_text}
+        else:
+            yield "delta", {"text": reply_text}
+        
+        await save_chat_turn(db, rows, farm.id, session_id, reply_text)
+    
+    yield "done", {"reply": reply_text, "session_id": session_id, "degraded": degraded}
+
+@router.post("/chat/message/stream")
+async def send_message_stream(
+    request: ChatMessageRequest,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Send a message and stream the reply as Server-Sent Events
+    
+    Events: "meta" (session_id), "delta" (text chunks) and "done" (full reply,
+    session_id, degraded). Local intent replies arrive as a single delta.
+    """
+    farm, session_id, lang, rows = await start_chat_turn(request, db)
+    
+    async def event_stream():
+        yield _sse("meta", {"session_id": session_id})
+        async for event, data in chat_turn_events(farm, session_id, lang, rows, request.message):
+            yield _sse(event, data)
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+class ChatConnection:
+    """State for one chat WebSocket: farm, session and a bounded send queue
+    
+    Reply frames wait for queue space, so a slow client slows its own
+    reply stream (backpressure) rather than growing memory. Pushed farm
+    updates never wait: they are dropped when the client is too far behind.
+    """
+    
+    def __init__(self, websocket: WebSocket, farm: Farm, session_id: str, session_exists: bool, lang: str):
+        self.websocket = websocket
+        self.farm = farm
+        self.session_id = session_id
+        self.session_exists = session_exists
+        self.lang = lang
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=WS_SEND_QUEUE_SIZE)
+        self.closed = False
+        self.dropped = 0
+        self.plan_task: Optional[asyncio.Task] = None
+    
+    async def send(self, frame: Dict):
+        """Queue a reply frame, waiting while the queue is full"""
+        if not self.closed:
+            await self.queue.put(frame)
+    
+    def push(self, frame: Dict):
+        """Queue a server-pushed frame, or drop it if the queue is full"""
+        if self.closed:
+            return
+        try:
+            self.queue.put_nowait(frame)
+        except asyncio.QueueFull:
+            self.dropped += 1
+    
+    async def run_sender(self):
+        try:
+            while True:
+                await self.websocket.send_json(await self.queue.get())
+        except Exception:
+            # Client went away; the receive loop sees the disconnect
+            self.closed = True
+    
+    def on_farm_event(self, event: Dict):
+        """Forward a farm write to the client and refresh today's plan (debounced)"""
+        self.push({"type": "farm_event", "event": event})
+        if self.plan_task is None or self.plan_task.done():
+            self.plan_task = asyncio.create_task(self.push_plan())
+    
+    async def push_plan(self):
+        # Several logs saved together produce one plan update
+        await asyncio.sleep(WS_PLAN_DEBOUNCE_SECONDS)
+        try:
+            async with AsyncSessionLocal() as db:
+                plan = await build_today_plan(self.farm, db)
+        except Exception as e:
+            logger.warning(f"Chat WS: Could not rebuild plan for farm {self.farm.id}: {e}")
+            return
+        self.push({"type": "plan", "plan": plan})
+    
+    def close(self):
+        self.closed = True
+        if self.plan_task is not None:
+            self.plan_task.cancel()
+
+@router.websocket("/chat/ws")
+async def chat_websocket(
+    websocket: WebSocket,
+    farm_id: str = Query(...),
+    session_id: Optional[str] = Query(None),
+    lang: Optional[str] = Query(None)
+):
+    """Chat over a WebSocket, with farm updates pushed as they happen
+    
+    The farm and session are checked once when the connection opens.
+    Client frames: {"message": "...", "lang": optional}. Server frames:
+    "meta" (session_id), "delta" and "done" per reply, "error", plus
+    "farm_event" (new log / alert) and "plan" (today's plan after a change).
+    """
+    async with AsyncSessionLocal() as db:
+        farm = await db.get(Farm, farm_id)
+        session_exists = bool(session_id) and await db.get(ChatSession, session_id) is not None
+    if not farm:
+        await websocket.close(code=1008, reason="Farm not found")
+        return
+    
+    await websocket.accept()
+    connection = ChatConnection(
+        websocket, farm, session_id or str(uuid.uuid4()), session_exists,
+        lang or farm.preferred_language or "en"
     )
-    db.add(assistant_msg)
-    db.flush()  # Flush to get ID/timestamp before commit
-    db.commit()
-    db.refresh(assistant_msg)  # Refresh to ensure all fields are populated
+    sender = asyncio.create_task(connection.run_sender())
+    unsubscribe = farm_events.subscribe(farm.id, connection.on_farm_event)
+    logger.info(f"Chat WS: Connected farm {farm.id} (session {connection.session_id})")
     
-    return ChatMessageReply(reply=reply_text, session_id=session_id)
+    try:
+        await connection.send({"type": "meta", "session_id": connection.session_id})
+        while True:
+            try:
+                frame = json.loads(await websocket.receive_text())
+                message = (frame.get("message") or "").strip()
+            except (ValueError, AttributeError):
+                message = ""
+            if not message:
+                await connection.send({"type": "error", "detail": "Send {\"message\": \"...\"}"})
+                continue
+            
+            turn_lang = frame.get("lang") or connection.lang
+            if not connection.session_exists:
+                async with AsyncSessionLocal() as db:
+                    await ensure_chat_session(db, farm.id, connection.session_id)
+                connection.session_exists = True
+            rows = new_turn_rows(farm.id, connection.session_id, message)
+            async for event, data in chat_turn_events(farm, connection.session_id, turn_lang, rows, message):
+                await connection.send({"type": event, **data})
+    except WebSocketDisconnect:
+        pass
+    finally:
+        unsubscribe()
+        connection.close()
+        sender.cancel()
+        logger.info(f"Chat WS: Disconnected farm {farm.id} (dropped {connection.dropped} pushed frames)")
 
 @router.delete("/chat/history")
 async def clear_chat_history(
     farm_id: str = Query(...),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Clear chat history for a farm"""
     
     # Validate farm
-    farm = db.query(Farm).filter(Farm.id == farm_id).first()
+    farm = await db.get(Farm, farm_id)
     if not farm:
         raise HTTPException(status_code=404, detail="Farm not found")
     
-    # Delete all messages for this farm
-    deleted_count = db.query(ChatMessage).filter(
-        ChatMessage.farm_id == farm_id
-    ).delete()
+    # Delete all messages for this farm (including queued ones)
+    await write_behind.flush()
+    result = await db.execute(
+        delete(ChatMessage).where(ChatMessage.farm_id == farm_id)
+    )
+    deleted_count = result.rowcount
+    
+    # Summaries describe the deleted messages too
+    await db.execute(
+        update(ChatSession).where(ChatSession.farm_id == farm_id).values(summary=None, summary_message_count=0)
+    )
     
-    db.commit()
+    await db.commit()
+    farm_retrieval.clear_chat(farm_id)
     
     logger.info(f"Chat: Cleared {deleted_count} messages for farm {farm_id}")
     
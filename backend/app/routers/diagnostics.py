@@ -0,0 +1,29 @@
+from fastapi import APIRouter
+from app.services.intent_router import intent_router
+from app.services.prompt_context import prompt_stats
+from app.services.farm_retrieval import farm_retrieval
+from app.services.write_behind import write_behind
+from app.services.farm_events import farm_events
+from app.services.image_pipeline import image_pipeline
+from app.services.near_duplicates import near_duplicates
+from app.services.scan_queue import scan_queue
+from app.services.local_scanner import local_scanner
+from app.services.photo_storage import photo_storage
+
+router = APIRouter()
+
+@router.get("/metrics")
+async def get_metrics():
+    """Chat, scan and photo pipeline counters (LLM call metrics are under /api/ai/llm-metrics)"""
+    return {
+        "local_intents": intent_router.get_stats(),
+        "prompts": prompt_stats.get_stats(),
+        "retrieval": farm_retrieval.get_stats(),
+        "write_behind": write_behind.get_stats(),
+        "farm_events": farm_events.get_stats(),
+        "images": image_pipeline.get_stats(),
+        "near_duplicate_scans": near_duplicates.get_stats(),
+        "scan_queue": scan_queue.get_stats(),
+        "local_scanner": local_scanner.get_stats(),
+        "photo_storage": photo_storage.name
+    }
@@ -1,7 +1,13 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import delete, select
 from sqlalchemy.orm import Session
-from app.db import get_db
-from app.models import ScoutingLog, IrrigationLog, BrixSample, SprayLog
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db import get_db, get_async_db
+from app.models import ScoutingLog, ScoutingLogPhoto, IrrigationLog, BrixSample, SprayLog, PhotoBlob
+from app.services.photo_store import release
+from app.services.farm_context_cache import farm_context_cache
+from app.services.farm_retrieval import farm_retrieval
+from app.services.farm_events import farm_events
 from app.schemas import (
     ScoutingLogCreate, ScoutingLogResponse,
     IrrigationLogCreate, IrrigationLogResponse,
@@ -15,16 +21,47 @@ router = APIRouter()
 def create_scouting_log(log: ScoutingLogCreate, db: Session = Depends(get_db)):
     db_log = ScoutingLog(**log.dict())
     db.add(db_log)
+    sha256 = db.query(PhotoBlob.sha256).filter(PhotoBlob.path == db_log.photo_path).scalar() if db_log.photo_path else None
+    if sha256:
+        # A stored scan photo is kept until the last log using it is deleted
+        db.flush()
+        db.add(ScoutingLogPhoto(scouting_log_id=db_log.id, sha256=sha256, position=0))
+        db.query(PhotoBlob).filter(PhotoBlob.sha256 == sha256).update(
+            {PhotoBlob.ref_count: PhotoBlob.ref_count + 1}, synchronize_session=False
+        )
     db.commit()
     db.refresh(db_log)
+    farm_context_cache.invalidate(db_log.farm_id)
+    farm_retrieval.index_record(db_log)
+    farm_events.publish_record(db_log)
     return db_log
 
+@router.delete("/scouting/{log_id}")
+async def delete_scouting_log(log_id: str, db: AsyncSession = Depends(get_async_db)):
+    """Delete a scouting log, and its scan photos once no other log uses them"""
+    db_log = await db.get(ScoutingLog, log_id)
+    if not db_log:
+        raise HTTPException(status_code=404, detail="Scouting log not found")
+    sha256s = (await db.execute(
+        select(ScoutingLogPhoto.sha256).where(ScoutingLogPhoto.scouting_log_id == log_id)
+    )).scalars().all()
+    await db.execute(delete(ScoutingLogPhoto).where(ScoutingLogPhoto.scouting_log_id == log_id))
+    await db.delete(db_log)
+    await release(db, sha256s)
+    farm_context_cache.invalidate(db_log.farm_id)
+    farm_retrieval.remove_record(db_log)
+    farm_events.publish(db_log.farm_id, {"type": "log_deleted", "kind": "scouting", "id": db_log.id})
+    return {"ok": True}
+
 @router.post("/irrigation", response_model=IrrigationLogResponse)
 def create_irrigation_log(log: IrrigationLogCreate, db: Session = Depends(get_db)):
     db_log = IrrigationLog(**log.dict())
     db.add(db_log)
     db.commit()
     db.refresh(db_log)
+    farm_context_cache.invalidate(db_log.farm_id)
+    farm_retrieval.index_record(db_log)
+    farm_events.publish_record(db_log)
     return db_log
 
 @router.post("/brix", response_model=BrixSampleResponse)
@@ -33,6 +70,9 @@ def create_brix_sample(sample: BrixSampleCreate, db: Session = Depends(get_db)):
     db.add(db_sample)
     db.commit()
     db.refresh(db_sample)
+    farm_context_cache.invalidate(db_sample.farm_id)
+    farm_retrieval.index_record(db_sample)
+    farm_events.publish_record(db_sample)
     return db_sample
 
 @router.post("/spray", response_model=SprayLogResponse)
@@ -41,6 +81,9 @@ def create_spray_log(log: SprayLogCreate, db: Session = Depends(get_db)):
     db.add(db_log)
     db.commit()
     db.refresh(db_log)
+    farm_context_cache.invalidate(db_log.farm_id)
+    farm_retrieval.index_record(db_log)
+    farm_events.publish_record(db_log)
     return db_log
 
 
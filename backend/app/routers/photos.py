@@ -0,0 +1,143 @@
+from fastapi import APIRouter, Request, Query, HTTPException
+from fastapi.responses import FileResponse, Response, RedirectResponse
+from app.services.photo_store import mime_type_for, thumbnail_name
+from app.services.photo_storage import photo_storage
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+import asyncio
+import os
+import re
+import logging
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+# Upload file names: <sha256|uuid>[.thumb].<ext>, never a path
+PHOTO_NAME = re.compile(r"^[A-Za-z0-9-]+(\.thumb)?\.[A-Za-z0-9]+$")
+CONTENT_HASH = re.compile(r"^[0-9a-f]{64}$")
+
+# Content-addressed photos never change; older uuid-named uploads get a shorter lifetime
+IMMUTABLE_CACHE = "public, max-age=31536000, immutable"
+MUTABLE_CACHE = "public, max-age=86400"
+# Redirects to presigned URLs must not outlive the URL
+REDIRECT_CACHE = "private, max-age=300"
+
+def _resolve(filename: str, size: str) -> Optional[Tuple[Path, os.stat_result]]:
+    """Local file and its stat, or None when photo storage is not on this disk"""
+    path = None
+    if size == "thumb" and ".thumb." not in filename:
+        # Uploads from before thumbnails existed are served in full
+        path = photo_storage.local_path(thumbnail_name(filename))
+    path = path or photo_storage.local_path(filename)
+    if path is None:
+        return None
+    try:
+        return path, path.stat()
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Photo not found")
+
+async def _redirect(filename: str, size: str) -> Response:
+    """Send the client to the storage backend (e.g. a presigned S3 URL)"""
+    names = [filename]
+    if size == "thumb" and ".thumb." not in filename:
+        names.insert(0, thumbnail_name(filename))
+    for name in names:
+        if await photo_storage.exists(name):
+            url = await photo_storage.url(name)
+            if url:
+                return RedirectResponse(url, status_code=307, headers={"Cache-Control": REDIRECT_CACHE})
+    raise HTTPException(status_code=404, detail="Photo not found")
+
+def _etag(path: Path, stat: os.stat_result) -> Tuple[str, bool]:
+    """Strong ETag and whether the file is immutable"""
+    stem = path.name.split(".")[0]
+    if CONTENT_HASH.match(stem):
+        return f'"{stem}{"-thumb" if ".thumb." in path.name else ""}"', True
+    return f'"{stat.st_size:x}-{stat.st_mtime_ns:x}"', False
+
+def _etag_matches(header: Optional[str], etag: str) -> bool:
+    if not header:
+        return False
+    tags = [tag.strip() for tag in header.split(",")]
+    return "*" in tags or any(tag.removeprefix("W/") == etag for tag in tags)
+
+def _parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """(start, end) inclusive for a single "bytes=" range; None if it cannot be served
+
+    Raises ValueError for a syntactically valid but unsatisfiable range.
+    """
+    match = re.fullmatch(r"bytes=(\d*)-(\d*)", header.strip())
+    if not match or match.group(1) == match.group(2) == "":
+        # Malformed or multiple ranges: send the whole file
+        return None
+    first, last = match.groups()
+    if first == "":
+        # Suffix range: the last N bytes
+        length = int(last)
+        if length == 0:
+            raise ValueError(header)
+        return max(0, size - length), size - 1
+    start = int(first)
+    if last and int(last) < start:
+        # Invalid (last byte before the first): ignored, like a malformed header
+        return None
+    if start >= size:
+        raise ValueError(header)
+    end = min(int(last), size - 1) if last else size - 1
+    return start, end
+
+@router.get("/{filename}")
+async def get_photo(
+    filename: str,
+    request: Request,
+    size: str = Query("original", pattern="^(original|thumb)$")
+):
+    """Serve a scan photo or its thumbnail (photo_path "uploads/<name>" -> /api/photos/<name>)
+
+    Responses carry a strong ETag (the content hash for content-addressed
+    photos) and long-lived cache headers; If-None-Match gives 304 and a
+    single "Range: bytes=..." gives 206. Photos kept in object storage
+    are served by redirecting to a short-lived presigned URL.
+    """
+    if not PHOTO_NAME.match(filename):
+        raise HTTPException(status_code=404, detail="Photo not found")
+    resolved = await asyncio.to_thread(_resolve, filename, size)
+    if resolved is None:
+        return await _redirect(filename, size)
+    path, stat = resolved
+    etag, immutable = _etag(path, stat)
+    headers: Dict[str, str] = {
+        "ETag": etag,
+        "Cache-Control": IMMUTABLE_CACHE if immutable else MUTABLE_CACHE,
+        "Accept-Ranges": "bytes",
+    }
+
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+
+    media_type = mime_type_for(path.suffix)
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if range_header and (not if_range or if_range.strip() == etag):
+        try:
+            byte_range = _parse_range(range_header, stat.st_size)
+        except ValueError:
+            return Response(
+                status_code=416,
+                headers={**headers, "Content-Range": f"bytes */{stat.st_size}"}
+            )
+        if byte_range:
+            start, end = byte_range
+            body = await photo_storage.get(path.name, byte_range)
+            if body is None:
+                raise HTTPException(status_code=404, detail="Photo not found")
+            return Response(
+                content=body,
+                status_code=206,
+                media_type=media_type,
+                headers={**headers, "Content-Range": f"bytes {start}-{end}/{stat.st_size}"}
+            )
+
+    # stat_result lets FileResponse skip a second stat of the file
+    return FileResponse(path, media_type=media_type, headers=headers, stat_result=stat)
@@ -1,6 +1,7 @@
 from fastapi import APIRouter, Depends, Query, HTTPException
-from sqlalchemy.orm import Session
-from app.db import get_db
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db import get_async_db
 from app.models import Farm, Block, ScoutingLog, IrrigationLog, BrixSample, SprayLog, CropStatus
 from app.services.weather_service import get_forecast
 from app.services.plan_constants import *
@@ -15,14 +16,19 @@ HEAVY_RAIN_THRESHOLD = 20.0  # mm per day for heavy rain
 HIGH_HUMIDITY_THRESHOLD = 80.0  # Relative humidity (if available)
 
 @router.get("/today")
-async def get_today_plan(farm_id: str = Query(...), db: Session = Depends(get_db)):
+async def get_today_plan(farm_id: str = Query(...), db: AsyncSession = Depends(get_async_db)):
     """Generate today's plan based on weather, recent logs, and crop status"""
     
     # Get farm
-    farm = db.query(Farm).filter(Farm.id == farm_id).first()
+    farm = await db.get(Farm, farm_id)
     if not farm:
         raise HTTPException(status_code=404, detail="Farm not found")
     
+    return await build_today_plan(farm, db)
+
+async def build_today_plan(farm: Farm, db: AsyncSession) -> Dict:
+    """Today's tasks and 7-day insights for a farm (also used by chat)"""
+    farm_id = farm.id
     today = datetime.now().date()
     seven_days_ago = datetime.now() - timedelta(days=7)
     three_days_ago = datetime.now() - timedelta(days=3)
@@ -32,30 +38,40 @@ async def get_today_plan(farm_id: str = Query(...), db: Session = Depends(get_db
     weather_summary = _summarize_weather(forecast)
     
     # Get latest crop status
-    latest_status = db.query(CropStatus).filter(
-        CropStatus.farm_id == farm_id
-    ).order_by(CropStatus.recorded_at.desc()).first()
+    latest_status = (await db.execute(
+        select(CropStatus).where(
+            CropStatus.farm_id == farm_id
+        ).order_by(CropStatus.recorded_at.desc()).limit(1)
+    )).scalars().first()
     
     # Get recent logs
-    recent_scouting = db.query(ScoutingLog).filter(
-        ScoutingLog.farm_id == farm_id,
-        ScoutingLog.observed_at >= seven_days_ago
-    ).all()
-    
-    recent_irrigation = db.query(IrrigationLog).filter(
-        IrrigationLog.farm_id == farm_id,
-        IrrigationLog.irrigated_at >= seven_days_ago
-    ).all()
-    
-    recent_brix = db.query(BrixSample).filter(
-        BrixSample.farm_id == farm_id,
-        BrixSample.sampled_at >= seven_days_ago
-    ).all()
-    
-    recent_spray = db.query(SprayLog).filter(
-        SprayLog.farm_id == farm_id,
-        SprayLog.sprayed_at >= seven_days_ago
-    ).all()
+    recent_scouting = (await db.execute(
+        select(ScoutingLog).where(
+            ScoutingLog.farm_id == farm_id,
+            ScoutingLog.observed_at >= seven_days_ago
+        )
+    )).scalars().all()
+    
+    recent_irrigation = (await db.execute(
+        select(IrrigationLog).where(
+            IrrigationLog.farm_id == farm_id,
+            IrrigationLog.irrigated_at >= seven_days_ago
+        )
+    )).scalars().all()
+    
+    recent_brix = (await db.execute(
+        select(BrixSample).where(
+            BrixSample.farm_id == farm_id,
+            BrixSample.sampled_at >= seven_days_ago
+        )
+    )).scalars().all()
+    
+    recent_spray = (await db.execute(
+        select(SprayLog).where(
+            SprayLog.farm_id == farm_id,
+            SprayLog.sprayed_at >= seven_days_ago
+        )
+    )).scalars().all()
     
     recent_logs_summary = {
         "scouting_count": len(recent_scouting),
@@ -1,30 +1,54 @@
-from fastapi import APIRouter, Depends, File, UploadFile, Form, HTTPException
-from sqlalchemy.orm import Session
-from app.db import get_db
-from app.models import Farm, ScoutingLog
+from fastapi import APIRouter, Depends, File, UploadFile, Form, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db import get_async_db, AsyncSessionLocal
+from app.models import Farm, ScoutingLog, ScoutingLogPhoto, ScanResult, PhotoBlob
+from app.services.llm_gateway import llm, estimate_tokens
+from app.services.llm_cache import llm_cache
+from app.services.admission import admission
+from app.services.farm_context_cache import farm_context_cache
+from app.services.farm_retrieval import farm_retrieval
+from app.services.farm_events import farm_events
+from app.services.photo_store import (
+    read_upload, save_upload, save_photo, load_photo, save_thumbnail, add_reference, set_dhash,
+    SavedPhoto, UploadTooLarge, UnsupportedImage, MAX_UPLOAD_BYTES
+)
+from app.services.near_duplicates import near_duplicates
+from app.services.image_pipeline import image_pipeline, ProcessedImage
+from app.services.local_scanner import local_scanner
+from app.services.jobs import jobs
+from app.services.scan_queue import scan_queue, ProgressCallback
 from datetime import datetime
-from typing import Dict, List, Optional
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+import asyncio
 import os
 import json
 import logging
-import uuid
-from pathlib import Path
+import base64
+import time
 
 logger = logging.getLogger(__name__)
 
-try:
-    from openai import AsyncOpenAI
-    OPENAI_AVAILABLE = True
-except ImportError:
-    OPENAI_AVAILABLE = False
-    logger.warning("OpenAI SDK not available. Install with: pip install openai")
-
 router = APIRouter()
 
-# Ensure uploads directory exists (relative to backend directory)
-BACKEND_DIR = Path(__file__).parent.parent.parent
-UPLOADS_DIR = BACKEND_DIR / "uploads"
-UPLOADS_DIR.mkdir(parents=True, exist_ok=True)
+
+# Vision model used for scans; bump SCAN_PROMPT_VERSION when the prompt changes
+# so stored analyses from the old prompt are no longer reused
+VISION_MODEL = "gpt-4o"
+SCAN_PROMPT_VERSION = "1"
+SCAN_MODEL_VERSION = f"{VISION_MODEL}/prompt-{SCAN_PROMPT_VERSION}"
+
+SCAN_JOB_KINDS = ("scan", "scan_batch")
+# Photos per batch scan, and how many of them are analysed at once
+SCAN_BATCH_MAX = int(os.getenv("SCAN_BATCH_MAX", "8"))
+SCAN_BATCH_CONCURRENCY = int(os.getenv("SCAN_BATCH_CONCURRENCY", "3"))
+# Merged next actions kept for a batch
+SCAN_BATCH_MAX_ACTIONS = 6
+# How often the job event stream checks for a progress change
+SCAN_EVENTS_POLL_SECONDS = 0.5
 
 def get_rule_based_scan_result(lang: str) -> Dict:
     """Return rule-based fallback when AI is not available"""
@@ -40,17 +64,34 @@ def get_rule_based_scan_result(lang: str) -> Dict:
         ]
     }
 
-async def analyze_image_with_ai(image_path: str, lang: str) -> Optional[Dict]:
-    """Analyze image using OpenAI vision API"""
-    if not OPENAI_AVAILABLE:
-        return None
+async def get_stored_analysis(db: AsyncSession, sha256: str, lang: str) -> Optional[Dict]:
+    """Analysis already made for this photo, language and model version"""
+    row = (await db.execute(
+        select(ScanResult.result).where(
+            ScanResult.sha256 == sha256,
+            ScanResult.lang == lang,
+            ScanResult.model_version == SCAN_MODEL_VERSION
+        )
+    )).scalar()
+    return json.loads(row) if row else None
+
+async def store_analysis(db: AsyncSession, sha256: str, lang: str, analysis: Dict):
+    db.add(ScanResult(sha256=sha256, lang=lang, model_version=SCAN_MODEL_VERSION, result=json.dumps(analysis)))
+    try:
+        await db.commit()
+    except IntegrityError:
+        # A concurrent scan of the same photo stored it first
+        await db.rollback()
+
+async def analyze_image_with_ai(image: bytes, mime_type: str, lang: str, image_hash: str) -> Optional[Dict]:
+    """Analyze image using OpenAI vision API
     
-    api_key = os.getenv("OPENAI_API_KEY")
-    if not api_key:
+    image holds the bytes to send (the processed photo); image_hash is the
+    upload's SHA-256, used for the cache key.
+    """
+    if not llm.available:
         return None
     
-    model = os.getenv("OPENAI_MODEL", "gpt-5.2")
-    
     # Language mapping
     lang_map = {
         "en": "English",
@@ -61,23 +102,6 @@ async def analyze_image_with_ai(image_path: str, lang: str) -> Optional[Dict]:
     language = lang_map.get(lang, "English")
     
     try:
-        client = AsyncOpenAI(api_key=api_key)
-        
-        # Read image and encode to base64
-        import base64
-        with open(image_path, "rb") as image_file:
-            image_data = base64.b64encode(image_file.read()).decode('utf-8')
-        
-        # Determine image format
-        image_ext = Path(image_path).suffix.lower()
-        mime_type = f"image/{image_ext[1:]}" if image_ext else "image/jpeg"
-        if image_ext == ".png":
-            mime_type = "image/png"
-        elif image_ext in [".jpg", ".jpeg"]:
-            mime_type = "image/jpeg"
-        elif image_ext == ".webp":
-            mime_type = "image/webp"
-        
         prompt = f"""You are an agricultural expert analyzing a photo of table grapes (fresh eating grapes, not wine grapes).
 
 Analyze this image and provide:
@@ -113,10 +137,21 @@ Example format:
 }}
 """
         
+        # Same photo + prompt (e.g. a retried upload) is served from the cache
+        cache_key = llm_cache.make_key(VISION_MODEL, "", prompt + image_hash, lang)
+        cached = await llm_cache.get("scan", cache_key)
+        if cached:
+            return json.loads(cached)
+        
+        image_data = base64.b64encode(image).decode("ascii")
+        
         # Use Chat Completions API for vision (vision requires image support)
         # Note: Using gpt-4o for vision capability; Responses API doesn't support images yet
-        response = await client.chat.completions.create(
-            model="gpt-4o",  # Vision-capable model
+        # Images are billed separately from text; budget a flat ~1k tokens for one photo
+        response = await llm.chat_completions_create(
+            "scan",
+            estimate_tokens(prompt) + 1000 + 500,
+            model=VISION_MODEL,  # Vision-capable model
             messages=[
                 {
                     "role": "user",
@@ -152,74 +187,137 @@ Example format:
         if "stage" not in result or "issues" not in result or "summary" not in result or "next_actions" not in result:
             raise ValueError("Invalid response format")
         
-        logger.info(f"Scan: Successfully analyzed image using {model}")
-        return {
+        logger.info(f"Scan: Successfully analyzed image using {VISION_MODEL}")
+        analysis = {
             "stage": result.get("stage", "unknown"),
             "issues": result.get("issues", []),
             "summary": result.get("summary", ""),
             "next_actions": result.get("next_actions", [])
         }
+        await llm_cache.set("scan", cache_key, json.dumps(analysis))
+        return analysis
         
     except Exception as e:
         logger.error(f"OpenAI vision API error: {e}")
         return None
 
-@router.post("/scan")
-async def scan_image(
-    farm_id: str = Form(...),
-    block_id: Optional[str] = Form(None),
-    file: UploadFile = File(...),
-    notes: Optional[str] = Form(None),
-    lang: Optional[str] = Form("en"),
-    db: Session = Depends(get_db)
-):
-    """Scan an image of grapes/leaves and return analysis"""
+async def analyze_photo(
+    db: AsyncSession,
+    farm_id: str,
+    photo: SavedPhoto,
+    lang: str,
+    progress: Optional[ProgressCallback] = None
+) -> Tuple[Dict, Optional[ProcessedImage]]:
+    """Scan result for a stored photo (no scouting log is written)
     
-    # Validate farm
-    farm = db.query(Farm).filter(Farm.id == farm_id).first()
-    if not farm:
-        raise HTTPException(status_code=404, detail="Farm not found")
+    Stored analyses of the same or a near-identical photo are reused before
+    the vision model is called. Returns (result, processed image); the image
+    is None when the photo did not need processing.
+    """
+    photo_path = photo.photo_path
     
-    # Use farm's preferred language if lang not provided
-    if not lang or lang == "en":
-        lang = farm.preferred_language or "en"
+    # The same photo (a retry or a resend) reuses its stored analysis
+    analysis = await get_stored_analysis(db, photo.sha256, lang) if photo.duplicate else None
+    degraded = False
+    if analysis:
+        logger.info(f"Scan: Reusing stored analysis of {photo_path} for farm {farm_id}")
     
-    # Validate file type
-    if not file.content_type or not file.content_type.startswith("image/"):
-        raise HTTPException(status_code=400, detail="File must be an image")
+    # One decode gives the (smaller) analysis image and the thumbnail
+    image = None
+    if not analysis or not photo.thumbnail_path:
+        if progress:
+            progress("processing")
+        image = await image_pipeline.process(photo.data, photo.mime_type)
+        if image.thumbnail and not photo.thumbnail_path:
+            try:
+                await save_thumbnail(photo, image.thumbnail)
+            except Exception as e:
+                logger.warning(f"Scan: Could not save thumbnail for {photo_path}: {e}")
+        if image.dhash is not None and not photo.has_dhash:
+            await set_dhash(db, photo.sha256, image.dhash)
     
-    # Generate unique filename
-    file_ext = Path(file.filename).suffix if file.filename else ".jpg"
-    unique_filename = f"{uuid.uuid4()}{file_ext}"
-    file_path = UPLOADS_DIR / unique_filename
+    # A near-identical shot of the same farm scanned recently reuses its analysis
+    reused = None
+    if not analysis and image and image.dhash is not None:
+        near = await near_duplicates.find(farm_id, db, image.dhash, exclude=photo.sha256)
+        if near:
+            near_sha256, distance = near
+            analysis = await get_stored_analysis(db, near_sha256, lang)
+            blob = await db.get(PhotoBlob, near_sha256) if analysis else None
+            if blob:
+                reused = {"photo_path": blob.path, "distance": distance}
+                logger.info(f"Scan: {photo_path} is a near-duplicate of {blob.path} (distance {distance}), reusing its analysis")
+                await store_analysis(db, photo.sha256, lang, analysis)
     
-    # Save file
-    try:
-        with open(file_path, "wb") as f:
-            content = await file.read()
-            f.write(content)
-        photo_path = f"uploads/{unique_filename}"
-    except Exception as e:
-        logger.error(f"Error saving file: {e}")
-        raise HTTPException(status_code=500, detail="Failed to save image")
+    # A confident on-device prediction answers without the vision model
+    local = None
+    local_used = False
+    if not analysis and image and image.thumbnail:
+        local = await local_scanner.predict(image.thumbnail)
+        if local and local_scanner.is_confident(local):
+            analysis = local.to_analysis(lang)
+            local_used = True
+            logger.info(f"Scan: Local {local.source} prediction for {photo_path} (confidence {local.confidence}), skipping vision call")
     
-    # Analyze with AI
-    analysis = await analyze_image_with_ai(str(file_path), lang)
+    # Analyze with AI unless the model is backed up, in which case fall back immediately
+    if not analysis:
+        if llm.available and not admission.admit("scan"):
+            degraded = True
+        else:
+            if progress:
+                progress("analyzing")
+            started = time.perf_counter()
+            try:
+                analysis = await analyze_image_with_ai(image.data, image.mime_type, lang, photo.sha256)
+            finally:
+                if llm.available:
+                    admission.release("scan", time.perf_counter() - started)
+            if analysis:
+                await store_analysis(db, photo.sha256, lang, analysis)
+    
+    if not analysis and local:
+        # Vision model unavailable, backed up or failed: a trained-model prediction beats the static fallback
+        analysis = local.to_analysis(lang)
+        local_used = True
+        local_scanner.used_as_fallback += 1
     
     if not analysis:
         logger.info(f"Scan: Using rule-based fallback for farm {farm_id}")
         result = get_rule_based_scan_result(lang)
         result["photo_path"] = photo_path
+        result["thumbnail_path"] = photo.thumbnail_path
     else:
         result = {
             "photo_path": photo_path,
+            "thumbnail_path": photo.thumbnail_path,
             "stage": analysis["stage"],
             "issues": analysis["issues"],
             "summary": analysis["summary"],
             "next_actions": analysis["next_actions"]
         }
+        if reused:
+            result["reused_analysis"] = reused
+        if local_used:
+            result["local_scan"] = {"source": local.source, "confidence": local.confidence}
+    if degraded:
+        result["degraded"] = True
+    
+    return result, image
+
+async def create_scan_log(
+    db: AsyncSession,
+    farm_id: str,
+    block_id: Optional[str],
+    notes: Optional[str],
+    result: Dict,
+    photos: List[Tuple[SavedPhoto, Optional[ProcessedImage]]]
+) -> Optional[ScoutingLog]:
+    """Write the scouting log for a scan result and count its photo references
     
-    # Create scouting log
+    Every photo is recorded in scouting_log_photos; the log's photo_path
+    is the first one. Failures are logged, not raised:
+    the farmer still gets the analysis.
+    """
     try:
         # Determine main issue and severity
         main_issue = "unknown"
@@ -240,19 +338,309 @@ async def scan_image(
             farm_id=farm_id,
             block_id=block_id,
             observed_at=datetime.now(),
-            photo_path=photo_path,
+            photo_path=photos[0][0].photo_path,
             issue_type=main_issue,
             severity=max_severity,
             notes=log_notes
         )
         db.add(scouting_log)
-        db.commit()
-        db.refresh(scouting_log)
+        await db.flush()
+        # A photo sent twice in one batch is one reference
+        sha256s = list(dict.fromkeys(photo.sha256 for photo, image in photos))
+        for position, sha256 in enumerate(sha256s):
+            db.add(ScoutingLogPhoto(scouting_log_id=scouting_log.id, sha256=sha256, position=position))
+            await add_reference(db, sha256)
+        await db.commit()
+        await db.refresh(scouting_log)
+        farm_context_cache.invalidate(farm_id)
+        farm_retrieval.index_record(scouting_log)
+        farm_events.publish_record(scouting_log)
+        for photo, image in photos:
+            if image and image.dhash is not None:
+                near_duplicates.add(farm_id, image.dhash, photo.sha256, scouting_log.observed_at)
         
         logger.info(f"Scan: Created scouting log {scouting_log.id} for farm {farm_id}")
+        return scouting_log
     except Exception as e:
         logger.error(f"Error creating scouting log: {e}")
         # Don't fail the request if log creation fails
+        return None
+
+async def run_scan(
+    db: AsyncSession,
+    farm_id: str,
+    block_id: Optional[str],
+    notes: Optional[str],
+    lang: str,
+    photo: SavedPhoto,
+    progress: Optional[ProgressCallback] = None
+) -> Dict:
+    """Analyse a stored photo and record it as a scouting log"""
+    result, image = await analyze_photo(db, farm_id, photo, lang, progress)
+    if progress:
+        progress("saving")
+    await create_scan_log(db, farm_id, block_id, notes, result, [(photo, image)])
+    return result
+
+async def load_queued_photo(db: AsyncSession, name: str) -> SavedPhoto:
+    """Read back a photo queued by name (fails the job if it was deleted meanwhile)"""
+    photo = await load_photo(db, name)
+    if photo is None:
+        raise RuntimeError(f"Photo {name} is no longer stored")
+    return photo
+
+async def _scan_job(farm_id: str, block_id: Optional[str], notes: Optional[str], lang: str, name: str, progress: ProgressCallback) -> Dict:
+    # Runs after the request has finished, so it needs its own session; only
+    # the photo's storage name is queued, its bytes are read back here
+    async with AsyncSessionLocal() as db:
+        photo = await load_queued_photo(db, name)
+        return await run_scan(db, farm_id, block_id, notes, lang, photo, progress)
+
+def validate_photo(file: UploadFile):
+    """Reject a non-image or (when its size is known) oversized upload before anything is stored"""
+    if not file.content_type or not file.content_type.startswith("image/"):
+        raise HTTPException(status_code=400, detail="File must be an image")
+    if file.size is not None and file.size > MAX_UPLOAD_BYTES:
+        raise HTTPException(status_code=413, detail=f"Photo is larger than {MAX_UPLOAD_BYTES / (1024 * 1024):g} MB")
+
+async def store_photo(db: AsyncSession, file: UploadFile) -> SavedPhoto:
+    """Validate an uploaded image and store it"""
+    validate_photo(file)
+    
+    # Save file (streamed to disk, bytes kept for the analysis)
+    try:
+        return await save_upload(file, db)
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except UnsupportedImage as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error saving file: {e}")
+        raise HTTPException(status_code=500, detail="Failed to save image")
+
+async def read_photo(file: UploadFile) -> bytes:
+    """Validate an uploaded image and read it into memory, storing nothing"""
+    validate_photo(file)
+    try:
+        return await read_upload(file, MAX_UPLOAD_BYTES)
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except UnsupportedImage as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+async def store_photo_data(db: AsyncSession, data: bytes) -> SavedPhoto:
+    """Store an image read with read_photo"""
+    try:
+        return await save_photo(data, db)
+    except Exception as e:
+        logger.error(f"Error saving file: {e}")
+        raise HTTPException(status_code=500, detail="Failed to save image")
+
+async def get_scan_language(db: AsyncSession, farm_id: str, lang: Optional[str]) -> str:
+    """Validate the farm and pick the scan language"""
+    
+    # Validate farm
+    farm = await db.get(Farm, farm_id)
+    if not farm:
+        raise HTTPException(status_code=404, detail="Farm not found")
+    
+    # Use farm's preferred language if lang not provided
+    if not lang or lang == "en":
+        lang = farm.preferred_language or "en"
+    return lang
+
+@router.post("/scan")
+async def scan_image(
+    farm_id: str = Form(...),
+    block_id: Optional[str] = Form(None),
+    file: UploadFile = File(...),
+    notes: Optional[str] = Form(None),
+    lang: Optional[str] = Form("en"),
+    mode: str = Query("sync", pattern="^(sync|async)$"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Scan an image of grapes/leaves and return analysis
+    
+    mode=async stores the photo and returns a job_id straight away; the
+    analysis runs on the scan worker pool and is fetched from
+    GET /api/scan/{job_id} (or streamed from GET /api/scan/{job_id}/events).
+    """
+    lang = await get_scan_language(db, farm_id, lang)
+    photo = await store_photo(db, file)
+    
+    if mode == "async":
+        # A retried upload of the same photo joins the job already running
+        job_id = scan_queue.submit(
+            "scan",
+            lambda progress: _scan_job(farm_id, block_id, notes, lang, photo.name, progress),
+            key=f"scan:{farm_id}:{photo.sha256}:{lang}"
+        )
+        if not job_id:
+            raise HTTPException(status_code=503, detail="Too many scans in progress, please retry shortly")
+        logger.info(f"Scan: Queued job {job_id} for farm {farm_id}")
+        return {"job_id": job_id, "status": "pending", "photo_path": photo.photo_path, "thumbnail_path": photo.thumbnail_path}
+    
+    return await run_scan(db, farm_id, block_id, notes, lang, photo)
+
+def merge_scan_results(results: List[Dict]) -> Dict:
+    """Combine per-photo scan results into one
+    
+    Issues with the same name are merged (highest severity and confidence,
+    plus the photos they were seen in). The stage is the one most photos
+    agree on, and summaries and next actions are de-duplicated.
+    """
+    stages = Counter(r["stage"] for r in results if r.get("stage") and r["stage"] != "unknown")
     
+    issues: Dict[str, Dict] = {}
+    for number, r in enumerate(results, start=1):
+        for issue in r["issues"]:
+            key = str(issue.get("name", "unknown")).strip().lower()
+            merged = issues.setdefault(key, {"name": issue.get("name", "unknown"), "severity": 0, "confidence": 0.0, "photos": []})
+            merged["severity"] = max(merged["severity"], issue.get("severity", 0))
+            merged["confidence"] = max(merged["confidence"], issue.get("confidence", 0.0))
+            merged["photos"].append(number)
+    
+    summaries = list(dict.fromkeys(r["summary"] for r in results if r.get("summary")))
+    if len(summaries) > 1:
+        summary = "\n".join(
+            f"{number}. {r['summary']}" for number, r in enumerate(results, start=1) if r.get("summary")
+        )
+    else:
+        summary = summaries[0] if summaries else ""
+    
+    merged = {
+        "photo_paths": [r["photo_path"] for r in results],
+        "stage": stages.most_common(1)[0][0] if stages else "unknown",
+        "issues": sorted(issues.values(), key=lambda i: (-i["severity"], -i["confidence"])),
+        "summary": summary,
+        "next_actions": list(dict.fromkeys(a for r in results for a in r["next_actions"]))[:SCAN_BATCH_MAX_ACTIONS],
+        "images": results
+    }
+    if any(r.get("degraded") for r in results):
+        merged["degraded"] = True
+    return merged
+
+async def _analyze_batch_photo(farm_id: str, photo: SavedPhoto, lang: str, slots: asyncio.Semaphore) -> Tuple[Dict, Optional[ProcessedImage]]:
+    # One session per photo: a session cannot be shared by concurrent tasks
+    async with slots:
+        async with AsyncSessionLocal() as db:
+            return await analyze_photo(db, farm_id, photo, lang)
+
+async def run_batch_scan(
+    db: AsyncSession,
+    farm_id: str,
+    block_id: Optional[str],
+    notes: Optional[str],
+    lang: str,
+    photos: List[SavedPhoto],
+    progress: Optional[ProgressCallback] = None
+) -> Dict:
+    """Analyse several photos (SCAN_BATCH_CONCURRENCY at a time) and record one scouting log"""
+    if progress:
+        progress("analyzing")
+    slots = asyncio.Semaphore(SCAN_BATCH_CONCURRENCY)
+    analysed = await asyncio.gather(*[
+        _analyze_batch_photo(farm_id, photo, lang, slots) for photo in photos
+    ])
+    result = merge_scan_results([r for r, image in analysed])
+    if progress:
+        progress("saving")
+    await create_scan_log(
+        db, farm_id, block_id, notes, result,
+        [(photo, image) for photo, (r, image) in zip(photos, analysed)]
+    )
     return result
 
+async def _batch_scan_job(farm_id: str, block_id: Optional[str], notes: Optional[str], lang: str, names: List[str], progress: ProgressCallback) -> Dict:
+    async with AsyncSessionLocal() as db:
+        photos = [await load_queued_photo(db, name) for name in names]
+        return await run_batch_scan(db, farm_id, block_id, notes, lang, photos, progress)
+
+@router.post("/scan/batch")
+async def scan_batch(
+    farm_id: str = Form(...),
+    block_id: Optional[str] = Form(None),
+    files: List[UploadFile] = File(...),
+    notes: Optional[str] = Form(None),
+    lang: Optional[str] = Form("en"),
+    mode: str = Query("sync", pattern="^(sync|async)$"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Scan several photos of one block (leaves, bunches, canopy) as one scouting round
+    
+    Returns the merged result (stage, issues with the photos they were seen
+    in, summary, next actions) plus per-photo results under "images", and
+    records a single scouting log. mode=async works as for /scan.
+    """
+    if not files or len(files) > SCAN_BATCH_MAX:
+        raise HTTPException(status_code=400, detail=f"Send between 1 and {SCAN_BATCH_MAX} photos")
+    lang = await get_scan_language(db, farm_id, lang)
+    # Every photo is read and checked first (declared sizes can be missing or
+    # wrong), so a rejected batch leaves no photos stored
+    for file in files:
+        validate_photo(file)
+    buffered = [await read_photo(file) for file in files]
+    photos = [await store_photo_data(db, data) for data in buffered]
+    
+    if mode == "async":
+        names = [photo.name for photo in photos]
+        job_id = scan_queue.submit(
+            "scan_batch",
+            lambda progress: _batch_scan_job(farm_id, block_id, notes, lang, names, progress),
+            key=f"scan_batch:{farm_id}:{':'.join(photo.sha256 for photo in photos)}:{lang}"
+        )
+        if not job_id:
+            raise HTTPException(status_code=503, detail="Too many scans in progress, please retry shortly")
+        logger.info(f"Scan: Queued batch job {job_id} ({len(photos)} photos) for farm {farm_id}")
+        return {"job_id": job_id, "status": "pending", "photo_paths": [photo.photo_path for photo in photos]}
+    
+    return await run_batch_scan(db, farm_id, block_id, notes, lang, photos)
+
+def _sse(event: str, data: Dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+def _scan_job_or_404(job_id: str) -> Dict:
+    job = jobs.get(job_id)
+    if not job or job["kind"] not in SCAN_JOB_KINDS:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@router.get("/scan/{job_id}")
+async def get_scan_job(
+    job_id: str,
+    wait: float = Query(0, ge=0, le=30, description="Seconds to long-poll for completion")
+):
+    """Poll a background scan job (status, progress and, once done, the result)"""
+    _scan_job_or_404(job_id)
+    if wait > 0:
+        return await jobs.wait(job_id, timeout=wait)
+    return jobs.get(job_id)
+
+@router.get("/scan/{job_id}/events")
+async def stream_scan_job(job_id: str):
+    """Follow a background scan job as Server-Sent Events
+    
+    Events: "progress" (queued / processing / analyzing / saving) while it
+    runs, then "done" (the job, with its result) or "failed".
+    """
+    _scan_job_or_404(job_id)
+    
+    async def event_stream():
+        last_progress = None
+        while True:
+            job = await jobs.wait(job_id, timeout=SCAN_EVENTS_POLL_SECONDS)
+            if job is None:
+                yield _sse("failed", {"job_id": job_id, "error": "Job expired"})
+                return
+            if job["status"] != "pending":
+                yield _sse(job["status"], job)
+                return
+            if job["progress"] != last_progress:
+                last_progress = job["progress"]
+                yield _sse("progress", {"job_id": job_id, "progress": last_progress})
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
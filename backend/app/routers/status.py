@@ -3,6 +3,9 @@ from sqlalchemy.orm import Session
 from app.db import get_db
 from app.models import CropStatus
 from app.schemas import CropStatusCreate, CropStatusResponse
+from app.services.farm_context_cache import farm_context_cache
+from app.services.farm_retrieval import farm_retrieval
+from app.services.farm_events import farm_events
 from typing import Optional
 from datetime import datetime
 
@@ -20,6 +23,9 @@ def create_crop_status(status: CropStatusCreate, db: Session = Depends(get_db)):
     db.add(db_status)
     db.commit()
     db.refresh(db_status)
+    farm_context_cache.invalidate(db_status.farm_id)
+    farm_retrieval.index_record(db_status)
+    farm_events.publish_record(db_status)
     return db_status
 
 @router.get("/latest", response_model=Optional[CropStatusResponse])
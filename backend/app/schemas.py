@@ -203,4 +203,5 @@ class ChatMessageRequest(BaseModel):
 class ChatMessageReply(BaseModel):
     reply: str
     session_id: str
+    degraded: bool = False
 
@@ -0,0 +1,71 @@
+import logging
+import os
+import time
+from typing import Dict
+
+logger = logging.getLogger(__name__)
+
+class AdmissionController:
+    """Adaptive limit on concurrent LLM-backed requests (AIMD)
+
+    Each chat/advice/scan request that would call the model asks for a slot
+    first. The limit grows by one after every request that completes under
+    the latency target and is halved (at most once per cooldown) when one
+    runs slower. Requests that find the limit reached are shed and served
+    the rule-based fallback straight away with a `degraded` flag.
+    """
+
+    def __init__(self, max_limit: int, min_limit: int, latency_target: float, cooldown: float = 5.0):
+        self.max_limit = max_limit
+        self.min_limit = min_limit
+        self.latency_target = latency_target
+        self.cooldown = cooldown
+        self.limit = float(max_limit)
+        self.in_flight = 0
+        self.ewma_latency = 0.0
+        self.last_decrease = 0.0
+        self.admitted: Dict[str, int] = {}
+        self.shed: Dict[str, int] = {}
+
+    def admit(self, site: str) -> bool:
+        """Take a slot for an LLM-backed request, or return False to shed it"""
+        if self.in_flight >= int(self.limit):
+            self.shed[site] = self.shed.get(site, 0) + 1
+            logger.warning(
+                f"Admission: Shedding {site} request (in_flight={self.in_flight}, "
+                f"limit={int(self.limit)}, ewma={self.ewma_latency:.1f}s)"
+            )
+            return False
+        self.in_flight += 1
+        self.admitted[site] = self.admitted.get(site, 0) + 1
+        return True
+
+    def release(self, site: str, seconds: float):
+        """Return a slot and adapt the limit from the observed latency"""
+        self.in_flight = max(0, self.in_flight - 1)
+        self.ewma_latency = seconds if self.ewma_latency == 0 else 0.8 * self.ewma_latency + 0.2 * seconds
+
+        now = time.monotonic()
+        if seconds > self.latency_target:
+            if now - self.last_decrease > self.cooldown:
+                self.limit = max(self.min_limit, self.limit / 2)
+                self.last_decrease = now
+                logger.warning(f"Admission: Slow {site} call ({seconds:.1f}s), limit lowered to {int(self.limit)}")
+        else:
+            self.limit = min(self.max_limit, self.limit + 1)
+
+    def get_stats(self) -> Dict:
+        return {
+            "limit": int(self.limit),
+            "in_flight": self.in_flight,
+            "ewma_latency_ms": round(self.ewma_latency * 1000, 1),
+            "latency_target_ms": round(self.latency_target * 1000, 1),
+            "admitted": dict(self.admitted),
+            "shed": dict(self.shed),
+        }
+
+admission = AdmissionController(
+    max_limit=int(os.getenv("LLM_SHED_MAX_IN_FLIGHT", "16")),
+    min_limit=int(os.getenv("LLM_SHED_MIN_IN_FLIGHT", "2")),
+    latency_target=float(os.getenv("LLM_SHED_LATENCY_SECONDS", "15"))
+)
@@ -0,0 +1,156 @@
+import logging
+import os
+import time
+from typing import List, Optional
+
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db import AsyncSessionLocal
+from app.models import ChatMessage, ChatSession
+from app.services.jobs import jobs
+from app.services.llm_gateway import llm, estimate_tokens
+from app.services.model_router import model_router, RouteDecision, FAST
+
+logger = logging.getLogger(__name__)
+
+# Refresh the summary once this many turns (user + assistant messages) are unsummarised
+SUMMARY_EVERY_TURNS = int(os.getenv("CHAT_SUMMARY_EVERY", "4"))
+# Most recent turns always sent verbatim (never folded into the summary)
+RECENT_TURNS = int(os.getenv("CHAT_RECENT_TURNS", "3"))
+# Token budget for summary + recent turns in each prompt
+HISTORY_TOKEN_BUDGET = int(os.getenv("CHAT_HISTORY_TOKEN_BUDGET", "500"))
+
+SUMMARY_MAX_CHARS = 800
+MESSAGE_MAX_CHARS = 400
+
+def _line(role: str, content: str) -> str:
+    text = " ".join((content or "").split())
+    if len(text) > MESSAGE_MAX_CHARS:
+        text = text[:MESSAGE_MAX_CHARS] + "…"
+    return f"{'Farmer' if (role or '').lower() == 'user' else 'Assistant'}: {text}"
+
+async def get_history_block(db: AsyncSession, session_id: str) -> Optional[str]:
+    """Summary plus the newest unsummarised turns, within the history budget
+
+    Older turns are dropped first when the budget is tight. Returns None for
+    a new session.
+    """
+    session = await db.get(ChatSession, session_id)
+    if session is None:
+        return None
+
+    # Unsummarised messages are at most RECENT + SUMMARY_EVERY turns (plus one refresh in flight)
+    limit = 2 * (RECENT_TURNS + 2 * SUMMARY_EVERY_TURNS)
+    rows = (await db.execute(
+        select(ChatMessage.role, ChatMessage.content).where(
+            ChatMessage.session_id == session_id
+        ).order_by(ChatMessage.created_at.desc(), ChatMessage.id.desc()).limit(limit)
+    )).all()
+
+    # Rows already folded into the summary are not repeated
+    unsummarised = max(0, await _count_messages(db, session_id) - (session.summary_message_count or 0))
+    summary = session.summary
+    budget = HISTORY_TOKEN_BUDGET - (estimate_tokens(summary) if summary else 0)
+    lines: List[str] = []
+    # Newest first until the budget runs out
+    for row in rows[:unsummarised]:
+        line = _line(row.role, row.content)
+        cost = estimate_tokens(line)
+        if cost > budget:
+            break
+        budget -= cost
+        lines.append(line)
+
+    if not summary and not lines:
+        return None
+    parts = []
+    if summary:
+        parts.append(f"Summary of earlier conversation: {summary}")
+    if lines:
+        parts.append("Recent messages:\n" + "\n".join(reversed(lines)))
+    return "\n".join(parts)
+
+async def _count_messages(db: AsyncSession, session_id: str) -> int:
+    return (await db.execute(
+        select(func.count()).select_from(ChatMessage).where(ChatMessage.session_id == session_id)
+    )).scalar() or 0
+
+def schedule_refresh(session_id: str):
+    """Refresh the session summary in the background (one job per session)"""
+    if not llm.available:
+        return
+    key = f"chat_summary:{session_id}"
+    if jobs.find_pending(key):
+        return
+    jobs.submit("chat_summary", refresh_summary(session_id), key=key)
+
+async def refresh_summary(session_id: str) -> Optional[str]:
+    """Fold turns older than the recent window into the session summary
+
+    Does nothing until SUMMARY_EVERY_TURNS turns have built up beyond the
+    recent window, so the LLM is called at most once every few turns.
+    """
+    async with AsyncSessionLocal() as db:
+        session = await db.get(ChatSession, session_id)
+        if session is None:
+            return None
+        total = await _count_messages(db, session_id)
+        covered = session.summary_message_count or 0
+        if covered > total:
+            # History was cleared under this session
+            session.summary = None
+            session.summary_message_count = covered = 0
+            await db.commit()
+        fold_until = total - 2 * RECENT_TURNS
+        if fold_until - covered < 2 * SUMMARY_EVERY_TURNS:
+            return session.summary
+
+        rows = (await db.execute(
+            select(ChatMessage.role, ChatMessage.content).where(
+                ChatMessage.session_id == session_id
+            ).order_by(ChatMessage.created_at, ChatMessage.id).offset(covered).limit(fold_until - covered)
+        )).all()
+        transcript = "\n".join(_line(row.role, row.content) for row in rows)
+
+        summary = await _summarise(session.summary, transcript)
+        if not summary:
+            return session.summary
+        session.summary = summary
+        session.summary_message_count = fold_until
+        await db.commit()
+        logger.info(f"Chat memory: Summarised {fold_until} messages for session {session_id}")
+        return summary
+
+async def _summarise(previous: Optional[str], transcript: str) -> Optional[str]:
+    system_message = (
+        "You maintain a short running summary of a chat between a table grape farmer and an "
+        "assistant. Keep facts the farmer shared (crop stage, problems, actions taken, plans) and "
+        "open questions. Drop greetings and small talk. Plain text, at most 5 short sentences, "
+        "in the language of the conversation."
+    )
+    user_message = (
+        f"Current summary: {previous or '(none)'}\n\n"
+        f"New messages:\n{transcript}\n\n"
+        "Return the updated summary only."
+    )
+    decision = RouteDecision(FAST, "summary")
+    started = time.perf_counter()
+    summary = None
+    try:
+        response = await llm.responses_create(
+            "summary",
+            estimate_tokens(system_message, user_message) + 200,
+            model=decision.model,
+            input=[
+                {"role": "system", "content": system_message},
+                {"role": "user", "content": user_message}
+            ],
+            max_output_tokens=200
+        )
+        summary = (response.output_text or "").strip()[:SUMMARY_MAX_CHARS]
+    except Exception as e:
+        logger.warning(f"Chat memory: Summary refresh failed: {e}")
+    finally:
+        model_router.record("summary", decision, time.perf_counter() - started, bool(summary))
+    return summary or None
@@ -0,0 +1,70 @@
+import json
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+def _without_nulls(data):
+    if isinstance(data, dict):
+        return {key: _without_nulls(value) for key, value in data.items() if value is not None}
+    if isinstance(data, list):
+        return [_without_nulls(item) for item in data]
+    return data
+
+def compact_json(data) -> str:
+    """Compact, key-sorted JSON used for prompts (no indentation, spaces or null fields)"""
+    return json.dumps(_without_nulls(data), separators=(",", ":"), ensure_ascii=False, sort_keys=True)
+
+class FarmContextSnapshot:
+    """DB part of the chat context plus each section's compact JSON"""
+
+    def __init__(self, context: Dict):
+        self.context = context
+        self.sections = {name: compact_json(value) for name, value in context.items() if value}
+        self.created_at = datetime.now()
+
+# Per-farm snapshot cache, invalidated by writes (logs, status, scan, blocks)
+class FarmContextCache:
+    def __init__(self, ttl_minutes: int = 10):
+        self.cache: Dict[str, FarmContextSnapshot] = {}
+        # Bumped on every invalidation, so a build that overlapped a write is not stored
+        self.generations: Dict[str, int] = {}
+        self.ttl = timedelta(minutes=ttl_minutes)
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, farm_id: str) -> Optional[FarmContextSnapshot]:
+        snapshot = self.cache.get(farm_id)
+        if snapshot and datetime.now() - snapshot.created_at < self.ttl:
+            self.hits += 1
+            return snapshot
+        if snapshot:
+            self.cache.pop(farm_id, None)
+        self.misses += 1
+        return None
+
+    def generation(self, farm_id: str) -> int:
+        """Capture before building a snapshot and pass to set()"""
+        return self.generations.get(farm_id, 0)
+
+    def set(self, farm_id: str, context: Dict, generation: Optional[int] = None) -> FarmContextSnapshot:
+        """Wrap and cache a built context; not cached if the farm was written since `generation`"""
+        snapshot = FarmContextSnapshot(context)
+        if generation is None or generation == self.generation(farm_id):
+            self.cache[farm_id] = snapshot
+        else:
+            logger.debug(f"Farm context cache: Dropped stale snapshot for farm {farm_id}")
+        return snapshot
+
+    def invalidate(self, farm_id: Optional[str]):
+        if not farm_id:
+            return
+        self.generations[farm_id] = self.generation(farm_id) + 1
+        if self.cache.pop(farm_id, None) is not None:
+            logger.debug(f"Farm context cache: Invalidated farm {farm_id}")
+
+    def get_stats(self) -> Dict:
+        return {"farms": len(self.cache), "hits": self.hits, "misses": self.misses}
+
+farm_context_cache = FarmContextCache(ttl_minutes=10)
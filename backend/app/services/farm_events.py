@@ -0,0 +1,114 @@
+import asyncio
+import logging
+import threading
+from typing import Callable, Dict, List, Optional
+
+from app.models import Block, ScoutingLog, IrrigationLog, BrixSample, SprayLog, CropStatus
+from app.services.plan_constants import HIGH_SEVERITY_ISSUE
+
+logger = logging.getLogger(__name__)
+
+def _isoformat(value) -> Optional[str]:
+    return value.isoformat() if value else None
+
+def _status_issues(status: CropStatus) -> List[str]:
+    return [
+        name for name, flag in [
+            ("cracking", status.cracking), ("sunburn", status.sunburn), ("mildew", status.mildew_signs),
+            ("botrytis", status.botrytis_signs), ("pests", status.pest_signs),
+        ] if flag
+    ]
+
+def record_events(record) -> List[Dict]:
+    """Events for a newly written farm record: "log_created", plus "alert" for high-severity findings"""
+    if isinstance(record, ScoutingLog):
+        kind = "scan" if record.photo_path else "scouting"
+        events = [{
+            "type": "log_created", "kind": kind, "id": record.id, "issue": record.issue_type,
+            "severity": record.severity, "at": _isoformat(record.observed_at),
+        }]
+        if record.severity >= HIGH_SEVERITY_ISSUE:
+            events.append({
+                "type": "alert", "kind": kind, "id": record.id, "issue": record.issue_type,
+                "severity": record.severity, "block_id": record.block_id,
+            })
+        return events
+    if isinstance(record, CropStatus):
+        issues = _status_issues(record)
+        events = [{
+            "type": "log_created", "kind": "status", "id": record.id, "stage": record.stage,
+            "issues": issues, "at": _isoformat(record.recorded_at),
+        }]
+        if issues:
+            events.append({"type": "alert", "kind": "status", "id": record.id, "issues": issues, "block_id": record.block_id})
+        return events
+    if isinstance(record, IrrigationLog):
+        return [{"type": "log_created", "kind": "irrigation", "id": record.id, "at": _isoformat(record.irrigated_at)}]
+    if isinstance(record, BrixSample):
+        return [{"type": "log_created", "kind": "brix", "id": record.id, "brix": record.brix, "at": _isoformat(record.sampled_at)}]
+    if isinstance(record, SprayLog):
+        return [{"type": "log_created", "kind": "spray", "id": record.id, "at": _isoformat(record.sprayed_at)}]
+    if isinstance(record, Block):
+        return [{"type": "log_created", "kind": "block", "id": record.id, "name": record.name}]
+    return []
+
+class FarmEventBus:
+    """In-process pub/sub of farm writes for connected clients (chat WebSocket)
+
+    Subscribers are called on their own event loop, so publish() is safe
+    from sync endpoints running in worker threads. Events only reach
+    connections served by the same process.
+    """
+
+    def __init__(self):
+        self.subscribers: Dict[str, Dict[int, Callable[[Dict], None]]] = {}
+        self.lock = threading.Lock()
+        self.next_id = 0
+        self.published = 0
+
+    def subscribe(self, farm_id: str, callback: Callable[[Dict], None]) -> Callable[[], None]:
+        """Call `callback(event)` for each event of a farm; returns an unsubscribe function"""
+        loop = asyncio.get_running_loop()
+
+        def deliver(event: Dict):
+            loop.call_soon_threadsafe(callback, event)
+
+        with self.lock:
+            self.next_id += 1
+            subscriber_id = self.next_id
+            self.subscribers.setdefault(farm_id, {})[subscriber_id] = deliver
+
+        def unsubscribe():
+            with self.lock:
+                farm_subscribers = self.subscribers.get(farm_id, {})
+                farm_subscribers.pop(subscriber_id, None)
+                if not farm_subscribers:
+                    self.subscribers.pop(farm_id, None)
+
+        return unsubscribe
+
+    def publish(self, farm_id: Optional[str], event: Dict):
+        with self.lock:
+            deliveries = list(self.subscribers.get(farm_id, {}).values())
+        self.published += 1
+        for deliver in deliveries:
+            try:
+                deliver(event)
+            except RuntimeError:
+                # The subscriber's loop has closed
+                pass
+
+    def publish_record(self, record):
+        """Publish the events for a newly written farm record (no-op without subscribers)"""
+        farm_id = getattr(record, "farm_id", None)
+        if farm_id not in self.subscribers:
+            return
+        for event in record_events(record):
+            self.publish(farm_id, event)
+
+    def get_stats(self) -> Dict:
+        with self.lock:
+            connections = sum(len(s) for s in self.subscribers.values())
+        return {"farms": len(self.subscribers), "subscribers": connections, "published": self.published}
+
+farm_events = FarmEventBus()
@@ -0,0 +1,334 @@
+import logging
+import math
+import os
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import Farm, Block, ScoutingLog, IrrigationLog, BrixSample, SprayLog, CropStatus, ChatMessage
+from app.services.intent_router import normalise
+
+logger = logging.getLogger(__name__)
+
+# Snippets returned per question, and the most farms kept in memory
+TOP_K = int(os.getenv("FARM_RETRIEVAL_TOP_K", "5"))
+MAX_FARMS = int(os.getenv("FARM_RETRIEVAL_MAX_FARMS", "200"))
+# Records scoring below this, or below RELATIVE_SCORE x the best match, are not worth prompt tokens
+MIN_SCORE = float(os.getenv("FARM_RETRIEVAL_MIN_SCORE", "0.3"))
+RELATIVE_SCORE = 0.5
+# Most recent records of each table (and chat questions) indexed per farm when the index is built
+MAX_RECORDS_PER_TABLE = int(os.getenv("FARM_RETRIEVAL_MAX_RECORDS", "500"))
+MAX_CHAT_MESSAGES = 500
+
+SNIPPET_MAX_CHARS = 200
+
+# BM25 parameters
+K1 = 1.5
+B = 0.75
+
+# Words that say nothing about which record is relevant
+STOPWORDS = {
+    "a", "an", "the", "is", "are", "was", "were", "be", "been", "do", "did", "does", "i", "my", "me",
+    "we", "our", "you", "it", "this", "that", "these", "those", "in", "on", "at", "of", "for", "to",
+    "and", "or", "with", "when", "what", "which", "how", "why", "where", "last", "any", "there",
+    "have", "has", "had", "can", "should", "will", "about", "from", "time", "ago",
+    "tell", "please", "know", "give", "show", "get", "need", "want", "farmer", "asked",
+    "क्या", "है", "था", "थी", "में", "का", "की", "के", "को", "और", "कब", "मेरे", "मेरा",
+    "el", "la", "los", "las", "de", "en", "y", "que", "mi", "cuándo", "es", "fue", "un", "una",
+    "आहे", "होते", "मध्ये", "आणि", "केव्हा", "माझ्या",
+}
+
+def tokenize(text: str) -> List[str]:
+    return [token for token in normalise(text) if token not in STOPWORDS and len(token) > 1]
+
+class Document:
+    def __init__(self, doc_id: str, text: str, session_id: Optional[str] = None):
+        self.doc_id = doc_id
+        self.text = text[:SNIPPET_MAX_CHARS]
+        self.session_id = session_id
+        self.term_counts: Dict[str, int] = {}
+        for token in tokenize(text):
+            self.term_counts[token] = self.term_counts.get(token, 0) + 1
+        self.length = sum(self.term_counts.values())
+
+class FarmIndex:
+    """BM25 inverted index over one farm's records"""
+
+    def __init__(self):
+        self.docs: Dict[str, Document] = {}
+        self.postings: Dict[str, Dict[str, int]] = {}
+        self.total_length = 0
+        self.block_names: Dict[str, str] = {}
+
+    def add(self, doc: Document):
+        # Re-adding a record replaces it
+        self.remove(doc.doc_id)
+        self.docs[doc.doc_id] = doc
+        self.total_length += doc.length
+        for term, count in doc.term_counts.items():
+            self.postings.setdefault(term, {})[doc.doc_id] = count
+
+    def remove(self, doc_id: str):
+        doc = self.docs.pop(doc_id, None)
+        if doc is None:
+            return
+        self.total_length -= doc.length
+        for term in doc.term_counts:
+            postings = self.postings.get(term)
+            if postings is not None:
+                postings.pop(doc_id, None)
+                if not postings:
+                    del self.postings[term]
+
+    def search(self, query: str, k: int, exclude_session: Optional[str] = None) -> List[Tuple[float, Document]]:
+        terms = set(tokenize(query))
+        if not terms or not self.docs:
+            return []
+        n = len(self.docs)
+        avg_length = self.total_length / n or 1.0
+        scores: Dict[str, float] = {}
+        for term in terms:
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+            for doc_id, tf in postings.items():
+                doc = self.docs[doc_id]
+                # The current session's turns are already in the prompt history
+                if exclude_session and doc.session_id == exclude_session:
+                    continue
+                length = doc.length
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (K1 + 1) / (
+                    tf + K1 * (1 - B + B * length / avg_length)
+                )
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        results = []
+        cutoff = max(MIN_SCORE, ranked[0][1] * RELATIVE_SCORE) if ranked else MIN_SCORE
+        for doc_id, score in ranked:
+            if score < cutoff:
+                break
+            results.append((score, self.docs[doc_id]))
+            if len(results) >= k:
+                break
+        return results
+
+def _date(value) -> str:
+    return value.strftime("%Y-%m-%d") if value else "unknown date"
+
+def _block(index: FarmIndex, block_id: Optional[str]) -> str:
+    name = index.block_names.get(block_id) if block_id else None
+    return f" ({name})" if name else ""
+
+def _document(index: FarmIndex, kind: str, record) -> Document:
+    """Snippet text for a farm record (an ORM object or a row of its indexed columns)"""
+    if kind == "scouting":
+        label = "scan" if record.photo_path else "scouting"
+        text = f"{_date(record.observed_at)} {label}{_block(index, record.block_id)}: {record.issue_type}, severity {record.severity}/3"
+        if record.notes:
+            text += f" - {record.notes}"
+        return Document(f"scouting:{record.id}", text)
+    if kind == "status":
+        issues = [
+            name for name, flag in [
+                ("cracking", record.cracking), ("sunburn", record.sunburn), ("mildew", record.mildew_signs),
+                ("botrytis", record.botrytis_signs), ("pests", record.pest_signs),
+            ] if flag
+        ]
+        text = f"{_date(record.recorded_at)} status{_block(index, record.block_id)}: stage {record.stage}"
+        if issues:
+            text += f", issues {', '.join(issues)}"
+        if record.notes:
+            text += f" - {record.notes}"
+        return Document(f"status:{record.id}", text)
+    if kind == "irrigation":
+        text = f"{_date(record.irrigated_at)} irrigation{_block(index, record.block_id)}"
+        if record.amount_mm is not None:
+            text += f": {record.amount_mm} mm"
+        if record.duration_min is not None:
+            text += f", {record.duration_min} min"
+        if record.notes:
+            text += f" - {record.notes}"
+        return Document(f"irrigation:{record.id}", text)
+    if kind == "brix":
+        text = f"{_date(record.sampled_at)} brix sample{_block(index, record.block_id)}: {record.brix} °Bx"
+        if record.notes:
+            text += f" - {record.notes}"
+        return Document(f"brix:{record.id}", text)
+    if kind == "spray":
+        # Product names are left out: prompts must not mention chemicals
+        text = f"{_date(record.sprayed_at)} spray{_block(index, record.block_id)}"
+        if record.target_issue:
+            text += f" for {record.target_issue}"
+        if record.notes:
+            text += f" - {record.notes}"
+        return Document(f"spray:{record.id}", text)
+    return Document(f"chat:{record.id}", f"{_date(record.created_at)} farmer asked: {record.content}", record.session_id)
+
+# Per indexed kind: its model, the timestamp that orders it, and the columns its snippet uses
+INDEXED_TABLES = {
+    "scouting": (ScoutingLog, ScoutingLog.observed_at, (
+        ScoutingLog.id, ScoutingLog.observed_at, ScoutingLog.block_id, ScoutingLog.photo_path,
+        ScoutingLog.issue_type, ScoutingLog.severity, ScoutingLog.notes,
+    )),
+    "status": (CropStatus, CropStatus.recorded_at, (
+        CropStatus.id, CropStatus.recorded_at, CropStatus.block_id, CropStatus.stage, CropStatus.cracking,
+        CropStatus.sunburn, CropStatus.mildew_signs, CropStatus.botrytis_signs, CropStatus.pest_signs, CropStatus.notes,
+    )),
+    "irrigation": (IrrigationLog, IrrigationLog.irrigated_at, (
+        IrrigationLog.id, IrrigationLog.irrigated_at, IrrigationLog.block_id,
+        IrrigationLog.amount_mm, IrrigationLog.duration_min, IrrigationLog.notes,
+    )),
+    "brix": (BrixSample, BrixSample.sampled_at, (
+        BrixSample.id, BrixSample.sampled_at, BrixSample.block_id, BrixSample.brix, BrixSample.notes,
+    )),
+    "spray": (SprayLog, SprayLog.sprayed_at, (
+        SprayLog.id, SprayLog.sprayed_at, SprayLog.block_id, SprayLog.target_issue, SprayLog.notes,
+    )),
+}
+MODEL_KINDS = {model: kind for kind, (model, _, _) in INDEXED_TABLES.items()}
+
+def _kind(record) -> Optional[str]:
+    """Indexed kind of an ORM record, or None for records that are not indexed"""
+    if isinstance(record, ChatMessage):
+        return "chat" if (record.role or "").lower() == "user" else None
+    return MODEL_KINDS.get(type(record))
+
+class FarmRetrieval:
+    """Per-farm lexical indexes, built lazily and updated on writes
+
+    Write endpoints call index_record() after committing; farms whose index
+    has not been built yet are skipped (the first search loads the most
+    recent MAX_RECORDS_PER_TABLE records of each table).
+    Writes that arrive while an index is being built are buffered and
+    replayed onto it, since the build's queries may have missed them.
+    """
+
+    def __init__(self, max_farms: int = MAX_FARMS):
+        self.indexes: "OrderedDict[str, FarmIndex]" = OrderedDict()
+        self.max_farms = max_farms
+        # Sync write endpoints run in worker threads
+        self.lock = threading.Lock()
+        # Per farm, one buffer of index updates for each build in flight
+        self.pending_updates: Dict[str, List[List[Callable[[FarmIndex], None]]]] = {}
+        self.builds = 0
+        self.searches = 0
+        self.hits = 0
+
+    def _update(self, farm_id: Optional[str], update: Callable[[FarmIndex], None]):
+        """Apply an update to the farm's index, or buffer it for builds in flight"""
+        with self.lock:
+            for buffer in self.pending_updates.get(farm_id, []):
+                buffer.append(update)
+            index = self.indexes.get(farm_id)
+            if index is not None:
+                update(index)
+
+    def index_record(self, record):
+        """Add or replace one record in its farm's index (if loaded)"""
+        def update(index: FarmIndex):
+            if isinstance(record, Block):
+                index.block_names[record.id] = record.name
+                return
+            kind = _kind(record)
+            if kind is not None:
+                index.add(_document(index, kind, record))
+        self._update(getattr(record, "farm_id", None), update)
+
+    def remove_record(self, record):
+        """Drop one deleted record from its farm's index (if loaded)"""
+        def update(index: FarmIndex):
+            kind = _kind(record)
+            if kind is not None:
+                index.remove(_document(index, kind, record).doc_id)
+        self._update(getattr(record, "farm_id", None), update)
+
+    def clear_chat(self, farm_id: str):
+        """Drop indexed chat messages (after the farm's chat history is cleared)"""
+        def update(index: FarmIndex):
+            for doc_id in [doc_id for doc_id in index.docs if doc_id.startswith("chat:")]:
+                index.remove(doc_id)
+        self._update(farm_id, update)
+
+    async def _build(self, farm: Farm, db: AsyncSession) -> FarmIndex:
+        """Index the farm's most recent records, loading only the columns their snippets use"""
+        index = FarmIndex()
+        blocks = (await db.execute(select(Block.id, Block.name).where(Block.farm_id == farm.id))).all()
+        index.block_names = {block_id: name for block_id, name in blocks}
+        for kind, (model, timestamp, columns) in INDEXED_TABLES.items():
+            rows = (await db.execute(
+                select(*columns).where(model.farm_id == farm.id).order_by(timestamp.desc()).limit(MAX_RECORDS_PER_TABLE)
+            )).all()
+            for row in rows:
+                index.add(_document(index, kind, row))
+        rows = (await db.execute(
+            select(ChatMessage.id, ChatMessage.created_at, ChatMessage.content, ChatMessage.session_id).where(
+                ChatMessage.farm_id == farm.id,
+                ChatMessage.role == "user"
+            ).order_by(ChatMessage.created_at.desc()).limit(MAX_CHAT_MESSAGES)
+        )).all()
+        for row in rows:
+            index.add(_document(index, "chat", row))
+        self.builds += 1
+        logger.info(f"Farm retrieval: Indexed {len(index.docs)} records for farm {farm.id}")
+        return index
+
+    async def get_index(self, farm: Farm, db: AsyncSession) -> FarmIndex:
+        with self.lock:
+            index = self.indexes.get(farm.id)
+            if index is not None:
+                self.indexes.move_to_end(farm.id)
+                return index
+            buffer: List[Callable[[FarmIndex], None]] = []
+            self.pending_updates.setdefault(farm.id, []).append(buffer)
+        try:
+            built = await self._build(farm, db)
+        finally:
+            with self.lock:
+                buffers = self.pending_updates[farm.id]
+                buffers.remove(buffer)
+                if not buffers:
+                    del self.pending_updates[farm.id]
+        with self.lock:
+            # Another request may have built it meanwhile (and received writes since)
+            index = self.indexes.setdefault(farm.id, built)
+            if index is built:
+                # Writes committed during the build; re-adding a record it already has is harmless
+                for update in buffer:
+                    update(index)
+            self.indexes.move_to_end(farm.id)
+            while len(self.indexes) > self.max_farms:
+                self.indexes.popitem(last=False)
+        return index
+
+    async def search(
+        self,
+        farm: Farm,
+        db: AsyncSession,
+        query: str,
+        k: int = TOP_K,
+        exclude_session: Optional[str] = None
+    ) -> List[str]:
+        """Top-k snippets from the farm's history relevant to a question"""
+        index = await self.get_index(farm, db)
+        with self.lock:
+            results = index.search(query, k, exclude_session)
+        self.searches += 1
+        if results:
+            self.hits += 1
+        return [doc.text for score, doc in results]
+
+    def get_stats(self) -> Dict:
+        with self.lock:
+            documents = sum(len(index.docs) for index in self.indexes.values())
+        return {
+            "farms": len(self.indexes),
+            "documents": documents,
+            "builds": self.builds,
+            "searches": self.searches,
+            "searches_with_results": self.hits,
+        }
+
+farm_retrieval = FarmRetrieval()
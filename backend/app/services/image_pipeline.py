@@ -0,0 +1,134 @@
+import asyncio
+import io
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+try:
+    from PIL import Image, ImageOps
+    PIL_AVAILABLE = True
+except ImportError:
+    PIL_AVAILABLE = False
+    logger.warning("Pillow not available, scan photos are sent unprocessed. Install with: pip install Pillow")
+
+# Longest edge of the image sent to the vision model, and its JPEG quality
+MAX_EDGE = int(os.getenv("SCAN_IMAGE_MAX_EDGE", "1024"))
+JPEG_QUALITY = int(os.getenv("SCAN_IMAGE_QUALITY", "85"))
+# Longest edge of the stored thumbnail
+THUMBNAIL_EDGE = int(os.getenv("SCAN_THUMBNAIL_EDGE", "256"))
+THUMBNAIL_QUALITY = 75
+
+STAGES = ("decode", "resize", "encode")
+
+class ProcessedImage:
+    """Image for analysis (JPEG unless left unprocessed), plus an optional thumbnail and 64-bit dHash"""
+
+    def __init__(self, data: bytes, mime_type: str, thumbnail: Optional[bytes] = None, dhash: Optional[int] = None):
+        self.data = data
+        self.mime_type = mime_type
+        self.thumbnail = thumbnail
+        self.dhash = dhash
+
+def _encode(image, quality: int) -> bytes:
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", quality=quality, optimize=True)
+    return buffer.getvalue()
+
+def dhash(image) -> int:
+    """Difference hash: one bit per horizontally adjacent pixel pair of a 9x8 greyscale image
+
+    Near-identical shots (slightly shifted, re-exposed or re-compressed)
+    differ in only a few bits.
+    """
+    pixels = image.convert("L").resize((9, 8), Image.BILINEAR).tobytes()
+    value = 0
+    for row in range(8):
+        for col in range(8):
+            value = (value << 1) | (pixels[row * 9 + col] > pixels[row * 9 + col + 1])
+    return value
+
+def _process_sync(data: bytes) -> Tuple[bytes, bytes, int, Dict[str, float]]:
+    """Decode once, then produce the analysis JPEG, the thumbnail and the dHash"""
+    timings = {}
+    started = time.perf_counter()
+    image = Image.open(io.BytesIO(data))
+    # JPEG can decode straight to a reduced size (DCT scaling), much faster than a full decode
+    image.draft("RGB", (MAX_EDGE, MAX_EDGE))
+    image = ImageOps.exif_transpose(image)
+    if image.mode != "RGB":
+        image = image.convert("RGB")
+    timings["decode"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    image.thumbnail((MAX_EDGE, MAX_EDGE), Image.LANCZOS)
+    thumbnail = image.copy()
+    thumbnail.thumbnail((THUMBNAIL_EDGE, THUMBNAIL_EDGE), Image.LANCZOS)
+    image_hash = dhash(thumbnail)
+    timings["resize"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    analysis = _encode(image, JPEG_QUALITY)
+    thumbnail_data = _encode(thumbnail, THUMBNAIL_QUALITY)
+    timings["encode"] = time.perf_counter() - started
+    return analysis, thumbnail_data, image_hash, timings
+
+class ImagePipeline:
+    """Normalises scan photos (orientation, size, JPEG quality) in worker threads
+
+    Pillow releases the GIL while decoding, resizing and encoding, so a
+    small thread pool keeps this CPU work off the event loop without the
+    cost of copying photos to another process.
+    """
+
+    def __init__(self, workers: int):
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="image")
+        self.images = 0
+        self.failures = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.seconds = {stage: 0.0 for stage in STAGES}
+
+    async def process(self, data: bytes, mime_type: str) -> ProcessedImage:
+        """Analysis image and thumbnail for an upload; the original bytes if it cannot be processed"""
+        if not PIL_AVAILABLE:
+            return ProcessedImage(data, mime_type)
+        loop = asyncio.get_running_loop()
+        try:
+            analysis, thumbnail, image_hash, timings = await loop.run_in_executor(self.executor, _process_sync, data)
+        except Exception as e:
+            self.failures += 1
+            logger.warning(f"Image pipeline: Could not process photo ({len(data)} bytes): {e}")
+            return ProcessedImage(data, mime_type)
+
+        self.images += 1
+        self.bytes_in += len(data)
+        self.bytes_out += len(analysis)
+        for stage, seconds in timings.items():
+            self.seconds[stage] += seconds
+        logger.info(
+            f"Image pipeline: {len(data)} -> {len(analysis)} bytes "
+            f"({', '.join(f'{stage} {seconds * 1000:.0f}ms' for stage, seconds in timings.items())})"
+        )
+        return ProcessedImage(analysis, "image/jpeg", thumbnail, image_hash)
+
+    def close(self):
+        self.executor.shutdown(wait=False)
+
+    def get_stats(self) -> Dict:
+        return {
+            "available": PIL_AVAILABLE,
+            "images": self.images,
+            "failures": self.failures,
+            "bytes_in": self.bytes_in,
+            "bytes_out": self.bytes_out,
+            "avg_ms": {
+                stage: round(seconds * 1000 / self.images, 1) if self.images else 0.0
+                for stage, seconds in self.seconds.items()
+            },
+        }
+
+image_pipeline = ImagePipeline(workers=int(os.getenv("SCAN_IMAGE_WORKERS", "2")))
@@ -0,0 +1,244 @@
+import logging
+import re
+import unicodedata
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+GREETING = "greeting"
+ACKNOWLEDGEMENT = "acknowledgement"
+WHATS_NEW = "whats_new"
+WEATHER = "weather"
+TODAY_PLAN = "today_plan"
+LATEST_STATUS = "latest_status"
+LAST_SCAN = "last_scan"
+
+# Intents answered from farm data (forecast, plan, status, scans) rather than a fixed text
+DATA_INTENTS = {WEATHER, TODAY_PLAN, LATEST_STATUS, LAST_SCAN}
+
+# Short messages only: longer ones usually carry a real question for the LLM
+MAX_SMALL_TALK_CHARS = 20
+MAX_DATA_QUERY_TOKENS = 8
+
+# Phrases per intent (en / hi / es / mr); matched on normalised tokens
+PHRASES: Dict[str, List[str]] = {
+    GREETING: [
+        "hi", "hello", "hey", "namaste", "good morning", "good evening",
+        "good afternoon", "good night", "greetings", "hi there", "hey there",
+        "हाय", "नमस्ते", "नमस्कार", "प्रणाम",
+        "hola", "buenos días", "buenas tardes", "buenas noches", "saludos",
+        "हॅलो",
+    ],
+    ACKNOWLEDGEMENT: [
+        "ok", "okay", "kk", "k", "sure", "cool", "great", "nice",
+        "thanks", "thank you", "thx", "ty", "👍", "👌",
+        "hmm", "hmmm", "yes", "yep",
+        "ठीक है", "धन्यवाद", "शुक्रिया", "हाँ",
+        "vale", "gracias", "sí", "bueno",
+        "ठीक आहे", "धन्यवाद", "हो",
+    ],
+    WHATS_NEW: [
+        "what's new", "whats new", "what is new", "update", "updates",
+        "anything new", "what happened", "what changed",
+        "क्या नया है", "नया क्या है",
+        "qué hay de nuevo", "novedades",
+        "काय नवीन",
+    ],
+    # Data intents: lookup-shaped phrases only, so a question that merely mentions
+    # rain or tasks still reaches the LLM (bare topic words are in TOPIC_WORDS)
+    WEATHER: [
+        "forecast", "weather forecast", "rain forecast", "weather today", "today's weather",
+        "todays weather", "weather tomorrow", "weather this week", "what's the weather",
+        "whats the weather", "what is the weather", "will it rain", "is it going to rain",
+        "rain today", "rain tomorrow", "temperature today",
+        "आज का मौसम", "मौसम कैसा है", "मौसम का हाल", "बारिश होगी", "पूर्वानुमान",
+        "pronóstico", "clima de hoy", "el tiempo hoy", "va a llover", "lloverá",
+        "आजचे हवामान", "हवामान अंदाज", "पाऊस पडेल",
+    ],
+    TODAY_PLAN: [
+        "today's plan", "todays plan", "plan for today", "plan today", "today plan",
+        "what to do today", "what should i do today", "what do i do today",
+        "today's tasks", "todays tasks", "tasks today", "tasks for today",
+        "आज का काम", "आज की योजना", "आज क्या करें",
+        "plan de hoy", "tareas de hoy", "qué hago hoy",
+        "आजचे काम", "आजची योजना", "आज काय करू",
+    ],
+    LATEST_STATUS: [
+        "crop status", "latest status", "crop stage", "current stage", "my status",
+        "फसल की स्थिति",
+        "estado del cultivo",
+        "पिकाची स्थिती",
+    ],
+    LAST_SCAN: [
+        "last scan", "latest scan", "scan result", "my scan", "photo result", "last photo",
+        "पिछला स्कैन", "स्कैन रिजल्ट", "स्कैन का नतीजा",
+        "último escaneo", "resultado del escaneo", "mi escaneo",
+        "शेवटचा स्कॅन", "स्कॅन निकाल",
+    ],
+}
+
+# Bare topic words: a data lookup only when they (plus FILLER_WORDS) are the whole
+# message ("weather?", "my tasks"), never when part of a longer question
+TOPIC_WORDS: Dict[str, List[str]] = {
+    WEATHER: [
+        "weather", "rain", "temperature",
+        "मौसम", "बारिश", "तापमान",
+        "clima", "tiempo", "lluvia", "temperatura",
+        "हवामान", "पाऊस",
+    ],
+    TODAY_PLAN: ["plan", "tasks", "योजना", "tareas"],
+    LATEST_STATUS: ["status", "stage", "स्थिति", "अवस्था", "estado", "etapa", "स्थिती"],
+}
+
+FILLER_WORDS = {
+    "my", "the", "any", "please", "pls", "show", "me", "today", "now", "tomorrow",
+    "मेरा", "मेरी", "आज", "कल",
+    "mi", "el", "la", "hoy", "mañana", "por", "favor",
+    "माझा", "माझी", "उद्या",
+}
+
+# Reasoning or diagnosis questions go to the LLM even when they mention weather, plan, etc.
+REASONING_WORDS = [
+    "why", "how", "should", "if", "can i", "could", "would", "explain", "help me", "mean",
+    "risk", "mildew", "disease", "pest", "rot", "crack", "sunburn", "spray", "damage",
+    "क्यों", "कैसे", "चाहिए", "क्या करूं", "अगर", "मतलब", "समझा", "खतरा", "बीमारी", "फफूंद", "कीट",
+    "por qué", "porque", "cómo", "debo", "debería", "puedo", "si ", "significa", "explica",
+    "riesgo", "mildiu", "plaga",
+    "कसे", "पाहिजे", "काय करू", "अर्थ", "धोका", "रोग", "बुरशी",
+]
+
+_PUNCTUATION = re.compile(r"[?!.,;:¿¡।॥\"()\[\]{}*~_-]+")
+_APOSTROPHES = str.maketrans({"’": "'", "‘": "'", "`": "'"})
+
+def normalise(text: str) -> List[str]:
+    """NFKC + casefold + punctuation stripping, split into tokens"""
+    text = unicodedata.normalize("NFKC", text or "").casefold().translate(_APOSTROPHES)
+    return _PUNCTUATION.sub(" ", text).split()
+
+class PhraseAutomaton:
+    """Aho-Corasick automaton over tokens
+
+    Finds every phrase occurrence in one left-to-right pass, whatever the
+    number of phrases. Matches are (intent, start, end) token spans.
+    """
+
+    def __init__(self, phrases: Dict[str, List[str]]):
+        self.goto: List[Dict[str, int]] = [{}]
+        self.fail: List[int] = [0]
+        self.outputs: List[List[Tuple[str, int]]] = [[]]
+        for intent, items in phrases.items():
+            for phrase in items:
+                self._add(normalise(phrase), intent)
+        self._build()
+
+    def _add(self, tokens: List[str], intent: str):
+        node = 0
+        for token in tokens:
+            if token not in self.goto[node]:
+                self.goto.append({})
+                self.fail.append(0)
+                self.outputs.append([])
+                self.goto[node][token] = len(self.goto) - 1
+            node = self.goto[node][token]
+        if (intent, len(tokens)) not in self.outputs[node]:
+            self.outputs[node].append((intent, len(tokens)))
+
+    def _build(self):
+        # Breadth-first: a node's failure link is the longest proper suffix in the trie
+        queue = deque(self.goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for token, child in self.goto[node].items():
+                queue.append(child)
+                fallback = self.fail[node]
+                while fallback and token not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[child] = self.goto[fallback].get(token, 0)
+                self.outputs[child] = self.outputs[child] + self.outputs[self.fail[child]]
+
+    def find(self, tokens: List[str]) -> List[Tuple[str, int, int]]:
+        matches = []
+        node = 0
+        for i, token in enumerate(tokens):
+            while node and token not in self.goto[node]:
+                node = self.fail[node]
+            node = self.goto[node].get(token, 0)
+            for intent, length in self.outputs[node]:
+                matches.append((intent, i + 1 - length, i + 1))
+        return matches
+
+def _uncovered(tokens: List[str], matches: List[Tuple[str, int, int]]) -> List[str]:
+    """Tokens outside every matched span"""
+    covered = set()
+    for intent, start, end in matches:
+        covered.update(range(start, end))
+    return [token for i, token in enumerate(tokens) if i not in covered]
+
+class IntentRouter:
+    """Classify chat messages that can be answered without the LLM"""
+
+    def __init__(self):
+        self.automaton = PhraseAutomaton(PHRASES)
+        self.topics = PhraseAutomaton(TOPIC_WORDS)
+        self.reasoning_pattern = re.compile("|".join(
+            (r"(?<![a-z])" + re.escape(w)) if w.isascii() else re.escape(w)
+            for w in REASONING_WORDS
+        ))
+        self.counts: Dict[str, int] = {}
+
+    def match(self, text: str) -> Optional[str]:
+        """Return the local intent for a message, or None to use the LLM"""
+        tokens = normalise(text)
+        if not tokens:
+            return None
+        joined = " ".join(tokens)
+        matches = self.automaton.find(tokens)
+        intent = self._classify(tokens, joined, matches)
+        if intent:
+            self.counts[intent] = self.counts.get(intent, 0) + 1
+        return intent
+
+    def _classify(self, tokens: List[str], joined: str, matches: List[Tuple[str, int, int]]) -> Optional[str]:
+        whole = {intent for intent, start, end in matches if start == 0 and end == len(tokens)}
+
+        # "what's new" (whole message, or as the opening words)
+        if WHATS_NEW in whole or joined.startswith(("what's new", "whats new")):
+            return WHATS_NEW
+
+        lookups = [match for match in matches if match[0] in DATA_INTENTS]
+        topics = self.topics.find(tokens)
+        data = {intent for intent, start, end in lookups + topics}
+        short = len(joined) <= MAX_SMALL_TALK_CHARS
+        if short and ACKNOWLEDGEMENT in whole:
+            return ACKNOWLEDGEMENT
+        # Greeting alone or opening a short message ("hi there", "hello friend"),
+        # but not when a question follows ("hola, va a llover?")
+        if short and not data and any(
+            intent == GREETING and start == 0 and len(tokens) - end <= 2
+            for intent, start, end in matches
+        ):
+            return GREETING
+
+        # Narrow lookups answered from farm data: a lookup phrase anywhere in a
+        # short message, or topic words making up the whole message
+        if len(tokens) > MAX_DATA_QUERY_TOKENS:
+            return None
+        if not lookups:
+            rest = _uncovered(tokens, topics)
+            if not topics or any(token not in FILLER_WORDS for token in rest):
+                return None
+            lookups = topics
+        # The lookup phrase itself may hold a reasoning word ("what should i do today")
+        rest = _uncovered(tokens, lookups)
+        if self.reasoning_pattern.search(" ".join(rest) + " "):
+            return None
+        data = {intent for intent, start, end in lookups}
+        if len(data) == 1:
+            return data.pop()
+        return None
+
+    def get_stats(self) -> Dict:
+        return dict(self.counts)
+
+intent_router = IntentRouter()
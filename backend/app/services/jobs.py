@@ -0,0 +1,113 @@
+import asyncio
+import logging
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+class JobRegistry:
+    """In-memory registry for background jobs (pending -> done / failed)"""
+
+    def __init__(self, ttl_minutes: int = 60):
+        self.jobs: Dict[str, Dict] = {}
+        self.events: Dict[str, asyncio.Event] = {}
+        self.by_key: Dict[str, str] = {}
+        self.tasks: set = set()
+        self.ttl = timedelta(minutes=ttl_minutes)
+
+    def _purge(self):
+        now = datetime.now()
+        expired = [
+            job_id for job_id, job in self.jobs.items()
+            if job["finished_at"] and now - job["finished_at"] > self.ttl
+        ]
+        for job_id in expired:
+            job = self.jobs.pop(job_id)
+            self.events.pop(job_id, None)
+            if self.by_key.get(job.get("key")) == job_id:
+                del self.by_key[job["key"]]
+
+    def find_pending(self, key: str) -> Optional[str]:
+        """Return the id of a still-running job for this key, if any"""
+        job_id = self.by_key.get(key)
+        if job_id and job_id in self.jobs and self.jobs[job_id]["status"] == "pending":
+            return job_id
+        return None
+
+    def submit(self, kind: str, coro: Awaitable[Any], key: Optional[str] = None, job_id: Optional[str] = None) -> str:
+        """Schedule a coroutine on the event loop and return its job id
+
+        job_id can be chosen by the caller, e.g. so the coroutine can report
+        progress on its own job.
+        """
+        self._purge()
+        job_id = job_id or str(uuid.uuid4())
+        self.jobs[job_id] = {
+            "job_id": job_id,
+            "kind": kind,
+            "key": key,
+            "status": "pending",
+            "progress": None,
+            "result": None,
+            "error": None,
+            "created_at": datetime.now(),
+            "finished_at": None,
+        }
+        self.events[job_id] = asyncio.Event()
+        if key:
+            self.by_key[key] = job_id
+
+        task = asyncio.create_task(self._run(job_id, coro))
+        # Keep a reference so the task is not garbage collected mid-flight
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+        return job_id
+
+    async def _run(self, job_id: str, coro: Awaitable[Any]):
+        job = self.jobs[job_id]
+        try:
+            job["result"] = await coro
+            job["status"] = "done"
+        except Exception as e:
+            logger.error(f"Job {job_id} ({job['kind']}) failed: {e}")
+            job["error"] = str(e)
+            job["status"] = "failed"
+        finally:
+            job["finished_at"] = datetime.now()
+            self.events[job_id].set()
+
+    def set_progress(self, job_id: str, progress: str):
+        """Record the stage a running job has reached (shown while pending)"""
+        job = self.jobs.get(job_id)
+        if job:
+            job["progress"] = progress
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        """Return a public view of the job, or None if unknown/expired"""
+        job = self.jobs.get(job_id)
+        if not job:
+            return None
+        return {
+            "job_id": job["job_id"],
+            "kind": job["kind"],
+            "status": job["status"],
+            "progress": job["progress"],
+            "result": job["result"],
+            "error": job["error"],
+            "created_at": job["created_at"].isoformat(),
+            "finished_at": job["finished_at"].isoformat() if job["finished_at"] else None,
+        }
+
+    async def wait(self, job_id: str, timeout: float) -> Optional[Dict]:
+        """Wait up to `timeout` seconds for the job to finish, then return it"""
+        event = self.events.get(job_id)
+        if event is None:
+            return None
+        try:
+            await asyncio.wait_for(event.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            pass
+        return self.get(job_id)
+
+jobs = JobRegistry(ttl_minutes=60)
@@ -0,0 +1,171 @@
+import asyncio
+import hashlib
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+BACKEND_DIR = Path(__file__).parent.parent.parent
+
+_WHITESPACE = re.compile(r"\s+")
+
+def _normalise(text: str) -> str:
+    """Collapse whitespace, so re-typed messages hit; case and content are kept exactly"""
+    return _WHITESPACE.sub(" ", (text or "").strip())
+
+class SiteStats:
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+
+    def summary(self) -> Dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else None,
+        }
+
+class LLMResponseCache:
+    """Persistent LLM response cache in a local SQLite file
+
+    Keys are a SHA-256 over the exact model, system prompt and language plus
+    the user content with its whitespace collapsed. Entries expire after `ttl_hours`; once the stored payload
+    exceeds `max_bytes` the least recently used entries are evicted.
+    """
+
+    def __init__(self, path: str, ttl_hours: float = 6, max_bytes: int = 50 * 1024 * 1024):
+        self.path = path
+        self.ttl_seconds = ttl_hours * 3600
+        self.max_bytes = max_bytes
+        self.enabled = os.getenv("LLM_CACHE_ENABLED", "1") != "0"
+        self.stats: Dict[str, SiteStats] = {}
+        self.lock = threading.Lock()
+        self.conn: Optional[sqlite3.Connection] = None
+        self.writes_since_prune = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        if self.conn is None:
+            self.conn = sqlite3.connect(self.path, check_same_thread=False)
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute(
+                """CREATE TABLE IF NOT EXISTS llm_cache (
+                    key TEXT PRIMARY KEY,
+                    site TEXT NOT NULL,
+                    value TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL
+                )"""
+            )
+            self.conn.execute("CREATE INDEX IF NOT EXISTS ix_llm_cache_accessed ON llm_cache (accessed_at)")
+            self.conn.commit()
+        return self.conn
+
+    @staticmethod
+    def make_key(model: str, system: str, user: str, lang: str) -> str:
+        digest = hashlib.sha256()
+        for part in (model, system, _normalise(user), lang):
+            digest.update((part or "").encode("utf-8"))
+            digest.update(b"\x00")
+        return digest.hexdigest()
+
+    def _site(self, site: str) -> SiteStats:
+        if site not in self.stats:
+            self.stats[site] = SiteStats()
+        return self.stats[site]
+
+    def _get_sync(self, key: str) -> Optional[str]:
+        with self.lock:
+            conn = self._connect()
+            row = conn.execute("SELECT value, created_at FROM llm_cache WHERE key = ?", (key,)).fetchone()
+            if not row:
+                return None
+            value, created_at = row
+            now = time.time()
+            if now - created_at > self.ttl_seconds:
+                conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                conn.commit()
+                return None
+            conn.execute("UPDATE llm_cache SET accessed_at = ? WHERE key = ?", (now, key))
+            conn.commit()
+            return value
+
+    def _set_sync(self, site: str, key: str, value: str):
+        with self.lock:
+            conn = self._connect()
+            now = time.time()
+            conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, site, value, size, created_at, accessed_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (key, site, value, len(value.encode("utf-8")), now, now)
+            )
+            conn.commit()
+            self.writes_since_prune += 1
+            if self.writes_since_prune >= 50:
+                self._prune(conn)
+
+    def _prune(self, conn: sqlite3.Connection):
+        """Drop expired entries, then LRU entries until under the size budget"""
+        self.writes_since_prune = 0
+        conn.execute("DELETE FROM llm_cache WHERE created_at < ?", (time.time() - self.ttl_seconds,))
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM llm_cache").fetchone()[0]
+        if total > self.max_bytes:
+            excess = total - self.max_bytes
+            freed = 0
+            victims = []
+            for key, size in conn.execute("SELECT key, size FROM llm_cache ORDER BY accessed_at ASC"):
+                victims.append((key,))
+                freed += size
+                if freed >= excess:
+                    break
+            conn.executemany("DELETE FROM llm_cache WHERE key = ?", victims)
+            logger.info(f"LLM cache: Evicted {len(victims)} entries ({freed} bytes)")
+        conn.commit()
+
+    async def get(self, site: str, key: str) -> Optional[str]:
+        if not self.enabled:
+            return None
+        try:
+            value = await asyncio.to_thread(self._get_sync, key)
+        except sqlite3.Error as e:
+            logger.warning(f"LLM cache: Read failed: {e}")
+            value = None
+        stats = self._site(site)
+        if value is None:
+            stats.misses += 1
+        else:
+            stats.hits += 1
+            logger.info(f"LLM cache: Hit for {site}")
+        return value
+
+    async def set(self, site: str, key: str, value: str):
+        if not self.enabled or not value:
+            return
+        try:
+            await asyncio.to_thread(self._set_sync, site, key, value)
+        except sqlite3.Error as e:
+            logger.warning(f"LLM cache: Write failed: {e}")
+
+    def get_stats(self) -> Dict:
+        return {
+            "enabled": self.enabled,
+            "sites": {site: stats.summary() for site, stats in self.stats.items()},
+        }
+
+    def close(self):
+        with self.lock:
+            if self.conn is not None:
+                self.conn.close()
+                self.conn = None
+
+llm_cache = LLMResponseCache(
+    path=os.getenv("LLM_CACHE_PATH", str(BACKEND_DIR / "llm_cache.sqlite")),
+    ttl_hours=float(os.getenv("LLM_CACHE_TTL_HOURS", "6")),
+    max_bytes=int(float(os.getenv("LLM_CACHE_MAX_MB", "50")) * 1024 * 1024)
+)
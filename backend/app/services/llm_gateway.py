@@ -0,0 +1,278 @@
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Optional
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+try:
+    from openai import AsyncOpenAI, RateLimitError
+    OPENAI_AVAILABLE = True
+except ImportError:
+    OPENAI_AVAILABLE = False
+    logger.warning("OpenAI SDK not available. Install with: pip install openai")
+
+    class RateLimitError(Exception):
+        """Stand-in so _slot's handler still resolves without the SDK"""
+
+def estimate_tokens(*texts: str) -> int:
+    """Rough token estimate (~4 ASCII characters or ~2 other characters per token)
+
+    Devanagari (Hindi/Marathi) and accented text tokenise much less
+    densely than English, so non-ASCII characters are counted separately.
+    """
+    ascii_chars = 0
+    other_chars = 0
+    for text in texts:
+        if text:
+            ascii_count = len(text.encode("ascii", "ignore"))
+            ascii_chars += ascii_count
+            other_chars += len(text) - ascii_count
+    return ascii_chars // 4 + other_chars // 2 + 1
+
+def _parse_endpoint_limits(value: str) -> Dict[str, int]:
+    """Parse "chat=4,advice=2,scan=2" into a dict"""
+    limits = {}
+    for part in value.split(","):
+        if "=" not in part:
+            continue
+        name, limit = part.split("=", 1)
+        try:
+            limits[name.strip()] = max(1, int(limit))
+        except ValueError:
+            logger.warning(f"LLM gateway: Ignoring invalid endpoint limit '{part}'")
+    return limits
+
+class LatencyStats:
+    """Rolling latency samples (seconds) with simple percentiles"""
+
+    def __init__(self, window: int = 500):
+        self.samples: deque = deque(maxlen=window)
+        self.count = 0
+        self.total = 0.0
+
+    def add(self, seconds: float):
+        self.samples.append(seconds)
+        self.count += 1
+        self.total += seconds
+
+    def summary(self) -> Dict:
+        ordered = sorted(self.samples)
+
+        def pct(p: float) -> Optional[float]:
+            if not ordered:
+                return None
+            return round(ordered[min(len(ordered) - 1, int(p * len(ordered)))] * 1000, 1)
+
+        return {
+            "count": self.count,
+            "avg_ms": round(self.total / self.count * 1000, 1) if self.count else None,
+            "p50_ms": pct(0.50),
+            "p95_ms": pct(0.95),
+            "max_ms": round(ordered[-1] * 1000, 1) if ordered else None,
+        }
+
+class TokenBucket:
+    """Tokens-per-minute budget that refills continuously"""
+
+    def __init__(self, tokens_per_minute: int):
+        self.capacity = float(tokens_per_minute)
+        self.tokens = float(tokens_per_minute)
+        self.rate = tokens_per_minute / 60.0
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, amount: int):
+        # A single request larger than the bucket only waits for a full bucket
+        amount = min(float(amount), self.capacity)
+        # The lock keeps waiters FIFO so large requests are not starved
+        async with self.lock:
+            while True:
+                self._refill()
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                await asyncio.sleep((amount - self.tokens) / self.rate)
+
+    def adjust(self, delta: int):
+        """Correct the budget once actual usage is known (delta = estimated - actual)"""
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens + delta)
+
+class EndpointMetrics:
+    def __init__(self):
+        self.in_flight = 0
+        self.calls = 0
+        self.errors = 0
+        self.rate_limited = 0
+        self.tokens = 0
+        self.queue_wait = LatencyStats()
+        self.service_time = LatencyStats()
+
+    def summary(self) -> Dict:
+        return {
+            "in_flight": self.in_flight,
+            "calls": self.calls,
+            "errors": self.errors,
+            "rate_limited": self.rate_limited,
+            "tokens": self.tokens,
+            "queue_wait": self.queue_wait.summary(),
+            "service_time": self.service_time.summary(),
+        }
+
+class LLMGateway:
+    """Shared OpenAI client with concurrency limits and a token-per-minute budget
+
+    One pooled client is created at startup and reused by chat, advice and
+    scan. Every call passes through a per-endpoint semaphore, the token
+    bucket and a global semaphore, in that order.
+    """
+
+    def __init__(self):
+        self.max_concurrency = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+        self.default_endpoint_concurrency = int(os.getenv("LLM_ENDPOINT_CONCURRENCY", "4"))
+        self.endpoint_limits = _parse_endpoint_limits(os.getenv("LLM_ENDPOINT_LIMITS", ""))
+        self.tokens_per_minute = int(os.getenv("LLM_TOKENS_PER_MINUTE", "200000"))
+        self.max_connections = int(os.getenv("LLM_MAX_CONNECTIONS", str(self.max_concurrency)))
+        self.timeout = float(os.getenv("LLM_TIMEOUT_SECONDS", "60"))
+
+        self.client = None
+        self.http_client: Optional[httpx.AsyncClient] = None
+        self.global_semaphore = asyncio.Semaphore(self.max_concurrency)
+        self.endpoint_semaphores: Dict[str, asyncio.Semaphore] = {}
+        self.bucket = TokenBucket(self.tokens_per_minute) if self.tokens_per_minute > 0 else None
+        self.metrics: Dict[str, EndpointMetrics] = {}
+
+    @property
+    def available(self) -> bool:
+        return OPENAI_AVAILABLE and bool(os.getenv("OPENAI_API_KEY"))
+
+    async def start(self):
+        """Create the pooled client (called on app startup)"""
+        if not self.available or self.client is not None:
+            return
+        self.http_client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=self.max_connections,
+                max_keepalive_connections=self.max_connections
+            ),
+            timeout=httpx.Timeout(self.timeout, connect=10.0)
+        )
+        self.client = AsyncOpenAI(
+            api_key=os.getenv("OPENAI_API_KEY"),
+            http_client=self.http_client,
+            max_retries=1
+        )
+        logger.info(
+            f"LLM gateway: Started (global={self.max_concurrency}, "
+            f"connections={self.max_connections}, tpm={self.tokens_per_minute})"
+        )
+
+    async def close(self):
+        """Close the pooled client (called on app shutdown)"""
+        if self.client is not None:
+            await self.client.close()
+        self.client = None
+        self.http_client = None
+
+    def _endpoint_semaphore(self, endpoint: str) -> asyncio.Semaphore:
+        if endpoint not in self.endpoint_semaphores:
+            limit = self.endpoint_limits.get(endpoint, self.default_endpoint_concurrency)
+            self.endpoint_semaphores[endpoint] = asyncio.Semaphore(limit)
+        return self.endpoint_semaphores[endpoint]
+
+    def _metrics(self, endpoint: str) -> EndpointMetrics:
+        if endpoint not in self.metrics:
+            self.metrics[endpoint] = EndpointMetrics()
+        return self.metrics[endpoint]
+
+    @asynccontextmanager
+    async def _slot(self, endpoint: str, estimated_tokens: int):
+        """Wait for endpoint, token and global capacity, then time the call"""
+        if self.client is None:
+            await self.start()
+        if self.client is None:
+            raise RuntimeError("LLM gateway is not available")
+
+        metrics = self._metrics(endpoint)
+        queued_at = time.perf_counter()
+
+        async with self._endpoint_semaphore(endpoint):
+            if self.bucket:
+                await self.bucket.acquire(estimated_tokens)
+            async with self.global_semaphore:
+                started_at = time.perf_counter()
+                metrics.queue_wait.add(started_at - queued_at)
+                metrics.in_flight += 1
+                metrics.calls += 1
+                try:
+                    yield metrics
+                except RateLimitError:
+                    metrics.rate_limited += 1
+                    metrics.errors += 1
+                    logger.warning(f"LLM gateway: Provider rate limit hit on '{endpoint}'")
+                    raise
+                except Exception:
+                    metrics.errors += 1
+                    raise
+                finally:
+                    metrics.in_flight -= 1
+                    metrics.service_time.add(time.perf_counter() - started_at)
+
+    def _record_usage(self, metrics: EndpointMetrics, estimated_tokens: int, usage: Any):
+        actual_tokens = getattr(usage, "total_tokens", None) if usage else None
+        if actual_tokens:
+            metrics.tokens += actual_tokens
+            if self.bucket:
+                self.bucket.adjust(estimated_tokens - actual_tokens)
+
+    async def _call(self, endpoint: str, estimated_tokens: int, request: Callable[[], Awaitable[Any]]) -> Any:
+        async with self._slot(endpoint, estimated_tokens) as metrics:
+            response = await request()
+        self._record_usage(metrics, estimated_tokens, getattr(response, "usage", None))
+        return response
+
+    async def responses_create(self, endpoint: str, estimated_tokens: int, **kwargs) -> Any:
+        """client.responses.create through the limiter"""
+        return await self._call(endpoint, estimated_tokens, lambda: self.client.responses.create(**kwargs))
+
+    async def chat_completions_create(self, endpoint: str, estimated_tokens: int, **kwargs) -> Any:
+        """client.chat.completions.create through the limiter"""
+        return await self._call(endpoint, estimated_tokens, lambda: self.client.chat.completions.create(**kwargs))
+
+    async def responses_stream(self, endpoint: str, estimated_tokens: int, **kwargs) -> AsyncIterator[str]:
+        """Yield output text deltas from a streamed client.responses.create
+
+        The concurrency slot is held until the stream finishes or the
+        consumer stops iterating.
+        """
+        async with self._slot(endpoint, estimated_tokens) as metrics:
+            stream = await self.client.responses.create(stream=True, **kwargs)
+            usage = None
+            async for event in stream:
+                if event.type == "response.output_text.delta":
+                    yield event.delta
+                elif event.type == "response.completed":
+                    usage = getattr(event.response, "usage", None)
+        self._record_usage(metrics, estimated_tokens, usage)
+
+    def get_metrics(self) -> Dict:
+        return {
+            "available": self.available,
+            "max_concurrency": self.max_concurrency,
+            "tokens_per_minute": self.tokens_per_minute,
+            "tokens_available": int(self.bucket.tokens) if self.bucket else None,
+            "endpoints": {name: m.summary() for name, m in self.metrics.items()},
+        }
+
+llm = LLMGateway()
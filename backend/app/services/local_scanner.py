@@ -0,0 +1,217 @@
+import asyncio
+import io
+import logging
+import os
+import time
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+try:
+    from PIL import Image, ImageChops, ImageFilter, ImageStat
+    PIL_AVAILABLE = True
+except ImportError:
+    PIL_AVAILABLE = False
+
+# A trained model bundle (joblib): {"stage": classifier, "issues": {name: binary classifier}}
+MODEL_PATH = os.getenv("SCAN_LOCAL_MODEL_PATH", "")
+# Local predictions at or above this confidence are used without calling the vision model
+CONFIDENCE_THRESHOLD = float(os.getenv("SCAN_LOCAL_CONFIDENCE", "0.85"))
+
+HUE_BINS = 12
+FEATURE_NAMES = (
+    ["h_mean", "s_mean", "v_mean", "h_std", "s_std", "v_std"]
+    + [f"hue_{i}" for i in range(HUE_BINS)]
+    + ["green", "purple", "white", "brown", "dark", "edges", "l_std"]
+)
+
+LOCAL_SCAN_TEXT = {
+    "en": {
+        "summary": "Quick on-device check: stage {stage}. {issues}",
+        "issues": "Possible {names}.",
+        "no_issues": "No clear problem visible.",
+        "actions": ["Check leaves and bunches closely", "Take another photo in good light if unsure", "Consult local agri officer if issues worsen"],
+    },
+    "hi": {
+        "summary": "त्वरित जांच: अवस्था {stage}। {issues}",
+        "issues": "संभावित {names}।",
+        "no_issues": "कोई स्पष्ट समस्या नहीं दिखी।",
+        "actions": ["पत्ते और गुच्छे को बारीकी से जांचें", "संदेह हो तो अच्छी रोशनी में एक और फोटो लें", "समस्या बढ़े तो स्थानीय कृषि अधिकारी से सलाह लें"],
+    },
+    "es": {
+        "summary": "Revisión rápida: etapa {stage}. {issues}",
+        "issues": "Posible {names}.",
+        "no_issues": "No se ve un problema claro.",
+        "actions": ["Revisa hojas y racimos de cerca", "Toma otra foto con buena luz si tienes dudas", "Consulta al técnico agrícola local si empeora"],
+    },
+    "mr": {
+        "summary": "जलद तपासणी: अवस्था {stage}. {issues}",
+        "issues": "संभाव्य {names}.",
+        "no_issues": "कोणतीही स्पष्ट समस्या दिसली नाही.",
+        "actions": ["पाने आणि गुच्छे जवळून तपासा", "शंका असल्यास चांगल्या प्रकाशात दुसरा फोटो घ्या", "समस्या वाढल्यास स्थानिक कृषी अधिकाऱ्याचा सल्ला घ्या"],
+    },
+}
+
+# Features are computed on at most this many pixels per side
+FEATURE_MAX_SIDE = 128
+
+def _hue_degrees(h: int) -> int:
+    return h * 360 // 256
+
+def _mask(channel, test) -> "Image.Image":
+    """255 where test(value) holds, else 0 (a lookup table, not a per-pixel loop)"""
+    return channel.point(lambda value: 255 if test(value) else 0)
+
+def _count(mask) -> int:
+    return mask.histogram()[255]
+
+def extract_features(image) -> List[float]:
+    """Colour and texture features of a (thumbnail-sized) RGB image, in FEATURE_NAMES order
+
+    Pixel classes are built as masks with lookup tables and counted with
+    histograms, so the work stays in Pillow's C code.
+    """
+    factor = max(1, max(image.size) // FEATURE_MAX_SIDE)
+    if factor > 1:
+        image = image.reduce(factor)
+    hsv = image.convert("HSV")
+    stat = ImageStat.Stat(hsv)
+    features = [m / 255 for m in stat.mean] + [s / 255 for s in stat.stddev]
+    total = image.size[0] * image.size[1]
+
+    h, s, v = hsv.split()
+    dark = _mask(v, lambda value: value < 40)
+    # Whitish, low-saturation patches (powdery coating)
+    white = ImageChops.multiply(_mask(s, lambda value: value < 40), _mask(v, lambda value: value > 180))
+    coloured = ImageChops.multiply(_mask(s, lambda value: value >= 40), _mask(v, lambda value: value >= 40))
+    dim = ImageChops.multiply(coloured, _mask(v, lambda value: value < 170))
+    hue_counts = h.histogram(mask=coloured)
+    dim_hue_counts = h.histogram(mask=dim)
+
+    hues = [0] * HUE_BINS
+    for hue, count in enumerate(hue_counts):
+        hues[hue * HUE_BINS // 256] += count
+    green = sum(count for hue, count in enumerate(hue_counts) if 60 <= _hue_degrees(hue) < 160)
+    purple = sum(count for hue, count in enumerate(hue_counts) if _hue_degrees(hue) >= 260)
+    brown = sum(count for hue, count in enumerate(dim_hue_counts) if 10 <= _hue_degrees(hue) < 45)
+    features += [count / total for count in hues]
+    features += [green / total, purple / total, _count(white) / total, brown / total, _count(dark) / total]
+
+    grey = image.convert("L")
+    features.append(ImageStat.Stat(grey.filter(ImageFilter.FIND_EDGES)).mean[0] / 255)
+    features.append(ImageStat.Stat(grey).stddev[0] / 255)
+    return features
+
+class LocalPrediction:
+    def __init__(self, stage: str, issues: List[Dict], confidence: float, source: str):
+        self.stage = stage
+        self.issues = issues
+        self.confidence = confidence
+        self.source = source
+
+    def to_analysis(self, lang: str) -> Dict:
+        """Scan analysis in the same shape as the vision model's"""
+        text = LOCAL_SCAN_TEXT.get(lang, LOCAL_SCAN_TEXT["en"])
+        names = ", ".join(issue["name"] for issue in self.issues)
+        return {
+            "stage": self.stage,
+            "issues": self.issues,
+            "summary": text["summary"].format(
+                stage=self.stage, issues=text["issues"].format(names=names) if names else text["no_issues"]
+            ),
+            "next_actions": list(text["actions"]),
+        }
+
+class ModelBundle:
+    """Trained scikit-learn classifiers over extract_features()"""
+
+    def __init__(self, bundle: Dict):
+        self.stage = bundle["stage"]
+        self.issues = bundle.get("issues", {})
+
+    def predict(self, features: List[float]) -> LocalPrediction:
+        row = [features]
+        probabilities = self.stage.predict_proba(row)[0]
+        best = max(range(len(probabilities)), key=lambda i: probabilities[i])
+        confidence = float(probabilities[best])
+        issues = []
+        for name, classifier in self.issues.items():
+            present = float(classifier.predict_proba(row)[0][1])
+            # Either answer must be confident for the scan as a whole to be
+            confidence = min(confidence, max(present, 1 - present))
+            if present >= 0.5:
+                issues.append({"name": name, "severity": 2 if present >= 0.8 else 1, "confidence": round(present, 2)})
+        return LocalPrediction(str(self.stage.classes_[best]), issues, round(confidence, 3), "model")
+
+def _load_model(path: str) -> Optional[ModelBundle]:
+    if not path:
+        logger.info("Local scanner: No model configured (SCAN_LOCAL_MODEL_PATH), local checks disabled. Train one with scripts/train_local_scanner.py")
+        return None
+    try:
+        # Optional dependencies, only needed with a model
+        import joblib
+    except ImportError:
+        logger.warning(f"Local scanner: Cannot load {path}, local checks disabled. Install with: pip install -r requirements-scanner.txt")
+        return None
+    try:
+        return ModelBundle(joblib.load(path))
+    except Exception as e:
+        logger.warning(f"Local scanner: Could not load model {path}, local checks disabled: {e}")
+        return None
+
+class LocalScanner:
+    """CPU-only pre-filter for scan photos
+
+    Classifies the stored thumbnail from colour and texture features in a
+    few milliseconds with a trained model. Confident predictions replace the
+    vision call; the rest are kept as the answer when the vision model is
+    unavailable. Without a trained model nothing is predicted: an untrained
+    guess is never saved as a scan result.
+    """
+
+    def __init__(self, model_path: str, threshold: float):
+        self.model = _load_model(model_path) if PIL_AVAILABLE else None
+        self.threshold = threshold
+        self.predictions = 0
+        self.confident = 0
+        self.used_as_fallback = 0
+        self.seconds = 0.0
+
+    @property
+    def available(self) -> bool:
+        return PIL_AVAILABLE and self.model is not None
+
+    def _predict_sync(self, thumbnail: bytes) -> LocalPrediction:
+        image = Image.open(io.BytesIO(thumbnail)).convert("RGB")
+        return self.model.predict(extract_features(image))
+
+    async def predict(self, thumbnail: Optional[bytes]) -> Optional[LocalPrediction]:
+        if not thumbnail or not self.available:
+            return None
+        started = time.perf_counter()
+        try:
+            prediction = await asyncio.to_thread(self._predict_sync, thumbnail)
+        except Exception as e:
+            logger.warning(f"Local scanner: Prediction failed: {e}")
+            return None
+        self.predictions += 1
+        self.seconds += time.perf_counter() - started
+        if self.is_confident(prediction):
+            self.confident += 1
+        return prediction
+
+    def is_confident(self, prediction: LocalPrediction) -> bool:
+        return prediction.confidence >= self.threshold
+
+    def get_stats(self) -> Dict:
+        return {
+            "available": self.available,
+            "model": "trained" if self.model else None,
+            "threshold": self.threshold,
+            "predictions": self.predictions,
+            "confident": self.confident,
+            "used_as_fallback": self.used_as_fallback,
+            "avg_ms": round(self.seconds * 1000 / self.predictions, 1) if self.predictions else 0.0,
+        }
+
+local_scanner = LocalScanner(MODEL_PATH, CONFIDENCE_THRESHOLD)
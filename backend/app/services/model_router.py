@@ -0,0 +1,129 @@
+import logging
+import os
+import re
+from typing import Dict, List
+
+from app.services.llm_gateway import LatencyStats
+
+logger = logging.getLogger(__name__)
+
+FAST = "fast"
+QUALITY = "quality"
+
+# Messages longer than this (characters / words) go to the quality tier
+LONG_MESSAGE_CHARS = 240
+LONG_MESSAGE_WORDS = 40
+
+# Context-heavy questions beyond this length also go to the quality tier
+CONTEXT_MESSAGE_CHARS = 80
+
+# Intents that need diagnosis or reasoning rather than a quick lookup
+COMPLEX_KEYWORDS = [
+    # English
+    "why", "how to", "how do", "how can", "should i", "what should", "diagnos", "disease",
+    "mildew", "botrytis", "rot", "fungus", "pest", "insect", "crack", "sunburn", "spots",
+    "yellow", "brown", "wilt", "deficien", "nutrient", "treat", "spray", "prune", "compare",
+    "explain", "plan for", "schedule",
+    # Hindi
+    "क्यों", "कैसे", "बीमारी", "फफूंद", "कीट", "दरार", "इलाज",
+    # Spanish
+    "por qué", "porque", "cómo", "como puedo", "enfermedad", "mildiu", "plaga", "hongo",
+    "grieta", "tratamiento",
+    # Marathi ("का" alone is also the Hindi genitive, so only longer question forms)
+    "कशामुळे", "कशाने", "कारण काय", "कसे", "रोग", "बुरशी", "किडी", "उपाय",
+]
+
+def _model_for(tier: str) -> str:
+    default_model = os.getenv("OPENAI_MODEL", "gpt-5.2")
+    if tier == FAST:
+        return os.getenv("OPENAI_FAST_MODEL", default_model)
+    return os.getenv("OPENAI_QUALITY_MODEL", default_model)
+
+class RouteDecision:
+    def __init__(self, tier: str, reason: str):
+        self.tier = tier
+        self.reason = reason
+        self.model = _model_for(tier)
+
+    @property
+    def can_escalate(self) -> bool:
+        return self.tier == FAST and _model_for(QUALITY) != self.model
+
+    def escalate(self) -> "RouteDecision":
+        return RouteDecision(QUALITY, f"escalated:{self.reason}")
+
+class TierStats:
+    def __init__(self):
+        self.requests = 0
+        self.failures = 0
+        self.escalations = 0
+        self.reasons: Dict[str, int] = {}
+        self.latency = LatencyStats()
+
+    def summary(self) -> Dict:
+        return {
+            "requests": self.requests,
+            "failures": self.failures,
+            "escalations": self.escalations,
+            "reasons": dict(self.reasons),
+            "latency": self.latency.summary(),
+        }
+
+class ModelRouter:
+    """Pick a fast or quality model tier per request and keep per-tier stats"""
+
+    def __init__(self):
+        self.stats: Dict[str, Dict[str, TierStats]] = {}
+        # Latin keywords must start at a word boundary ("rot" should not match "protect")
+        self.complex_pattern = re.compile("|".join(
+            (r"(?<![a-z])" + re.escape(k)) if k.isascii() else re.escape(k)
+            for k in COMPLEX_KEYWORDS
+        ))
+
+    def _tier_stats(self, site: str, tier: str) -> TierStats:
+        site_stats = self.stats.setdefault(site, {})
+        if tier not in site_stats:
+            site_stats[tier] = TierStats()
+        return site_stats[tier]
+
+    def route_chat(self, message: str, needs_context: bool) -> RouteDecision:
+        """Classify a chat message by length, intent keywords and context need"""
+        text = (message or "").strip().lower()
+        if len(text) > LONG_MESSAGE_CHARS or len(text.split()) > LONG_MESSAGE_WORDS:
+            return RouteDecision(QUALITY, "long")
+        if self.complex_pattern.search(text + " "):
+            return RouteDecision(QUALITY, "intent")
+        if needs_context and len(text) > CONTEXT_MESSAGE_CHARS:
+            return RouteDecision(QUALITY, "context")
+        return RouteDecision(FAST, "simple")
+
+    def route_advice(self, issues: List[str], tasks: List[Dict]) -> RouteDecision:
+        """Weekly advice needs the quality tier when there is something to diagnose"""
+        if issues:
+            return RouteDecision(QUALITY, "issues")
+        if any(t.get("priority") == "high" for t in tasks):
+            return RouteDecision(QUALITY, "high_priority_tasks")
+        return RouteDecision(FAST, "routine")
+
+    def record(self, site: str, decision: RouteDecision, seconds: float, ok: bool):
+        stats = self._tier_stats(site, decision.tier)
+        stats.requests += 1
+        stats.reasons[decision.reason] = stats.reasons.get(decision.reason, 0) + 1
+        stats.latency.add(seconds)
+        if not ok:
+            stats.failures += 1
+
+    def record_escalation(self, site: str, decision: RouteDecision):
+        self._tier_stats(site, decision.tier).escalations += 1
+        logger.info(f"Model router: Escalating {site} request from {decision.model} to {_model_for(QUALITY)}")
+
+    def get_stats(self) -> Dict:
+        return {
+            "models": {FAST: _model_for(FAST), QUALITY: _model_for(QUALITY)},
+            "sites": {
+                site: {tier: stats.summary() for tier, stats in tiers.items()}
+                for site, tiers in self.stats.items()
+            },
+        }
+
+model_router = ModelRouter()
@@ -0,0 +1,149 @@
+import logging
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import ScoutingLog, ScoutingLogPhoto, PhotoBlob
+
+logger = logging.getLogger(__name__)
+
+# Scans whose 64-bit dHash differs in at most this many bits count as the same shot (0 disables)
+MAX_DISTANCE = int(os.getenv("SCAN_NEAR_DUPLICATE_DISTANCE", "6"))
+# Only scans from the same farm within this window are reused
+WINDOW_HOURS = float(os.getenv("SCAN_NEAR_DUPLICATE_HOURS", "24"))
+MAX_FARMS = 200
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+def _naive(value: datetime) -> datetime:
+    # Scouting logs are stored as naive local time; aware values come back from Postgres
+    return value.astimezone().replace(tzinfo=None) if value.tzinfo else value
+
+class BKNode:
+    def __init__(self, dhash: int):
+        self.dhash = dhash
+        self.photos: Dict[str, datetime] = {}  # sha256 -> last scanned
+        self.children: Dict[int, "BKNode"] = {}
+
+class BKTree:
+    """Burkhard-Keller tree over dHashes (Hamming distance)
+
+    A query only visits children whose edge distance is within
+    `max_distance` of the query's distance to the node, so most of the
+    tree is skipped for small radii.
+    """
+
+    def __init__(self):
+        self.root: Optional[BKNode] = None
+        self.size = 0
+
+    def add(self, dhash: int, sha256: str, scanned_at: datetime):
+        node = self.root
+        if node is None:
+            self.root = node = BKNode(dhash)
+        while node.dhash != dhash:
+            distance = hamming(dhash, node.dhash)
+            child = node.children.get(distance)
+            if child is None:
+                child = node.children[distance] = BKNode(dhash)
+            node = child
+        if sha256 not in node.photos:
+            self.size += 1
+        node.photos[sha256] = max(scanned_at, node.photos.get(sha256, scanned_at))
+
+    def search(self, dhash: int, max_distance: int) -> List[Tuple[int, str, datetime]]:
+        """(distance, sha256, scanned_at) for every photo within max_distance"""
+        results = []
+        stack = [self.root] if self.root else []
+        while stack:
+            node = stack.pop()
+            distance = hamming(dhash, node.dhash)
+            if distance <= max_distance:
+                results.extend((distance, sha256, at) for sha256, at in node.photos.items())
+            for edge, child in node.children.items():
+                if distance - max_distance <= edge <= distance + max_distance:
+                    stack.append(child)
+        return results
+
+class NearDuplicateIndex:
+    """Per-farm BK-trees of recent scan photos, built lazily and updated on new scans"""
+
+    def __init__(self, max_distance: int = MAX_DISTANCE, window: timedelta = timedelta(hours=WINDOW_HOURS)):
+        self.max_distance = max_distance
+        self.window = window
+        self.trees: "OrderedDict[str, BKTree]" = OrderedDict()
+        self.lock = threading.Lock()
+        self.lookups = 0
+        self.matches = 0
+
+    async def _build(self, farm_id: str, db: AsyncSession) -> BKTree:
+        tree = BKTree()
+        since = datetime.now() - self.window
+        rows = (await db.execute(
+            select(PhotoBlob.sha256, PhotoBlob.dhash, func.max(ScoutingLog.observed_at)).join(
+                ScoutingLogPhoto, ScoutingLogPhoto.sha256 == PhotoBlob.sha256
+            ).join(
+                ScoutingLog, ScoutingLog.id == ScoutingLogPhoto.scouting_log_id
+            ).where(
+                ScoutingLog.farm_id == farm_id,
+                ScoutingLog.observed_at >= since,
+                PhotoBlob.dhash.isnot(None)
+            ).group_by(PhotoBlob.sha256, PhotoBlob.dhash)
+        )).all()
+        for sha256, dhash, observed_at in rows:
+            tree.add(int(dhash, 16), sha256, _naive(observed_at))
+        return tree
+
+    async def find(self, farm_id: str, db: AsyncSession, dhash: int, exclude: Optional[str] = None) -> Optional[Tuple[str, int]]:
+        """Closest recent scan of the same farm as (sha256, distance), or None"""
+        if self.max_distance <= 0:
+            return None
+        with self.lock:
+            tree = self.trees.get(farm_id)
+            if tree is not None:
+                self.trees.move_to_end(farm_id)
+        if tree is None:
+            built = await self._build(farm_id, db)
+            with self.lock:
+                tree = self.trees.setdefault(farm_id, built)
+                while len(self.trees) > MAX_FARMS:
+                    self.trees.popitem(last=False)
+
+        since = datetime.now() - self.window
+        with self.lock:
+            candidates = [
+                (distance, sha256) for distance, sha256, at in tree.search(dhash, self.max_distance)
+                if at >= since and sha256 != exclude
+            ]
+        self.lookups += 1
+        if not candidates:
+            return None
+        self.matches += 1
+        distance, sha256 = min(candidates)
+        return sha256, distance
+
+    def add(self, farm_id: str, dhash: int, sha256: str, scanned_at: datetime):
+        """Record a new scan (farms whose tree is not built yet pick it up on build)"""
+        with self.lock:
+            tree = self.trees.get(farm_id)
+            if tree is not None:
+                tree.add(dhash, sha256, _naive(scanned_at))
+
+    def get_stats(self) -> Dict:
+        with self.lock:
+            photos = sum(tree.size for tree in self.trees.values())
+        return {
+            "max_distance": self.max_distance,
+            "farms": len(self.trees),
+            "photos": photos,
+            "lookups": self.lookups,
+            "matches": self.matches,
+        }
+
+near_duplicates = NearDuplicateIndex()
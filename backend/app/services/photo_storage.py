@@ -0,0 +1,321 @@
+import asyncio
+import logging
+import os
+import uuid
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+try:
+    import boto3
+    BOTO3_AVAILABLE = True
+except ImportError:
+    BOTO3_AVAILABLE = False
+
+BACKEND_DIR = Path(__file__).parent.parent.parent
+
+# "local" (default) or "s3"
+STORAGE_BACKEND = os.getenv("PHOTO_STORAGE", "local").lower()
+LOCAL_DIR = Path(os.getenv("PHOTO_LOCAL_DIR", str(BACKEND_DIR / "uploads")))
+# Lifetime of presigned photo URLs (S3)
+URL_EXPIRES_SECONDS = int(os.getenv("PHOTO_URL_EXPIRES_SECONDS", "3600"))
+
+# S3 multipart parts must be at least 5 MB (except the last)
+S3_PART_SIZE = 5 * 1024 * 1024
+
+def shard(name: str) -> str:
+    """Fan names out over two directory levels from their first characters: ab/cd/abcd....jpg
+
+    Photos are named by content hash, so the levels fill evenly and no
+    directory grows past a few hundred entries.
+    """
+    return f"{name[:2]}/{name[2:4]}/{name}"
+
+class Upload(ABC):
+    """An upload in progress: write() chunks, then commit(name) or abort()"""
+
+    @abstractmethod
+    async def write(self, chunk: bytes):
+        ...
+
+    @abstractmethod
+    async def commit(self, name: str):
+        ...
+
+    @abstractmethod
+    async def abort(self):
+        ...
+
+class PhotoStorage(ABC):
+    """Where photo files live; photos are addressed by file name (e.g. <sha256>.jpg)"""
+
+    name = "base"
+
+    @abstractmethod
+    async def begin_upload(self) -> Upload:
+        ...
+
+    @abstractmethod
+    async def put(self, name: str, data: bytes):
+        ...
+
+    @abstractmethod
+    async def get(self, name: str, byte_range: Optional[Tuple[int, int]] = None) -> Optional[bytes]:
+        """File contents, or the inclusive (start, end) byte range of it; None if missing"""
+
+    @abstractmethod
+    async def exists(self, name: str) -> bool:
+        ...
+
+    @abstractmethod
+    async def delete(self, name: str):
+        ...
+
+    def local_path(self, name: str) -> Optional[Path]:
+        """File to serve directly, for backends on the local disk"""
+        return None
+
+    async def url(self, name: str) -> Optional[str]:
+        """Time-limited URL for the client to fetch the photo from, if the backend has one"""
+        return None
+
+class LocalUpload(Upload):
+    def __init__(self, storage: "LocalPhotoStorage"):
+        self.storage = storage
+        self.partial = storage.incoming / f"{uuid.uuid4()}.part"
+        self.handle = None
+
+    async def write(self, chunk: bytes):
+        if self.handle is None:
+            self.handle = await asyncio.to_thread(open, self.partial, "wb")
+        await asyncio.to_thread(self.handle.write, chunk)
+
+    async def _close(self):
+        if self.handle is None:
+            self.handle = await asyncio.to_thread(open, self.partial, "wb")
+        await asyncio.to_thread(self.handle.close)
+
+    async def commit(self, name: str):
+        await self._close()
+        path = self.storage.sharded_path(name)
+        await asyncio.to_thread(path.parent.mkdir, parents=True, exist_ok=True)
+        await asyncio.to_thread(os.replace, self.partial, path)
+
+    async def abort(self):
+        await self._close()
+        await asyncio.to_thread(self.partial.unlink, True)
+
+class LocalPhotoStorage(PhotoStorage):
+    """Photos on the local disk, sharded as <root>/ab/cd/<name>
+
+    Uploads are written to <root>/.incoming and renamed into place, so a
+    partial file is never visible. Files from before sharding (directly
+    under the root) are still found.
+    """
+
+    name = "local"
+
+    def __init__(self, root: Path):
+        self.root = root
+        self.incoming = root / ".incoming"
+        self.incoming.mkdir(parents=True, exist_ok=True)
+
+    def sharded_path(self, name: str) -> Path:
+        return self.root / shard(name)
+
+    def _find(self, name: str) -> Optional[Path]:
+        for path in (self.sharded_path(name), self.root / name):
+            if path.is_file():
+                return path
+        return None
+
+    async def begin_upload(self) -> Upload:
+        return LocalUpload(self)
+
+    async def put(self, name: str, data: bytes):
+        upload = LocalUpload(self)
+        try:
+            await upload.write(data)
+            await upload.commit(name)
+        except BaseException:
+            await upload.abort()
+            raise
+
+    def _read(self, name: str, byte_range: Optional[Tuple[int, int]]) -> Optional[bytes]:
+        path = self._find(name)
+        if path is None:
+            return None
+        with open(path, "rb") as f:
+            if byte_range is None:
+                return f.read()
+            start, end = byte_range
+            f.seek(start)
+            return f.read(end - start + 1)
+
+    async def get(self, name: str, byte_range: Optional[Tuple[int, int]] = None) -> Optional[bytes]:
+        return await asyncio.to_thread(self._read, name, byte_range)
+
+    async def exists(self, name: str) -> bool:
+        return await asyncio.to_thread(self._find, name) is not None
+
+    async def delete(self, name: str):
+        path = await asyncio.to_thread(self._find, name)
+        if path is not None:
+            await asyncio.to_thread(path.unlink, True)
+
+    def local_path(self, name: str) -> Optional[Path]:
+        return self._find(name)
+
+class S3Upload(Upload):
+    """Streams to a temporary key with a multipart upload, copied to the final key on commit
+
+    The final name (content hash) is only known once the whole upload has
+    been read. Uploads smaller than one part skip the temporary key and
+    are written with a single put.
+    """
+
+    def __init__(self, storage: "S3PhotoStorage"):
+        self.storage = storage
+        self.temp_key = f"{storage.prefix}.incoming/{uuid.uuid4()}"
+        self.buffer: List[bytes] = []
+        self.buffered = 0
+        self.upload_id: Optional[str] = None
+        self.parts: List[Dict] = []
+
+    async def _upload_part(self):
+        client = self.storage.client
+        if self.upload_id is None:
+            response = await asyncio.to_thread(
+                client.create_multipart_upload, Bucket=self.storage.bucket, Key=self.temp_key
+            )
+            self.upload_id = response["UploadId"]
+        number = len(self.parts) + 1
+        response = await asyncio.to_thread(
+            client.upload_part, Bucket=self.storage.bucket, Key=self.temp_key,
+            UploadId=self.upload_id, PartNumber=number, Body=b"".join(self.buffer)
+        )
+        self.parts.append({"PartNumber": number, "ETag": response["ETag"]})
+        self.buffer = []
+        self.buffered = 0
+
+    async def write(self, chunk: bytes):
+        self.buffer.append(chunk)
+        self.buffered += len(chunk)
+        if self.buffered >= S3_PART_SIZE:
+            await self._upload_part()
+
+    async def commit(self, name: str):
+        client = self.storage.client
+        bucket = self.storage.bucket
+        if self.upload_id is None:
+            await self.storage.put(name, b"".join(self.buffer))
+            return
+        if self.buffer:
+            await self._upload_part()
+        await asyncio.to_thread(
+            client.complete_multipart_upload, Bucket=bucket, Key=self.temp_key,
+            UploadId=self.upload_id, MultipartUpload={"Parts": self.parts}
+        )
+        await asyncio.to_thread(
+            client.copy_object, Bucket=bucket, Key=self.storage.key(name),
+            CopySource={"Bucket": bucket, "Key": self.temp_key}
+        )
+        await asyncio.to_thread(client.delete_object, Bucket=bucket, Key=self.temp_key)
+
+    async def abort(self):
+        if self.upload_id is not None:
+            await asyncio.to_thread(
+                self.storage.client.abort_multipart_upload, Bucket=self.storage.bucket,
+                Key=self.temp_key, UploadId=self.upload_id
+            )
+
+class S3PhotoStorage(PhotoStorage):
+    """Photos in an S3-compatible bucket (AWS S3, MinIO, ...), served via presigned URLs
+
+    boto3 is synchronous, so every call runs in a worker thread.
+    Credentials come from the usual AWS environment variables / config.
+    """
+
+    name = "s3"
+
+    def __init__(
+        self,
+        bucket: str,
+        prefix: str = "",
+        endpoint_url: Optional[str] = None,
+        region: Optional[str] = None,
+        client=None
+    ):
+        self.bucket = bucket
+        self.prefix = prefix.strip("/") + "/" if prefix.strip("/") else ""
+        self.client = client or boto3.client("s3", endpoint_url=endpoint_url or None, region_name=region or None)
+
+    def key(self, name: str) -> str:
+        return f"{self.prefix}{shard(name)}"
+
+    async def begin_upload(self) -> Upload:
+        return S3Upload(self)
+
+    async def put(self, name: str, data: bytes):
+        await asyncio.to_thread(self.client.put_object, Bucket=self.bucket, Key=self.key(name), Body=data)
+
+    @staticmethod
+    def _is_missing(error: Exception) -> bool:
+        return error.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound")
+
+    async def get(self, name: str, byte_range: Optional[Tuple[int, int]] = None) -> Optional[bytes]:
+        params = {"Bucket": self.bucket, "Key": self.key(name)}
+        if byte_range is not None:
+            params["Range"] = f"bytes={byte_range[0]}-{byte_range[1]}"
+        try:
+            response = await asyncio.to_thread(self.client.get_object, **params)
+        except self.client.exceptions.ClientError as e:
+            if self._is_missing(e):
+                return None
+            raise
+        return await asyncio.to_thread(response["Body"].read)
+
+    async def exists(self, name: str) -> bool:
+        try:
+            await asyncio.to_thread(self.client.head_object, Bucket=self.bucket, Key=self.key(name))
+            return True
+        except self.client.exceptions.ClientError as e:
+            if self._is_missing(e):
+                return False
+            raise
+
+    async def delete(self, name: str):
+        await asyncio.to_thread(self.client.delete_object, Bucket=self.bucket, Key=self.key(name))
+
+    async def url(self, name: str) -> Optional[str]:
+        return await asyncio.to_thread(
+            self.client.generate_presigned_url, "get_object",
+            Params={"Bucket": self.bucket, "Key": self.key(name)}, ExpiresIn=URL_EXPIRES_SECONDS
+        )
+
+def create_storage() -> PhotoStorage:
+    """Backend from PHOTO_STORAGE; a misconfigured S3 setup fails at startup
+
+    Falling back to local disk would scatter photos over the nodes of a
+    multi-instance deployment.
+    """
+    if STORAGE_BACKEND == "s3":
+        bucket = os.getenv("S3_BUCKET")
+        if not BOTO3_AVAILABLE:
+            raise RuntimeError("PHOTO_STORAGE=s3 needs boto3. Install with: pip install boto3")
+        if not bucket:
+            raise RuntimeError("PHOTO_STORAGE=s3 needs S3_BUCKET")
+        logger.info(f"Photo storage: S3 bucket {bucket} ({os.getenv('S3_ENDPOINT_URL') or 'AWS'})")
+        return S3PhotoStorage(
+            bucket,
+            prefix=os.getenv("S3_PREFIX", "photos"),
+            endpoint_url=os.getenv("S3_ENDPOINT_URL"),
+            region=os.getenv("S3_REGION")
+        )
+    if STORAGE_BACKEND != "local":
+        raise RuntimeError(f"Unknown PHOTO_STORAGE {STORAGE_BACKEND!r} (use local or s3)")
+    return LocalPhotoStorage(LOCAL_DIR)
+
+photo_storage = create_storage()
@@ -0,0 +1,267 @@
+import hashlib
+import logging
+import os
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from fastapi import UploadFile
+from sqlalchemy import delete, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import PhotoBlob, ScanResult
+from app.services.photo_storage import photo_storage, Upload
+
+logger = logging.getLogger(__name__)
+
+# Largest photo accepted by /api/scan
+MAX_UPLOAD_BYTES = int(float(os.getenv("SCAN_MAX_UPLOAD_MB", "15")) * 1024 * 1024)
+CHUNK_SIZE = 1024 * 1024
+
+MIME_TYPES = {
+    ".png": "image/png", ".jpg": "image/jpeg", ".jpeg": "image/jpeg", ".webp": "image/webp",
+    ".gif": "image/gif", ".heic": "image/heic",
+}
+
+# ISO-BMFF brands of HEIF/HEIC photos (iPhone and recent Android cameras)
+HEIF_BRANDS = {b"heic", b"heix", b"hevc", b"hevx", b"heim", b"heis", b"mif1", b"msf1"}
+
+UNSUPPORTED_IMAGE = "Photo must be a JPEG, PNG, WebP, GIF or HEIC image"
+
+class UploadTooLarge(Exception):
+    pass
+
+class UnsupportedImage(Exception):
+    pass
+
+class SavedPhoto:
+    """A stored upload, with its bytes kept for analysis
+
+    duplicate is True when the same photo was already stored; has_dhash
+    when its perceptual hash is already recorded.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        photo_path: str,
+        data: bytes,
+        sha256: str,
+        mime_type: str,
+        duplicate: bool = False,
+        has_dhash: bool = False
+    ):
+        self.name = name
+        self.photo_path = photo_path
+        self.data = data
+        self.sha256 = sha256
+        self.mime_type = mime_type
+        self.duplicate = duplicate
+        self.has_dhash = has_dhash
+        self.thumbnail_path: Optional[str] = None
+
+    @property
+    def size(self) -> int:
+        return len(self.data)
+
+def mime_type_for(suffix: str) -> str:
+    suffix = suffix.lower()
+    return MIME_TYPES.get(suffix, f"image/{suffix[1:]}" if suffix else "image/jpeg")
+
+def sniff_image_type(data: bytes) -> Optional[Tuple[str, str]]:
+    """(suffix, MIME type) of an image from its leading bytes, or None if not a supported format"""
+    if data.startswith(b"\xff\xd8\xff"):
+        return ".jpg", "image/jpeg"
+    if data.startswith(b"\x89PNG\r\n\x1a\n"):
+        return ".png", "image/png"
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return ".webp", "image/webp"
+    if data[:6] in (b"GIF87a", b"GIF89a"):
+        return ".gif", "image/gif"
+    if data[4:8] == b"ftyp" and data[8:12] in HEIF_BRANDS:
+        return ".heic", "image/heic"
+    return None
+
+def photo_name(photo_path: str) -> str:
+    """Storage name of a photo_path ("uploads/<name>" -> "<name>")"""
+    return Path(photo_path).name
+
+def thumbnail_name(name: str) -> str:
+    return f"{Path(name).stem}.thumb.jpg"
+
+async def _read_chunks(file: UploadFile, max_bytes: int):
+    size = 0
+    while True:
+        chunk = await file.read(CHUNK_SIZE)
+        if not chunk:
+            return
+        size += len(chunk)
+        if size > max_bytes:
+            raise UploadTooLarge(f"Photo is larger than {max_bytes / (1024 * 1024):g} MB")
+        yield chunk
+
+async def _stream_upload(file: UploadFile, upload: Upload, max_bytes: int) -> Tuple[bytes, str]:
+    digest = hashlib.sha256()
+    chunks = []
+    try:
+        async for chunk in _read_chunks(file, max_bytes):
+            digest.update(chunk)
+            chunks.append(chunk)
+            await upload.write(chunk)
+    except BaseException:
+        await upload.abort()
+        raise
+    return b"".join(chunks), digest.hexdigest()
+
+async def read_upload(file: UploadFile, max_bytes: int = MAX_UPLOAD_BYTES) -> bytes:
+    """Read a whole upload into memory without storing it
+
+    Raises UploadTooLarge or UnsupportedImage as save_upload does. Used to
+    check every photo of a batch before any of them is stored.
+    """
+    data = b"".join([chunk async for chunk in _read_chunks(file, max_bytes)])
+    if sniff_image_type(data[:32]) is None:
+        raise UnsupportedImage(UNSUPPORTED_IMAGE)
+    return data
+
+async def save_upload(
+    file: UploadFile,
+    db: AsyncSession,
+    max_bytes: int = MAX_UPLOAD_BYTES
+) -> SavedPhoto:
+    """Stream an upload to photo storage under its content hash
+
+    The upload is written in chunks to a temporary location while being
+    hashed, then committed as `<sha256><ext>`, with the extension and MIME
+    type taken from the image bytes (the client's filename and content type
+    are not trusted). A photo that is already stored is not kept twice: the
+    upload is discarded and the existing blob is returned with
+    duplicate=True. Nothing is kept when it raises UploadTooLarge (once
+    max_bytes is exceeded) or UnsupportedImage.
+
+    References are counted by the scouting logs that use a photo
+    (add_reference), not here.
+    """
+    upload = await photo_storage.begin_upload()
+    data, sha256 = await _stream_upload(file, upload, max_bytes)
+    return await _store(db, upload, data, sha256)
+
+async def save_photo(data: bytes, db: AsyncSession) -> SavedPhoto:
+    """Store photo bytes already read with read_upload, as save_upload does"""
+    upload = await photo_storage.begin_upload()
+    try:
+        await upload.write(data)
+    except BaseException:
+        await upload.abort()
+        raise
+    return await _store(db, upload, data, hashlib.sha256(data).hexdigest())
+
+async def _store(db: AsyncSession, upload: Upload, data: bytes, sha256: str) -> SavedPhoto:
+    """Commit a written upload as `<sha256><ext>`, or discard it if the photo is already stored"""
+    image_type = sniff_image_type(data[:32])
+    if image_type is None:
+        await upload.abort()
+        raise UnsupportedImage(UNSUPPORTED_IMAGE)
+    suffix, mime_type = image_type
+
+    blob = await db.get(PhotoBlob, sha256)
+    if blob is None:
+        name = f"{sha256}{suffix}"
+        await upload.commit(name)
+        db.add(PhotoBlob(
+            sha256=sha256,
+            path=f"uploads/{name}",
+            mime_type=mime_type,
+            size=len(data)
+        ))
+        try:
+            await db.commit()
+        except IntegrityError:
+            # The same photo was stored by a concurrent upload (same bytes, same name)
+            await db.rollback()
+            blob = await db.get(PhotoBlob, sha256)
+        else:
+            logger.info(f"Photo store: Saved {name} ({len(data)} bytes, {photo_storage.name})")
+            return SavedPhoto(name, f"uploads/{name}", data, sha256, mime_type)
+    else:
+        name = photo_name(blob.path)
+        if await photo_storage.exists(name):
+            await upload.abort()
+        else:
+            # The row outlived its file: store it again
+            await upload.commit(name)
+
+    photo = await _stored_photo(blob, data)
+    logger.info(f"Photo store: {blob.path} already stored, reusing it")
+    return photo
+
+async def _stored_photo(blob: PhotoBlob, data: bytes) -> SavedPhoto:
+    photo = SavedPhoto(
+        photo_name(blob.path), blob.path, data, blob.sha256, blob.mime_type,
+        duplicate=True, has_dhash=blob.dhash is not None
+    )
+    if await photo_storage.exists(thumbnail_name(photo.name)):
+        photo.thumbnail_path = str(Path(blob.path).with_name(thumbnail_name(photo.name)))
+    return photo
+
+async def load_photo(db: AsyncSession, name: str) -> Optional[SavedPhoto]:
+    """Reload a stored photo by its storage name, or None if it is gone
+
+    Background scans are queued with the name only and read the bytes
+    back here, so pending jobs do not hold uploads in memory.
+    """
+    blob = (await db.execute(select(PhotoBlob).where(PhotoBlob.path == f"uploads/{name}"))).scalars().first()
+    if blob is None:
+        return None
+    data = await photo_storage.get(name)
+    if data is None:
+        return None
+    return await _stored_photo(blob, data)
+
+async def add_reference(db: AsyncSession, sha256: str):
+    """Count one more scouting log using a photo (committed with the log)"""
+    await db.execute(
+        update(PhotoBlob).where(PhotoBlob.sha256 == sha256).values(ref_count=PhotoBlob.ref_count + 1)
+    )
+
+async def release(db: AsyncSession, sha256s: List[str]):
+    """Drop a deleted scouting log's references to its photos, and commit
+
+    Pending changes (the log deletion) are committed in the same
+    transaction. Each photo, its thumbnail and its stored analyses are
+    deleted with its last reference.
+    """
+    deleted = []
+    for sha256 in sha256s:
+        await db.execute(
+            update(PhotoBlob).where(PhotoBlob.sha256 == sha256, PhotoBlob.ref_count > 0)
+            .values(ref_count=PhotoBlob.ref_count - 1)
+        )
+        # Conditional, so a scan that took a reference in the meantime keeps the photo
+        path = (await db.execute(
+            delete(PhotoBlob).where(PhotoBlob.sha256 == sha256, PhotoBlob.ref_count <= 0).returning(PhotoBlob.path)
+        )).scalar()
+        if path:
+            await db.execute(delete(ScanResult).where(ScanResult.sha256 == sha256))
+            deleted.append(path)
+    await db.commit()
+    for path in deleted:
+        name = photo_name(path)
+        await photo_storage.delete(name)
+        await photo_storage.delete(thumbnail_name(name))
+        logger.info(f"Photo store: Deleted {name}, no scouting log uses it")
+
+async def set_dhash(db: AsyncSession, sha256: str, dhash: int):
+    """Record a photo's perceptual hash
+
+    Committed straight away: an open write transaction would hold SQLite's
+    write lock through the vision call that follows.
+    """
+    await db.execute(update(PhotoBlob).where(PhotoBlob.sha256 == sha256).values(dhash=f"{dhash:016x}"))
+    await db.commit()
+
+async def save_thumbnail(photo: SavedPhoto, data: bytes):
+    """Store a JPEG thumbnail alongside the photo (`<name>.thumb.jpg`)"""
+    name = thumbnail_name(photo.name)
+    await photo_storage.put(name, data)
+    photo.thumbnail_path = str(Path(photo.photo_path).with_name(name))
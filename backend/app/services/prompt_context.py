@@ -0,0 +1,143 @@
+import logging
+import os
+import re
+from typing import Dict, List, Optional, Tuple
+
+from app.services.farm_context_cache import compact_json
+from app.services.llm_gateway import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+# Token budget for the farm context part of a chat prompt
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CHAT_CONTEXT_TOKEN_BUDGET", "400"))
+
+# Farm context sections, most important first (dropped from the end when over budget)
+# "records" holds the snippets retrieved from the farm's full history
+SECTION_PRIORITY = [
+    "latest_status", "records", "weather_forecast", "last_scan", "recent_scouting",
+    "recent_irrigation", "recent_brix", "block", "farm",
+]
+
+# Topic -> (keywords, sections the answer needs)
+TOPICS: Dict[str, Tuple[List[str], List[str]]] = {
+    "weather": (
+        ["weather", "forecast", "rain", "temperature", "heat", "frost", "humid",
+         "मौसम", "बारिश", "तापमान", "clima", "tiempo", "lluvia", "temperatura", "हवामान", "पाऊस"],
+        ["weather_forecast", "latest_status"],
+    ),
+    "irrigation": (
+        ["irrigation", "irrigate", "water", "drip", "सिंचाई", "पानी", "riego", "regar", "agua", "पाणी"],
+        ["recent_irrigation", "weather_forecast", "latest_status", "block"],
+    ),
+    "disease": (
+        ["issue", "problem", "mildew", "sunburn", "crack", "pest", "botrytis", "disease", "spray",
+         "scout", "spot", "rot", "बीमारी", "फफूंद", "कीट", "दरार", "समस्या", "छिड़काव",
+         "enfermedad", "mildiu", "plaga", "grieta", "problema", "rociar", "रोग", "बुरशी", "फवारणी"],
+        ["latest_status", "recent_scouting", "last_scan", "weather_forecast"],
+    ),
+    "harvest": (
+        ["brix", "harvest", "sweet", "sugar", "ripe", "ब्रिक्स", "कटाई", "मिठास", "cosecha", "dulzura",
+         "azúcar", "काढणी", "गोडी"],
+        ["recent_brix", "latest_status"],
+    ),
+    "status": (
+        ["stage", "status", "अवस्था", "स्थिति", "etapa", "estado", "स्थिती"],
+        ["latest_status"],
+    ),
+    "scan": (
+        ["scan", "photo", "picture", "image", "स्कैन", "फोटो", "escaneo", "foto", "स्कॅन"],
+        ["last_scan"],
+    ),
+    "farm": (
+        ["variety", "block", "farm", "vineyard", "किस्म", "खेत", "variedad", "finca", "viñedo", "जात", "शेत"],
+        ["block", "farm", "latest_status"],
+    ),
+}
+
+def _topic_pattern(keywords: List[str]) -> re.Pattern:
+    # Latin keywords must start a word ("rain" should not match "training")
+    return re.compile("|".join(
+        (r"(?<![a-z])" + re.escape(k)) if k.isascii() else re.escape(k)
+        for k in keywords
+    ))
+
+TOPIC_PATTERNS = [(_topic_pattern(keywords), sections) for keywords, sections in TOPICS.values()]
+
+def select_sections(user_message: str) -> List[str]:
+    """Context sections relevant to the topics in a message, in priority order
+
+    Returns an empty list when the message needs no farm context.
+    """
+    text = (user_message or "").lower()
+    wanted = set()
+    for pattern, sections in TOPIC_PATTERNS:
+        if pattern.search(text):
+            wanted.update(sections)
+    return [name for name in SECTION_PRIORITY if name in wanted]
+
+def _join(encoded: Dict[str, str], names: List[str]) -> str:
+    # Keys in sorted order so the same data always gives the same prompt (and cache key)
+    return "{" + ",".join(f'"{name}":{encoded[name]}' for name in sorted(names)) + "}"
+
+def build_context_json(
+    context: Dict,
+    sections: List[str],
+    encoded: Optional[Dict[str, str]] = None,
+    budget: int = CONTEXT_TOKEN_BUDGET
+) -> Tuple[str, int]:
+    """Serialise the selected sections within a token budget
+
+    encoded holds pre-serialised sections (from the farm context snapshot);
+    anything missing is encoded here. When over budget, the longest list is
+    shortened (oldest entries go first) and, once lists are down to one
+    entry, the lowest-priority section is dropped. Returns (json, tokens).
+    """
+    encoded = dict(encoded or {})
+    names = []
+    for name in sections:
+        if name not in encoded and context.get(name):
+            encoded[name] = compact_json(context[name])
+        if name in encoded:
+            names.append(name)
+    lists = {name: context[name] for name in names if isinstance(context.get(name), list)}
+
+    context_json = _join(encoded, names)
+    tokens = estimate_tokens(context_json)
+    while tokens > budget and names:
+        trimmable = [name for name in names if len(lists.get(name, [])) > 1]
+        if trimmable:
+            name = max(trimmable, key=lambda n: len(encoded[n]))
+            lists[name] = lists[name][:-1]
+            encoded[name] = compact_json(lists[name])
+        else:
+            names.pop()
+        context_json = _join(encoded, names)
+        tokens = estimate_tokens(context_json)
+    return context_json, tokens
+
+class PromptStats:
+    """Estimated prompt sizes per call site"""
+
+    def __init__(self):
+        self.sites: Dict[str, Dict] = {}
+
+    def record(self, site: str, prompt_tokens: int, context_tokens: int = 0):
+        stats = self.sites.setdefault(site, {"prompts": 0, "prompt_tokens": 0, "context_tokens": 0, "max_prompt_tokens": 0})
+        stats["prompts"] += 1
+        stats["prompt_tokens"] += prompt_tokens
+        stats["context_tokens"] += context_tokens
+        stats["max_prompt_tokens"] = max(stats["max_prompt_tokens"], prompt_tokens)
+        logger.debug(f"Prompt tokens ({site}): {prompt_tokens} (context {context_tokens})")
+
+    def get_stats(self) -> Dict:
+        return {
+            site: {
+                "prompts": s["prompts"],
+                "avg_prompt_tokens": round(s["prompt_tokens"] / s["prompts"], 1),
+                "avg_context_tokens": round(s["context_tokens"] / s["prompts"], 1),
+                "max_prompt_tokens": s["max_prompt_tokens"],
+            }
+            for site, s in self.sites.items()
+        }
+
+prompt_stats = PromptStats()
@@ -0,0 +1,86 @@
+import asyncio
+import logging
+import os
+import uuid
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from app.services.jobs import jobs
+
+logger = logging.getLogger(__name__)
+
+ProgressCallback = Callable[[str], None]
+
+class ScanQueue:
+    """Bounded pool of background scan workers
+
+    Jobs are tracked by the JobRegistry (so they are polled like any other
+    job); at most `workers` run at once and the rest wait in "queued".
+    Submissions beyond `max_pending` are refused so a burst of uploads
+    cannot pile up unbounded work.
+    """
+
+    def __init__(self, workers: int, max_pending: int):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.slots = asyncio.Semaphore(workers)
+        self.pending = 0
+        self.running = 0
+        self.completed = 0
+        self.rejected = 0
+
+    def submit(
+        self,
+        kind: str,
+        make_coro: Callable[[ProgressCallback], Awaitable[Any]],
+        key: Optional[str] = None
+    ) -> Optional[str]:
+        """Queue a scan and return its job id (None when the queue is full)
+
+        make_coro receives a progress callback for the job. A job still
+        pending for the same key (e.g. a retried upload) is returned instead
+        of starting another one.
+        """
+        if key:
+            job_id = jobs.find_pending(key)
+            if job_id:
+                return job_id
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            logger.warning(f"Scan queue: Full ({self.pending} pending), rejecting {kind} job")
+            return None
+
+        job_id = str(uuid.uuid4())
+
+        def progress(stage: str):
+            jobs.set_progress(job_id, stage)
+
+        self.pending += 1
+        jobs.submit(kind, self._run(make_coro(progress)), key=key, job_id=job_id)
+        progress("queued")
+        return job_id
+
+    async def _run(self, coro: Awaitable[Any]) -> Any:
+        try:
+            async with self.slots:
+                self.running += 1
+                try:
+                    return await coro
+                finally:
+                    self.running -= 1
+                    self.completed += 1
+        finally:
+            self.pending -= 1
+
+    def get_stats(self) -> Dict:
+        return {
+            "workers": self.workers,
+            "pending": self.pending,
+            "running": self.running,
+            "completed": self.completed,
+            "rejected": self.rejected,
+        }
+
+scan_queue = ScanQueue(
+    workers=int(os.getenv("SCAN_WORKERS", "2")),
+    max_pending=int(os.getenv("SCAN_QUEUE_MAX", "50"))
+)
@@ -0,0 +1,175 @@
+import asyncio
+import logging
+import os
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import insert
+
+from app.db import AsyncSessionLocal
+
+logger = logging.getLogger(__name__)
+
+class WriteBehindQueue:
+    """Batch inserts from many requests into one statement per table
+
+    Rows are plain dicts with their primary key already set. A background
+    task writes them every `interval` seconds, or sooner once `batch_size`
+    rows are waiting; close() (app shutdown) writes whatever is left,
+    retrying for up to `close_timeout` seconds. A batch that keeps failing
+    is written row by row, so one bad row cannot take unrelated messages
+    with it; rows that still fail are kept in a bounded dead-letter queue.
+    """
+
+    def __init__(
+        self,
+        enabled: bool,
+        batch_size: int,
+        interval: float,
+        max_attempts: int = 3,
+        dead_letter_size: int = 1000,
+        close_timeout: float = 10.0
+    ):
+        self.enabled = enabled
+        self.batch_size = batch_size
+        self.interval = interval
+        self.max_attempts = max_attempts
+        self.close_timeout = close_timeout
+        self.pending: List[Tuple[type, Dict]] = []
+        self.wake = asyncio.Event()
+        self.lock = asyncio.Lock()
+        self.task: Optional[asyncio.Task] = None
+        self.attempts = 0
+        self.written = 0
+        self.batches = 0
+        self.failures = 0
+        self.dead_letter: deque = deque(maxlen=dead_letter_size)
+        self.dead_lettered = 0
+
+    async def start(self):
+        """Start the background flusher (called on app startup)"""
+        if self.enabled and self.task is None:
+            self.task = asyncio.create_task(self._run())
+            logger.info(f"Write-behind: Started (batch={self.batch_size}, interval={self.interval * 1000:.0f}ms)")
+
+    async def close(self):
+        """Stop the flusher and write all pending rows (called on app shutdown)
+
+        Failed batches are retried with exponential backoff until
+        close_timeout, then written row by row; only rows that fail on
+        their own are dropped (and logged).
+        """
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.close_timeout
+        delay = 0.1
+        dead_lettered = self.dead_lettered
+        async with self.lock:
+            while self.pending:
+                batch, self.pending = self.pending, []
+                try:
+                    await self._write_batch(batch)
+                    continue
+                except Exception as e:
+                    self.failures += 1
+                    self.pending = batch + self.pending
+                    if loop.time() + delay > deadline:
+                        logger.error(f"Write-behind: Flush of {len(batch)} rows still failing on shutdown, writing them one by one: {e}")
+                        break
+                    logger.warning(f"Write-behind: Flush of {len(batch)} rows failed on shutdown, retrying in {delay:.1f}s: {e}")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 2.0)
+            if self.pending:
+                batch, self.pending = self.pending, []
+                await self._write_each(batch)
+        lost = self.dead_lettered - dead_lettered
+        if lost:
+            ids = ", ".join(str(row.get("id")) for model, row in list(self.dead_letter)[-lost:])
+            logger.error(f"Write-behind: Dropped {lost} rows that could not be written on shutdown: {ids}")
+
+    def enqueue(self, model: type, rows: List[Dict]):
+        self.pending.extend((model, row) for row in rows)
+        if len(self.pending) >= self.batch_size:
+            self.wake.set()
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self.wake.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self.wake.clear()
+            await self.flush()
+
+    async def flush(self):
+        """Write all pending rows now, in one transaction"""
+        async with self.lock:
+            if not self.pending:
+                return
+            batch, self.pending = self.pending, []
+            try:
+                await self._write_batch(batch)
+            except Exception as e:
+                self.failures += 1
+                self.attempts += 1
+                if self.attempts >= self.max_attempts:
+                    self.attempts = 0
+                    logger.error(f"Write-behind: Flush of {len(batch)} rows failed {self.max_attempts} times, writing them one by one: {e}")
+                    await self._write_each(batch)
+                else:
+                    # Keep the rows (in order) for the next flush
+                    self.pending = batch + self.pending
+                    logger.warning(f"Write-behind: Flush of {len(batch)} rows failed, will retry: {e}")
+                return
+            self.attempts = 0
+
+    async def _write_batch(self, batch: List[Tuple[type, Dict]]):
+        """Insert a batch in one transaction (one statement per table)"""
+        by_model: Dict[type, List[Dict]] = {}
+        for model, row in batch:
+            by_model.setdefault(model, []).append(row)
+        async with AsyncSessionLocal() as db:
+            for model, rows in by_model.items():
+                await db.execute(insert(model), rows)
+            await db.commit()
+        self.written += len(batch)
+        self.batches += 1
+
+    async def _write_each(self, batch: List[Tuple[type, Dict]]):
+        """Write rows in separate transactions; dead-letter the ones that fail"""
+        for model, row in batch:
+            try:
+                async with AsyncSessionLocal() as db:
+                    await db.execute(insert(model), [row])
+                    await db.commit()
+            except Exception as e:
+                self.dead_letter.append((model, row))
+                self.dead_lettered += 1
+                logger.error(f"Write-behind: Dead-lettered {model.__name__} row {row.get('id')}: {e}")
+            else:
+                self.written += 1
+
+    def get_stats(self) -> Dict:
+        return {
+            "enabled": self.enabled,
+            "pending": len(self.pending),
+            "written": self.written,
+            "batches": self.batches,
+            "failures": self.failures,
+            "dead_letter": len(self.dead_letter),
+            "dead_lettered": self.dead_lettered,
+        }
+
+# Chat messages only; opt in with CHAT_WRITE_BEHIND=1
+write_behind = WriteBehindQueue(
+    enabled=os.getenv("CHAT_WRITE_BEHIND", "0") == "1",
+    batch_size=int(os.getenv("CHAT_WRITE_BEHIND_BATCH", "100")),
+    interval=int(os.getenv("CHAT_WRITE_BEHIND_MS", "200")) / 1000,
+    close_timeout=float(os.getenv("CHAT_WRITE_BEHIND_CLOSE_SECONDS", "10"))
+)
@@ -0,0 +1,91 @@
+"""
+Train the local scan pre-filter (see app/services/local_scanner.py).
+Run from backend directory:
+    pip install -r requirements-scanner.txt
+    python scripts/train_local_scanner.py --data path/to/photos --out local_scanner.joblib
+
+Photos are laid out one folder per crop stage (path/to/photos/<stage>/*.jpg).
+An optional path/to/photos/issues.csv lists issues per photo:
+    photo,issues
+    veraison/IMG_0012.jpg,mildew-like signs;sunburn
+Each photo goes through the same thumbnail pipeline as a scan, so the
+features match what the scanner sees. Point SCAN_LOCAL_MODEL_PATH at
+the output file.
+"""
+import argparse
+import csv
+import io
+import os
+import sys
+from pathlib import Path
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import joblib
+from PIL import Image
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.model_selection import cross_val_score
+
+from app.services.image_pipeline import _process_sync
+from app.services.local_scanner import extract_features
+
+PHOTO_SUFFIXES = {".jpg", ".jpeg", ".png", ".webp"}
+
+def load_issues(data_dir: Path) -> dict:
+    path = data_dir / "issues.csv"
+    if not path.is_file():
+        return {}
+    with open(path, newline="", encoding="utf-8") as f:
+        return {
+            row["photo"].strip(): {name.strip() for name in (row.get("issues") or "").split(";") if name.strip()}
+            for row in csv.DictReader(f)
+        }
+
+def photo_features(path: Path) -> list:
+    analysis, thumbnail, image_hash, timings = _process_sync(path.read_bytes())
+    return extract_features(Image.open(io.BytesIO(thumbnail)).convert("RGB"))
+
+def classifier():
+    # Small forest: predicts in well under a millisecond on one feature row
+    return RandomForestClassifier(n_estimators=100, max_depth=8, class_weight="balanced", random_state=0)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data", required=True, type=Path, help="Folder with one sub-folder of photos per stage")
+    parser.add_argument("--out", default=Path("local_scanner.joblib"), type=Path)
+    parser.add_argument("--min-issue-photos", default=10, type=int, help="Skip issues seen in fewer photos")
+    args = parser.parse_args()
+
+    issues_by_photo = load_issues(args.data)
+    rows, stages, photo_issues = [], [], []
+    for stage_dir in sorted(p for p in args.data.iterdir() if p.is_dir()):
+        for path in sorted(stage_dir.iterdir()):
+            if path.suffix.lower() not in PHOTO_SUFFIXES:
+                continue
+            rows.append(photo_features(path))
+            stages.append(stage_dir.name)
+            photo_issues.append(issues_by_photo.get(path.relative_to(args.data).as_posix(), set()))
+    if len(set(stages)) < 2:
+        sys.exit("Need photos for at least two stages")
+    print(f"Loaded {len(rows)} photos over {len(set(stages))} stages")
+
+    stage_model = classifier()
+    folds = min(5, min(stages.count(stage) for stage in set(stages)))
+    if folds >= 2:
+        print(f"Stage accuracy ({folds}-fold): {cross_val_score(stage_model, rows, stages, cv=folds).mean():.2f}")
+    stage_model.fit(rows, stages)
+
+    issue_models = {}
+    for name in sorted(set().union(*photo_issues)):
+        labels = [name in issues for issues in photo_issues]
+        if sum(labels) < args.min_issue_photos or sum(labels) == len(labels):
+            print(f"Skipping issue '{name}' ({sum(labels)} photos)")
+            continue
+        issue_models[name] = classifier().fit(rows, labels)
+        print(f"Trained issue '{name}' ({sum(labels)} photos)")
+
+    joblib.dump({"stage": stage_model, "issues": issue_models}, args.out)
+    print(f"Saved {args.out}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Tests for LLM admission control and the chat route's slot release.
+Run from backend directory: python -m pytest tests/test_admission.py
+"""
+import asyncio
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.admission import AdmissionController
+from app.services.llm_gateway import LLMGateway
+from app.schemas import ChatMessageRequest
+from app.routers import chat
+
+
+def test_admit_sheds_at_limit():
+    controller = AdmissionController(max_limit=2, min_limit=1, latency_target=10)
+    assert controller.admit("chat")
+    assert controller.admit("chat")
+    assert not controller.admit("chat")
+    assert controller.get_stats()["shed"] == {"chat": 1}
+
+
+def test_release_adapts_limit():
+    controller = AdmissionController(max_limit=8, min_limit=2, latency_target=1.0, cooldown=0)
+    controller.admit("chat")
+    controller.release("chat", 5.0)
+    assert controller.in_flight == 0
+    assert controller.limit == 4
+    controller.admit("chat")
+    controller.release("chat", 0.1)
+    assert controller.limit == 5
+
+
+@pytest.fixture
+def chat_turn(monkeypatch):
+    """send_message wired to a fresh controller, with the DB-facing steps replaced"""
+    controller = AdmissionController(max_limit=2, min_limit=1, latency_target=10)
+    monkeypatch.setattr(chat, "admission", controller)
+    monkeypatch.setattr(LLMGateway, "available", property(lambda self: True))
+
+    async def start_chat_turn(request, db):
+        return object(), "session-1", "en", []
+
+    async def get_local_reply(message, farm, db, lang):
+        return None
+
+    monkeypatch.setattr(chat, "start_chat_turn", start_chat_turn)
+    monkeypatch.setattr(chat, "get_local_reply", get_local_reply)
+    return controller
+
+
+def test_send_message_releases_slot_when_context_fails(chat_turn, monkeypatch):
+    async def build_chat_context(*args, **kwargs):
+        raise RuntimeError("db down")
+
+    monkeypatch.setattr(chat, "build_chat_context", build_chat_context)
+    request = ChatMessageRequest(farm_id="farm-1", message="why are my leaves yellow")
+
+    for _ in range(3):
+        with pytest.raises(RuntimeError):
+            asyncio.run(chat.send_message(request, db=None))
+        assert chat_turn.in_flight == 0
+
+
+def test_send_message_releases_slot_when_history_fails(chat_turn, monkeypatch):
+    async def build_chat_context(*args, **kwargs):
+        return {}, None
+
+    async def get_history_block(db, session_id):
+        raise RuntimeError("db down")
+
+    monkeypatch.setattr(chat, "build_chat_context", build_chat_context)
+    monkeypatch.setattr(chat.chat_memory, "get_history_block", get_history_block)
+    request = ChatMessageRequest(farm_id="farm-1", message="why are my leaves yellow")
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(chat.send_message(request, db=None))
+    assert chat_turn.in_flight == 0
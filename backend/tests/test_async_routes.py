@@ -0,0 +1,117 @@
+"""
+Tests for routes on the async SQLAlchemy session.
+Run from backend directory: python -m pytest tests/test_async_routes.py
+"""
+import asyncio
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi import HTTPException
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
+
+from app import db as app_db
+from app.db import Base, get_async_db
+from app.models import ChatMessage, ChatSession, Farm
+from app.routers import chat, plan
+from app.schemas import ChatMessageRequest
+from app.services.llm_gateway import LLMGateway
+
+
+@pytest.fixture
+def sessions(tmp_path, monkeypatch):
+    """A session factory on a fresh SQLite database holding farm-1 and farm-2"""
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'routes.db'}")
+    sessions = async_sessionmaker(engine, autoflush=False, expire_on_commit=False)
+    monkeypatch.setattr(app_db, "AsyncSessionLocal", sessions)
+    monkeypatch.setattr(chat, "AsyncSessionLocal", sessions)
+    monkeypatch.setattr(LLMGateway, "available", property(lambda self: False))
+
+    async def build_chat_context(farm, db, message, session_id):
+        return {}, None
+
+    # No forecast fetch or retrieval index build
+    monkeypatch.setattr(chat, "build_chat_context", build_chat_context)
+
+    async def create():
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        async with sessions() as db:
+            db.add_all([Farm(id=farm_id, lat=19.9, lon=73.8, preferred_language="en") for farm_id in ("farm-1", "farm-2")])
+            await db.commit()
+
+    asyncio.run(create())
+    yield sessions
+    asyncio.run(engine.dispose())
+
+
+def test_get_async_db_yields_a_session_and_closes_it(sessions):
+    async def run():
+        dependency = get_async_db()
+        db = await dependency.__anext__()
+        farm = await db.get(Farm, "farm-1")
+        with pytest.raises(StopAsyncIteration):
+            await dependency.__anext__()
+        return db, farm
+
+    db, farm = asyncio.run(run())
+    assert isinstance(db, AsyncSession)
+    assert farm.id == "farm-1"
+    assert not db.in_transaction()
+
+
+def test_unknown_farm_is_404(sessions):
+    async def run():
+        async with sessions() as db:
+            with pytest.raises(HTTPException) as plan_error:
+                await plan.get_today_plan(farm_id="missing", db=db)
+            with pytest.raises(HTTPException) as chat_error:
+                await chat.send_message(ChatMessageRequest(farm_id="missing", message="Hello"), db=db)
+        return plan_error.value, chat_error.value
+
+    assert [error.status_code for error in asyncio.run(run())] == [404, 404]
+
+
+def test_send_message_saves_the_turn(sessions):
+    async def run():
+        async with sessions() as db:
+            reply = await chat.send_message(
+                ChatMessageRequest(farm_id="farm-1", session_id="session-1", message="Why are the berries splitting?"), db=db
+            )
+        async with sessions() as db:
+            messages = (await db.execute(
+                select(ChatMessage.role, ChatMessage.session_id).order_by(ChatMessage.created_at)
+            )).all()
+            session = await db.get(ChatSession, "session-1")
+        return reply, messages, session
+
+    reply, messages, session = asyncio.run(run())
+    assert reply.session_id == "session-1" and reply.reply and not reply.degraded
+    assert [tuple(m) for m in messages] == [("user", "session-1"), ("assistant", "session-1")]
+    assert session.farm_id == "farm-1"
+
+
+def test_clear_chat_history_only_touches_its_farm(sessions):
+    async def run():
+        async with sessions() as db:
+            for farm_id in ("farm-1", "farm-2"):
+                db.add(ChatSession(id=f"{farm_id}-session", farm_id=farm_id, summary="Asked about mildew", summary_message_count=2))
+                for message in ("Hello", "Thanks"):
+                    db.add_all(chat.new_turn_rows(farm_id, f"{farm_id}-session", message))
+            await db.commit()
+            result = await chat.clear_chat_history(farm_id="farm-1", db=db)
+        async with sessions() as db:
+            remaining = (await db.execute(select(ChatMessage.farm_id))).scalars().all()
+            cleared = await db.get(ChatSession, "farm-1-session")
+            kept = await db.get(ChatSession, "farm-2-session")
+        return result, remaining, cleared, kept
+
+    result, remaining, cleared, kept = asyncio.run(run())
+    assert result == {"ok": True, "deleted": 2}
+    assert remaining == ["farm-2", "farm-2"]
+    assert cleared.summary is None and cleared.summary_message_count == 0
+    assert kept.summary == "Asked about mildew"
@@ -0,0 +1,71 @@
+"""
+Tests for keyset-paginated chat history.
+Run from backend directory: python -m pytest tests/test_chat_history.py
+"""
+import asyncio
+import os
+import sys
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi import HTTPException
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+from app.db import Base
+from app.models import Farm, ChatSession, ChatMessage
+from app.routers import chat
+
+
+async def _history_pages(tmp_path, page_size: int):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'chat.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    sessions = async_sessionmaker(engine, expire_on_commit=False)
+
+    start = datetime(2026, 6, 1, tzinfo=timezone.utc)
+    async with sessions() as db:
+        db.add(Farm(id="farm-1", lat=19.9, lon=73.8))
+        db.add(ChatSession(id="session-1", farm_id="farm-1"))
+        # Pairs of messages share a timestamp, so ordering must fall back to the id
+        db.add_all(
+            ChatMessage(
+                id=f"m{i:02d}", farm_id="farm-1", session_id="session-1", role="user",
+                content=f"message {i}", created_at=start + timedelta(seconds=i // 2)
+            )
+            for i in range(11)
+        )
+        await db.commit()
+
+        backward = []
+        page = await chat.get_chat_history("farm-1", None, page_size, None, None, db)
+        while page:
+            backward[:0] = [message.id for message in page]
+            page = await chat.get_chat_history("farm-1", None, page_size, page[0].id, None, db)
+
+        forward = []
+        page = await chat.get_chat_history("farm-1", None, page_size, "m00", None, db)
+        assert page == []
+        cursor = "m00"
+        forward.append(cursor)
+        while True:
+            page = await chat.get_chat_history("farm-1", None, page_size, None, cursor, db)
+            if not page:
+                break
+            forward.extend(message.id for message in page)
+            cursor = page[-1].id
+
+        with pytest.raises(HTTPException) as error:
+            await chat.get_chat_history("farm-1", None, page_size, "missing", None, db)
+        assert error.value.status_code == 400
+    await engine.dispose()
+    return backward, forward
+
+
+def test_cursor_round_trip(tmp_path):
+    backward, forward = asyncio.run(_history_pages(tmp_path, page_size=3))
+    expected = [f"m{i:02d}" for i in range(11)]
+    assert backward == expected
+    assert forward == expected
@@ -0,0 +1,158 @@
+"""
+Tests for the rolling chat session summary and the history block.
+Run from backend directory: python -m pytest tests/test_chat_memory.py
+"""
+import asyncio
+import os
+import sys
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+from app.db import Base
+from app.models import ChatMessage, ChatSession
+from app.services import chat_memory
+from app.services.jobs import jobs
+from app.services.llm_gateway import LLMGateway
+
+STARTED = datetime(2026, 10, 1, 8, 0, tzinfo=timezone.utc)
+
+
+@pytest.fixture
+def memory(tmp_path, monkeypatch):
+    """chat_memory on a tmp database, summarising every 2 turns past 1 recent turn; _summarise records its calls"""
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'memory.db'}")
+    sessions = async_sessionmaker(engine, expire_on_commit=False)
+    monkeypatch.setattr(chat_memory, "AsyncSessionLocal", sessions)
+    monkeypatch.setattr(chat_memory, "SUMMARY_EVERY_TURNS", 2)
+    monkeypatch.setattr(chat_memory, "RECENT_TURNS", 1)
+    calls = []
+
+    async def summarise(previous, transcript):
+        calls.append((previous, transcript))
+        return f"summary {len(calls)}"
+
+    monkeypatch.setattr(chat_memory, "_summarise", summarise)
+
+    async def create():
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        async with sessions() as db:
+            db.add(ChatSession(id="session-1", farm_id="farm-1"))
+            await db.commit()
+
+    asyncio.run(create())
+    yield sessions, calls
+    asyncio.run(engine.dispose())
+
+
+async def _add_turns(sessions, start: int, count: int):
+    """Alternate user / assistant messages numbered from start"""
+    async with sessions() as db:
+        for i in range(start, start + count):
+            db.add(ChatMessage(
+                id=str(uuid.uuid4()), farm_id="farm-1", session_id="session-1",
+                role="user" if i % 2 == 0 else "assistant", content=f"message {i}",
+                created_at=STARTED + timedelta(minutes=i)
+            ))
+        await db.commit()
+
+
+async def _history(sessions):
+    async with sessions() as db:
+        return await chat_memory.get_history_block(db, "session-1")
+
+
+def test_summary_waits_for_enough_turns_then_folds_older_ones(memory):
+    sessions, calls = memory
+
+    async def run():
+        await _add_turns(sessions, 0, 5)
+        early = await chat_memory.refresh_summary("session-1")
+        await _add_turns(sessions, 5, 1)
+        summary = await chat_memory.refresh_summary("session-1")
+        async with sessions() as db:
+            session = await db.get(ChatSession, "session-1")
+        return early, summary, session, await _history(sessions)
+
+    early, summary, session, history = asyncio.run(run())
+    assert early is None
+    # 6 messages: the newest turn (2 messages) stays verbatim, the other 4 are folded
+    assert summary == "summary 1" and session.summary_message_count == 4
+    [(previous, transcript)] = calls
+    assert previous is None
+    assert transcript.splitlines() == [
+        "Farmer: message 0", "Assistant: message 1", "Farmer: message 2", "Assistant: message 3"
+    ]
+    assert history == (
+        "Summary of earlier conversation: summary 1\n"
+        "Recent messages:\nFarmer: message 4\nAssistant: message 5"
+    )
+
+
+def test_history_block_keeps_the_newest_turns_within_budget(memory, monkeypatch):
+    sessions, calls = memory
+    asyncio.run(_add_turns(sessions, 0, 4))
+    assert asyncio.run(_history(sessions)).splitlines() == [
+        "Recent messages:", "Farmer: message 0", "Assistant: message 1", "Farmer: message 2", "Assistant: message 3"
+    ]
+
+    monkeypatch.setattr(chat_memory, "HISTORY_TOKEN_BUDGET", 12)
+    assert asyncio.run(_history(sessions)).splitlines() == [
+        "Recent messages:", "Farmer: message 2", "Assistant: message 3"
+    ]
+
+
+def test_history_of_a_new_session_is_none(memory):
+    sessions, calls = memory
+
+    async def run():
+        async with sessions() as db:
+            return await chat_memory.get_history_block(db, "unknown"), await chat_memory.get_history_block(db, "session-1")
+
+    assert asyncio.run(run()) == (None, None)
+
+
+def test_summary_is_reset_after_history_is_cleared(memory):
+    sessions, calls = memory
+
+    async def run():
+        async with sessions() as db:
+            session = await db.get(ChatSession, "session-1")
+            session.summary, session.summary_message_count = "stale", 8
+            await db.commit()
+        await _add_turns(sessions, 0, 2)
+        summary = await chat_memory.refresh_summary("session-1")
+        async with sessions() as db:
+            return summary, await db.get(ChatSession, "session-1")
+
+    summary, session = asyncio.run(run())
+    assert summary is None
+    assert session.summary is None and session.summary_message_count == 0
+    assert calls == []
+
+
+def test_one_refresh_job_per_session(memory, monkeypatch):
+    monkeypatch.setattr(LLMGateway, "available", property(lambda self: True))
+    refreshed = []
+
+    async def refresh_summary(session_id):
+        refreshed.append(session_id)
+        await asyncio.sleep(0.05)
+
+    monkeypatch.setattr(chat_memory, "refresh_summary", refresh_summary)
+
+    async def run():
+        chat_memory.schedule_refresh("session-a")
+        chat_memory.schedule_refresh("session-a")
+        chat_memory.schedule_refresh("session-b")
+        await jobs.wait(jobs.find_pending("chat_summary:session-a"), timeout=5)
+        await jobs.wait(jobs.find_pending("chat_summary:session-b"), timeout=5)
+
+    asyncio.run(run())
+    assert sorted(refreshed) == ["session-a", "session-b"]
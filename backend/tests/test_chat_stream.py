@@ -0,0 +1,128 @@
+"""
+Tests for streamed chat replies over Server-Sent Events.
+Run from backend directory: python -m pytest tests/test_chat_stream.py
+"""
+import asyncio
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+from app.db import Base
+from app.models import ChatMessage, ChatSession, Farm
+from app.routers import chat
+from app.schemas import ChatMessageRequest
+from app.services.admission import AdmissionController
+from app.services.llm_gateway import LLMGateway
+
+
+@pytest.fixture
+def streamed(tmp_path, monkeypatch):
+    """Chat wired to a tmp database holding one farm; the model streams `deltas`"""
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'chat.db'}")
+    sessions = async_sessionmaker(engine, expire_on_commit=False)
+    monkeypatch.setattr(chat, "AsyncSessionLocal", sessions)
+    monkeypatch.setattr(chat, "admission", AdmissionController(max_limit=1, min_limit=1, latency_target=10))
+    monkeypatch.setattr(LLMGateway, "available", property(lambda self: False))
+    deltas = []
+
+    async def get_local_reply(message, farm, db, lang):
+        return None
+
+    async def build_chat_context(farm, db, message, session_id):
+        return {}, None
+
+    async def get_history_block(db, session_id):
+        return None
+
+    async def stream_ai_reply(message, farm_context, lang, context_json=None, history=None):
+        for delta in deltas:
+            yield delta
+
+    monkeypatch.setattr(chat, "get_local_reply", get_local_reply)
+    monkeypatch.setattr(chat, "build_chat_context", build_chat_context)
+    monkeypatch.setattr(chat.chat_memory, "get_history_block", get_history_block)
+    monkeypatch.setattr(chat.chat_memory, "schedule_refresh", lambda session_id: None)
+    monkeypatch.setattr(chat, "stream_ai_reply", stream_ai_reply)
+
+    async def create():
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        async with sessions() as db:
+            db.add(Farm(id="farm-1", lat=19.9, lon=73.8, preferred_language="en"))
+            await db.commit()
+
+    asyncio.run(create())
+    yield sessions, deltas
+    asyncio.run(engine.dispose())
+
+
+def _events(body: str):
+    """(event, data) pairs of an SSE body"""
+    events = []
+    for block in body.strip().split("\n\n"):
+        event, data = block.split("\n")
+        events.append((event[len("event: "):], json.loads(data[len("data: "):])))
+    return events
+
+
+async def _stream(sessions, message: str, session_id=None):
+    async with sessions() as db:
+        response = await chat.send_message_stream(
+            ChatMessageRequest(farm_id="farm-1", session_id=session_id, message=message), db=db
+        )
+        assert response.media_type == "text/event-stream"
+        return "".join([chunk async for chunk in response.body_iterator])
+
+
+def test_stream_sends_meta_then_deltas_then_done(streamed):
+    sessions, deltas = streamed
+    deltas.extend(["Irrigate ", "the west ", "block."])
+
+    async def run():
+        body = await _stream(sessions, "Should I irrigate?")
+        async with sessions() as db:
+            messages = (await db.execute(
+                select(ChatMessage.role, ChatMessage.content).order_by(ChatMessage.created_at)
+            )).all()
+            chat_sessions = (await db.execute(select(ChatSession))).scalars().all()
+        return body, messages, chat_sessions
+
+    body, messages, chat_sessions = asyncio.run(run())
+    events = _events(body)
+    [chat_session] = chat_sessions
+    assert events == [
+        ("meta", {"session_id": chat_session.id}),
+        ("delta", {"text": "Irrigate "}),
+        ("delta", {"text": "the west "}),
+        ("delta", {"text": "block."}),
+        ("done", {"reply": "Irrigate the west block.", "session_id": chat_session.id, "degraded": False}),
+    ]
+    # Both sides of the turn are saved by the time the stream ends
+    assert [tuple(m) for m in messages] == [("user", "Should I irrigate?"), ("assistant", "Irrigate the west block.")]
+
+
+def test_empty_stream_falls_back_in_one_delta(streamed):
+    sessions, deltas = streamed
+
+    events = _events(asyncio.run(_stream(sessions, "Should I irrigate?", session_id="session-1")))
+    assert [event for event, data in events] == ["meta", "delta", "done"]
+    assert events[0][1] == {"session_id": "session-1"}
+    assert events[1][1]["text"] == events[2][1]["reply"] == chat.get_fallback_reply("Should I irrigate?", "en")
+
+
+def test_backed_up_model_answers_degraded(streamed, monkeypatch):
+    sessions, deltas = streamed
+    deltas.append("never sent")
+    monkeypatch.setattr(LLMGateway, "available", property(lambda self: True))
+    chat.admission.admit("chat")
+
+    events = _events(asyncio.run(_stream(sessions, "Should I irrigate?")))
+    assert [event for event, data in events] == ["meta", "delta", "done"]
+    assert events[2][1]["degraded"] and "never sent" not in events[2][1]["reply"]
@@ -0,0 +1,31 @@
+"""
+Tests for the per-farm chat context cache.
+Run from backend directory: python -m pytest tests/test_farm_context_cache.py
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.farm_context_cache import FarmContextCache
+
+
+def test_invalidate_drops_snapshot():
+    cache = FarmContextCache()
+    cache.set("farm-1", {"farm": {"name": "A"}}, cache.generation("farm-1"))
+    assert cache.get("farm-1").context == {"farm": {"name": "A"}}
+    cache.invalidate("farm-1")
+    assert cache.get("farm-1") is None
+
+
+def test_build_overlapping_a_write_is_not_cached():
+    cache = FarmContextCache()
+    generation = cache.generation("farm-1")
+    # A write lands while the snapshot is being built
+    cache.invalidate("farm-1")
+    snapshot = cache.set("farm-1", {"farm": {"name": "stale"}}, generation)
+    assert snapshot.context == {"farm": {"name": "stale"}}
+    assert cache.get("farm-1") is None
+
+    cache.set("farm-1", {"farm": {"name": "fresh"}}, cache.generation("farm-1"))
+    assert cache.get("farm-1").context == {"farm": {"name": "fresh"}}
@@ -0,0 +1,149 @@
+"""
+Tests for farm event fan-out and the chat WebSocket.
+Run from backend directory: python -m pytest tests/test_farm_events.py
+"""
+import asyncio
+import os
+import sys
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi import FastAPI, WebSocketDisconnect
+from fastapi.testclient import TestClient
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+from app.db import Base
+from app.models import CropStatus, Farm, IrrigationLog, ScoutingLog
+from app.routers import chat
+from app.services.farm_events import FarmEventBus, record_events
+from app.services.llm_gateway import LLMGateway
+
+
+def test_record_events():
+    [created] = record_events(IrrigationLog(id="irrigation-1", farm_id="farm-1"))
+    assert created == {"type": "log_created", "kind": "irrigation", "id": "irrigation-1", "at": None}
+
+    created, alert = record_events(ScoutingLog(id="log-1", farm_id="farm-1", block_id="block-1", issue_type="mildew", severity=5))
+    assert created["kind"] == "scouting" and created["severity"] == 5
+    assert alert == {"type": "alert", "kind": "scouting", "id": "log-1", "issue": "mildew", "severity": 5, "block_id": "block-1"}
+
+    [created] = record_events(ScoutingLog(id="log-2", farm_id="farm-1", photo_path="/uploads/a.jpg", issue_type="none", severity=0))
+    assert created["kind"] == "scan"
+
+    created, alert = record_events(CropStatus(id="status-1", farm_id="farm-1", stage="veraison", cracking=True, mildew_signs=True))
+    assert created["issues"] == alert["issues"] == ["cracking", "mildew"]
+
+
+def test_publish_fans_out_to_the_farm_subscribers_only():
+    bus = FarmEventBus()
+    received = {"a": [], "b": [], "other": []}
+
+    async def run():
+        unsubscribe_a = bus.subscribe("farm-1", received["a"].append)
+        bus.subscribe("farm-1", received["b"].append)
+        bus.subscribe("farm-2", received["other"].append)
+        bus.publish_record(ScoutingLog(id="log-1", farm_id="farm-1", issue_type="mildew", severity=5))
+        # Delivery is scheduled on the subscriber's loop
+        await asyncio.sleep(0)
+        unsubscribe_a()
+        bus.publish("farm-1", {"type": "log_deleted", "kind": "scouting", "id": "log-1"})
+        await asyncio.sleep(0)
+        # Publishing for a farm nobody watches is a no-op
+        bus.publish_record(ScoutingLog(id="log-2", farm_id="farm-3", issue_type="none", severity=0))
+
+    asyncio.run(run())
+    assert [event["type"] for event in received["a"]] == ["log_created", "alert"]
+    assert [event["type"] for event in received["b"]] == ["log_created", "alert", "log_deleted"]
+    assert received["other"] == []
+    assert bus.get_stats() == {"farms": 2, "subscribers": 2, "published": 3}
+
+
+def test_publish_from_a_worker_thread():
+    bus = FarmEventBus()
+    received = []
+
+    async def run():
+        bus.subscribe("farm-1", received.append)
+        await asyncio.to_thread(bus.publish, "farm-1", {"type": "log_created"})
+        await asyncio.sleep(0)
+
+    asyncio.run(run())
+    assert received == [{"type": "log_created"}]
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    """A test client for the chat router on a tmp database holding farm-1, with a fresh event bus"""
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'events.db'}")
+    sessions = async_sessionmaker(engine, expire_on_commit=False)
+    bus = FarmEventBus()
+    monkeypatch.setattr(chat, "AsyncSessionLocal", sessions)
+    monkeypatch.setattr(chat, "farm_events", bus)
+    monkeypatch.setattr(chat, "WS_PLAN_DEBOUNCE_SECONDS", 0)
+    monkeypatch.setattr(LLMGateway, "available", property(lambda self: False))
+    monkeypatch.setattr(chat.chat_memory, "schedule_refresh", lambda session_id: None)
+
+    async def get_local_reply(message, farm, db, lang):
+        return f"Local reply to {message}"
+
+    async def build_today_plan(farm, db):
+        return {"tasks": ["Scout block 1"]}
+
+    monkeypatch.setattr(chat, "get_local_reply", get_local_reply)
+    monkeypatch.setattr(chat, "build_today_plan", build_today_plan)
+
+    async def create():
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        async with sessions() as db:
+            db.add(Farm(id="farm-1", lat=19.9, lon=73.8, preferred_language="en"))
+            await db.commit()
+
+    asyncio.run(create())
+    app = FastAPI()
+    app.include_router(chat.router, prefix="/api")
+    with TestClient(app) as client:
+        yield client, bus
+    asyncio.run(engine.dispose())
+
+
+def test_websocket_reply_frames_in_order(client):
+    client, bus = client
+    with client.websocket_connect("/api/chat/ws?farm_id=farm-1&session_id=session-1") as websocket:
+        assert websocket.receive_json() == {"type": "meta", "session_id": "session-1"}
+        websocket.send_text('{"message": "Hello"}')
+        assert websocket.receive_json() == {"type": "delta", "text": "Local reply to Hello"}
+        assert websocket.receive_json() == {
+            "type": "done", "reply": "Local reply to Hello", "session_id": "session-1", "degraded": False
+        }
+        websocket.send_text("not json")
+        assert websocket.receive_json()["type"] == "error"
+        assert bus.get_stats()["subscribers"] == 1
+    # The connection unsubscribes once the server sees the disconnect
+    for _ in range(100):
+        if bus.get_stats()["subscribers"] == 0:
+            break
+        time.sleep(0.01)
+    assert bus.get_stats()["subscribers"] == 0
+
+
+def test_websocket_pushes_farm_events_then_the_plan(client):
+    client, bus = client
+    with client.websocket_connect("/api/chat/ws?farm_id=farm-1") as websocket:
+        assert websocket.receive_json()["type"] == "meta"
+        bus.publish_record(IrrigationLog(id="irrigation-1", farm_id="farm-1"))
+        event = websocket.receive_json()
+        assert event["type"] == "farm_event" and event["event"]["id"] == "irrigation-1"
+        assert websocket.receive_json() == {"type": "plan", "plan": {"tasks": ["Scout block 1"]}}
+
+
+def test_websocket_rejects_an_unknown_farm(client):
+    client, bus = client
+    with pytest.raises(WebSocketDisconnect) as closed:
+        with client.websocket_connect("/api/chat/ws?farm_id=missing") as websocket:
+            websocket.receive_json()
+    assert closed.value.code == 1008
+    assert bus.get_stats()["subscribers"] == 0
@@ -0,0 +1,104 @@
+"""
+Tests for BM25 retrieval over a farm's history.
+Run from backend directory: python -m pytest tests/test_farm_retrieval.py
+"""
+import asyncio
+import os
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+from app.db import Base
+from app.models import Farm, ScoutingLog, ChatMessage
+from app.routers import chat
+from app.services import farm_retrieval as retrieval_module
+from app.services.farm_context_cache import FarmContextSnapshot
+from app.services.farm_retrieval import FarmIndex, FarmRetrieval, Document
+
+
+def _log(log_id: str, issue: str, notes: str) -> ScoutingLog:
+    return ScoutingLog(
+        id=log_id, farm_id="farm-1", issue_type=issue, severity=2,
+        notes=notes, observed_at=datetime(2026, 6, 1)
+    )
+
+
+def test_bm25_ranks_matching_record_first():
+    index = FarmIndex()
+    index.add(Document("a", "2026-06-01 scouting: mildew, white powder on leaves"))
+    index.add(Document("b", "2026-06-02 irrigation: 20 mm"))
+    index.add(Document("c", "2026-06-03 scouting: sunburn on west side bunches"))
+    results = index.search("when did I see powder on the leaves", k=5)
+    assert [doc.doc_id for score, doc in results] == ["a"]
+
+    index.remove("a")
+    assert index.search("powder", k=5) == []
+
+
+class RacingRetrieval(FarmRetrieval):
+    """Commits a record after the build's queries ran, before the index is stored"""
+
+    async def _build(self, farm, db):
+        index = FarmIndex()
+        index.add(Document("scouting:old", "2026-05-01 scouting: rot on lower bunches"))
+        self.index_record(_log("new", "mildew", "white powder on leaves"))
+        return index
+
+
+def test_write_during_build_reaches_the_index():
+    retrieval = RacingRetrieval()
+    farm = Farm(id="farm-1")
+    results = asyncio.run(retrieval.search(farm, None, "white powder on leaves"))
+    assert len(results) == 1
+    assert "powder" in results[0]
+    assert retrieval.pending_updates == {}
+
+
+def test_build_indexes_the_newest_records_of_each_table(tmp_path, monkeypatch):
+    monkeypatch.setattr(retrieval_module, "MAX_RECORDS_PER_TABLE", 2)
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'farm.db'}")
+
+    async def run():
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        sessions = async_sessionmaker(engine, expire_on_commit=False)
+        async with sessions() as db:
+            for day in range(1, 4):
+                log = _log(f"log-{day}", "mildew", f"check {day}")
+                log.observed_at = datetime(2026, 6, day)
+                db.add(log)
+            db.add(ChatMessage(id="q", farm_id="farm-1", session_id="s", role="user", content="mildew again?"))
+            db.add(ChatMessage(id="a", farm_id="farm-1", session_id="s", role="assistant", content="spray"))
+            await db.commit()
+            index = await FarmRetrieval()._build(Farm(id="farm-1"), db)
+        await engine.dispose()
+        return index
+
+    index = asyncio.run(run())
+    assert sorted(index.docs) == ["chat:q", "scouting:log-2", "scouting:log-3"]
+    assert index.docs["scouting:log-3"].text == "2026-06-03 scouting: mildew, severity 2/3 - check 3"
+
+
+def test_context_snapshot_and_retrieval_run_concurrently(monkeypatch):
+    async def get_farm_snapshot(farm, db):
+        await asyncio.sleep(0.1)
+        return FarmContextSnapshot({"latest_status": {"stage": "veraison"}})
+
+    async def retrieve_records(farm, user_message, session_id):
+        await asyncio.sleep(0.1)
+        return ["2026-06-01 scouting: mildew, severity 2/3"]
+
+    monkeypatch.setattr(chat, "get_farm_snapshot", get_farm_snapshot)
+    monkeypatch.setattr(chat, "retrieve_records", retrieve_records)
+    started = time.perf_counter()
+    context, context_json = asyncio.run(
+        chat.build_chat_context(Farm(id="farm-1"), None, "what stage are my vines at")
+    )
+    assert time.perf_counter() - started < 0.18
+    assert context["latest_status"] == {"stage": "veraison"}
+    assert context["records"] == ["2026-06-01 scouting: mildew, severity 2/3"]
+    assert "veraison" in context_json
@@ -0,0 +1,78 @@
+"""
+Tests for scan photo normalisation (resize, orientation, JPEG re-encode, thumbnail).
+Run from backend directory: python -m pytest tests/test_image_pipeline.py
+"""
+import asyncio
+import io
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image
+
+from app.services.image_pipeline import ImagePipeline, MAX_EDGE, THUMBNAIL_EDGE
+
+
+def _image(size, mode="RGB", format="PNG", exif=None) -> bytes:
+    buffer = io.BytesIO()
+    image = Image.new(mode, size, "green")
+    if exif is not None:
+        image.save(buffer, format=format, exif=exif)
+    else:
+        image.save(buffer, format=format)
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def pipeline():
+    pipeline = ImagePipeline(workers=1)
+    yield pipeline
+    pipeline.close()
+
+
+def test_large_photo_is_resized_and_reencoded(pipeline):
+    data = _image((3000, 1500), mode="RGBA")
+    processed = asyncio.run(pipeline.process(data, "image/png"))
+
+    assert processed.mime_type == "image/jpeg"
+    image = Image.open(io.BytesIO(processed.data))
+    assert image.format == "JPEG" and image.mode == "RGB"
+    assert image.size == (MAX_EDGE, MAX_EDGE // 2)
+    thumbnail = Image.open(io.BytesIO(processed.thumbnail))
+    assert thumbnail.size == (THUMBNAIL_EDGE, THUMBNAIL_EDGE // 2)
+    assert isinstance(processed.dhash, int) and 0 <= processed.dhash < 2 ** 64
+
+
+def test_exif_orientation_is_applied(pipeline):
+    exif = Image.Exif()
+    # 6: rotate 90 degrees clockwise to display
+    exif[0x0112] = 6
+    data = _image((400, 200), format="JPEG", exif=exif)
+    processed = asyncio.run(pipeline.process(data, "image/jpeg"))
+    image = Image.open(io.BytesIO(processed.data))
+    assert image.size == (200, 400)
+    assert image.getexif().get(0x0112) in (None, 1)
+
+
+def test_small_photo_keeps_its_size(pipeline):
+    processed = asyncio.run(pipeline.process(_image((300, 200)), "image/png"))
+    assert Image.open(io.BytesIO(processed.data)).size == (300, 200)
+
+
+def test_unreadable_photo_is_passed_through(pipeline):
+    data = b"\xff\xd8\xff\xe0 truncated jpeg"
+    processed = asyncio.run(pipeline.process(data, "image/jpeg"))
+    assert processed.data == data and processed.mime_type == "image/jpeg"
+    assert processed.thumbnail is None and processed.dhash is None
+
+
+def test_stats(pipeline):
+    asyncio.run(pipeline.process(_image((2048, 2048)), "image/png"))
+    asyncio.run(pipeline.process(b"not an image", "image/png"))
+    stats = pipeline.get_stats()
+    assert stats["images"] == 1 and stats["failures"] == 1
+    assert stats["bytes_in"] > 0 and stats["bytes_out"] > 0
+    assert set(stats["avg_ms"]) == {"decode", "resize", "encode"}
@@ -0,0 +1,67 @@
+"""
+Tests for the local chat intent router.
+Run from backend directory: python -m pytest tests/test_intent_router.py
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services import intent_router as intents
+from app.services.intent_router import IntentRouter
+
+
+@pytest.fixture
+def router():
+    return IntentRouter()
+
+
+@pytest.mark.parametrize("message, intent", [
+    ("hi", intents.GREETING),
+    ("thanks!", intents.ACKNOWLEDGEMENT),
+    ("what's new?", intents.WHATS_NEW),
+    ("weather?", intents.WEATHER),
+    ("forecast", intents.WEATHER),
+    ("will it rain tomorrow?", intents.WEATHER),
+    ("weather today", intents.WEATHER),
+    ("hola, va a llover?", intents.WEATHER),
+    ("आज का मौसम", intents.WEATHER),
+    ("what should I do today?", intents.TODAY_PLAN),
+    ("my tasks", intents.TODAY_PLAN),
+    ("today's plan", intents.TODAY_PLAN),
+    ("crop status", intents.LATEST_STATUS),
+    ("last scan", intents.LAST_SCAN),
+])
+def test_lookups_answered_locally(router, message, intent):
+    assert router.match(message) == intent
+
+
+@pytest.mark.parametrize("message", [
+    "hot",
+    "cold",
+    "is rain good for my vines",
+    "do grapes need water when it is hot",
+    "cold storage for harvest",
+    "any tasks for irrigation",
+    "why is the weather affecting my grapes",
+    "what should I do today about mildew",
+    "rain and mildew risk this week",
+    "मेरे खेत में बारिश से नुकसान",
+    "what does my last scan mean",
+    "what to do today if rain",
+    "should I check the last scan",
+    "explain my crop status",
+    "weather today, what does it mean for harvest",
+    "आज का मौसम का मतलब",
+    "qué hacer hoy si llueve",
+])
+def test_questions_go_to_llm(router, message):
+    assert router.match(message) is None
+
+
+def test_counts_matches(router):
+    router.match("forecast")
+    router.match("is rain good for my vines")
+    assert router.get_stats() == {intents.WEATHER: 1}
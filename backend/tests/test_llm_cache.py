@@ -0,0 +1,83 @@
+"""
+Tests for the persistent LLM response cache.
+Run from backend directory: python -m pytest tests/test_llm_cache.py
+"""
+import asyncio
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services import llm_cache as llm_cache_module
+from app.services.llm_cache import LLMResponseCache
+
+make_key = LLMResponseCache.make_key
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = LLMResponseCache(str(tmp_path / "cache.sqlite"), ttl_hours=1)
+    cache.enabled = True
+    yield cache
+    cache.close()
+
+
+def test_key_hashes_everything_but_user_whitespace_exactly():
+    key = make_key("gpt-4o", "You are a grape expert.", "Why are my leaves yellow?", "en")
+    assert make_key("gpt-4o", "You are a grape expert.", "  Why are my\n leaves  yellow? ", "en") == key
+    assert make_key("gpt-4o", "You are a grape expert.", "why are my leaves yellow?", "en") != key
+    assert make_key("GPT-4o", "You are a grape expert.", "Why are my leaves yellow?", "en") != key
+    assert make_key("gpt-4o", "You are a  grape expert.", "Why are my leaves yellow?", "en") != key
+    assert make_key("gpt-4o", "You are a grape expert.", "Why are my leaves yellow?", "hi") != key
+    # Parts are separated, so text cannot move between them
+    assert make_key("gpt-4o", "a", "b", "en") != make_key("gpt-4o", "", "ab", "en")
+
+
+def test_hit_and_miss_are_counted_per_site(cache):
+    async def run():
+        key = make_key("gpt-4o", "system", "question", "en")
+        missed = await cache.get("chat", key)
+        await cache.set("chat", key, "answer")
+        hit = await cache.get("chat", key)
+        other = await cache.get("advice", make_key("gpt-4o", "system", "question", "es"))
+        return missed, hit, other
+
+    assert asyncio.run(run()) == (None, "answer", None)
+    assert cache.get_stats()["sites"] == {
+        "chat": {"hits": 1, "misses": 1, "hit_rate": 0.5},
+        "advice": {"hits": 0, "misses": 1, "hit_rate": 0.0},
+    }
+
+
+def test_entries_expire_after_ttl(cache, monkeypatch):
+    now = [1_000_000.0]
+    monkeypatch.setattr(llm_cache_module.time, "time", lambda: now[0])
+
+    async def run():
+        await cache.set("chat", "key", "answer")
+        now[0] += 3599
+        fresh = await cache.get("chat", "key")
+        now[0] += 2
+        return fresh, await cache.get("chat", "key")
+
+    assert asyncio.run(run()) == ("answer", None)
+
+
+def test_prune_evicts_least_recently_used(cache, monkeypatch):
+    now = [1_000_000.0]
+    monkeypatch.setattr(llm_cache_module.time, "time", lambda: now[0])
+    cache.max_bytes = 20
+
+    async def run():
+        for key in ("a", "b", "c"):
+            now[0] += 1
+            await cache.set("chat", key, "x" * 10)
+        now[0] += 1
+        # Reading "a" makes "b" the least recently used
+        await cache.get("chat", "a")
+        cache._prune(cache._connect())
+        return [await cache.get("chat", key) for key in ("a", "b", "c")]
+
+    assert asyncio.run(run()) == ["x" * 10, None, "x" * 10]
@@ -0,0 +1,130 @@
+"""
+Tests for the LLM gateway's concurrency limits and token-per-minute bucket.
+Run from backend directory: python -m pytest tests/test_llm_gateway.py
+"""
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from types import SimpleNamespace
+
+import pytest
+
+from app.services.llm_gateway import LLMGateway, TokenBucket, _parse_endpoint_limits
+
+
+def test_acquire_within_budget_does_not_wait():
+    async def run():
+        bucket = TokenBucket(60000)
+        started = time.perf_counter()
+        await bucket.acquire(40000)
+        await bucket.acquire(20000)
+        return bucket, time.perf_counter() - started
+
+    bucket, elapsed = asyncio.run(run())
+    assert elapsed < 0.05
+    assert bucket.tokens < 100
+
+
+def test_refill_and_adjust():
+    bucket = TokenBucket(6000)
+    bucket.tokens = 0
+    bucket.updated -= 30
+    bucket._refill()
+    assert 2990 < bucket.tokens < 3010
+    # Actual usage below the estimate gives tokens back, capped at capacity
+    bucket.adjust(10000)
+    assert bucket.tokens == 6000
+    bucket.adjust(-1000)
+    assert 4990 < bucket.tokens < 5010
+
+
+def test_empty_bucket_waits_for_refill():
+    async def run():
+        # 100 tokens per second
+        bucket = TokenBucket(6000)
+        await bucket.acquire(6000)
+        started = time.perf_counter()
+        await bucket.acquire(10)
+        return time.perf_counter() - started
+
+    assert 0.05 < asyncio.run(run()) < 1.0
+
+
+def test_oversized_request_waits_only_for_a_full_bucket():
+    async def run():
+        bucket = TokenBucket(6000)
+        await bucket.acquire(50000)
+        return bucket
+
+    assert asyncio.run(run()).tokens < 10
+
+
+def test_parse_endpoint_limits():
+    assert _parse_endpoint_limits("chat=4, advice=2,scan=0,bad,scan2=x") == {"chat": 4, "advice": 2, "scan": 1}
+
+
+@pytest.fixture
+def gateway_env(monkeypatch):
+    monkeypatch.setenv("LLM_MAX_CONCURRENCY", "3")
+    monkeypatch.setenv("LLM_ENDPOINT_CONCURRENCY", "4")
+    monkeypatch.setenv("LLM_ENDPOINT_LIMITS", "chat=2")
+    monkeypatch.setenv("LLM_TOKENS_PER_MINUTE", "60000")
+
+
+def test_endpoint_and_global_semaphores_cap_concurrency(gateway_env):
+    running = {"chat": 0, "scan": 0}
+    peaks = {"chat": 0, "scan": 0, "total": 0}
+
+    def request(endpoint):
+        async def call():
+            running[endpoint] += 1
+            peaks[endpoint] = max(peaks[endpoint], running[endpoint])
+            peaks["total"] = max(peaks["total"], sum(running.values()))
+            await asyncio.sleep(0.02)
+            running[endpoint] -= 1
+            return SimpleNamespace(usage=None)
+        return call
+
+    async def run():
+        gateway = LLMGateway()
+        # Any client skips start(); requests never touch it
+        gateway.client = object()
+        await asyncio.gather(*(
+            gateway._call(endpoint, 10, request(endpoint))
+            for endpoint in ["chat"] * 6 + ["scan"] * 6
+        ))
+        return gateway
+
+    gateway = asyncio.run(run())
+    assert peaks["chat"] == 2
+    assert peaks["total"] == 3
+    metrics = gateway.get_metrics()["endpoints"]
+    assert metrics["chat"]["calls"] == 6 and metrics["scan"]["calls"] == 6
+    assert all(m["in_flight"] == 0 for m in metrics.values())
+
+
+def test_failed_call_frees_its_slot_and_usage_refunds_the_estimate(gateway_env):
+    async def fail():
+        raise ValueError("provider error")
+
+    async def succeed():
+        return SimpleNamespace(usage=SimpleNamespace(total_tokens=100))
+
+    async def run():
+        gateway = LLMGateway()
+        gateway.client = object()
+        with pytest.raises(ValueError):
+            await gateway._call("chat", 1000, fail)
+        await gateway._call("chat", 1000, succeed)
+        return gateway
+
+    gateway = asyncio.run(run())
+    chat = gateway.get_metrics()["endpoints"]["chat"]
+    assert chat["errors"] == 1 and chat["in_flight"] == 0
+    assert chat["tokens"] == 100
+    # 2000 estimated tokens were taken; 900 of them came back
+    assert 58900 <= gateway.bucket.tokens <= 59000
@@ -0,0 +1,174 @@
+"""
+Tests for the local scan pre-filter.
+Run from backend directory: python -m pytest tests/test_local_scanner.py
+"""
+import asyncio
+import io
+import os
+import random
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image, ImageFilter, ImageStat
+
+from app.routers import scan
+from app.services.admission import AdmissionController
+from app.services.llm_gateway import LLMGateway
+from app.services.local_scanner import (
+    LocalScanner, ModelBundle, extract_features, FEATURE_NAMES, HUE_BINS, CONFIDENCE_THRESHOLD
+)
+from app.services.photo_store import SavedPhoto
+
+
+def _jpeg(image: Image.Image) -> bytes:
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG")
+    return buffer.getvalue()
+
+
+def _noisy_image(seed: int = 3) -> Image.Image:
+    rng = random.Random(seed)
+    image = Image.new("RGB", (96, 64))
+    image.putdata([(rng.randrange(256), rng.randrange(256), rng.randrange(256)) for _ in range(96 * 64)])
+    return image
+
+
+def _reference_features(image):
+    """The original per-pixel loop, kept to check the vectorised version"""
+    hsv = image.convert("HSV")
+    stat = ImageStat.Stat(hsv)
+    features = [m / 255 for m in stat.mean] + [s / 255 for s in stat.stddev]
+    hues = [0] * HUE_BINS
+    green = purple = white = brown = dark = 0
+    pixels = hsv.tobytes()
+    total = len(pixels) // 3
+    for i in range(0, len(pixels), 3):
+        h, s, v = pixels[i], pixels[i + 1], pixels[i + 2]
+        if v < 40:
+            dark += 1
+        elif s < 40 and v > 180:
+            white += 1
+        elif s >= 40:
+            hues[h * HUE_BINS // 256] += 1
+            degrees = h * 360 // 256
+            if 60 <= degrees < 160:
+                green += 1
+            elif degrees >= 260:
+                purple += 1
+            elif 10 <= degrees < 45 and v < 170:
+                brown += 1
+    features += [count / total for count in hues]
+    features += [green / total, purple / total, white / total, brown / total, dark / total]
+    grey = image.convert("L")
+    features.append(ImageStat.Stat(grey.filter(ImageFilter.FIND_EDGES)).mean[0] / 255)
+    features.append(ImageStat.Stat(grey).stddev[0] / 255)
+    return features
+
+
+def test_extract_features_matches_per_pixel_reference():
+    image = _noisy_image()
+    features = extract_features(image)
+    assert len(features) == len(FEATURE_NAMES)
+    assert features == pytest.approx(_reference_features(image))
+
+
+class StubClassifier:
+    def __init__(self, classes, probabilities):
+        self.classes_ = classes
+        self.probabilities = probabilities
+        self.rows = []
+
+    def predict_proba(self, rows):
+        self.rows.extend(rows)
+        return [self.probabilities]
+
+
+def _bundle(stage_probabilities, mildew: float) -> ModelBundle:
+    return ModelBundle({
+        "stage": StubClassifier(["flowering", "veraison", "harvest"], stage_probabilities),
+        "issues": {"mildew-like signs": StubClassifier([False, True], [1 - mildew, mildew])},
+    })
+
+
+def test_predict_maps_stage_issues_and_confidence():
+    prediction = _bundle([0.05, 0.93, 0.02], mildew=0.85).predict([0.0] * len(FEATURE_NAMES))
+    assert prediction.stage == "veraison"
+    assert prediction.source == "model"
+    assert prediction.issues == [{"name": "mildew-like signs", "severity": 2, "confidence": 0.85}]
+    # The least certain answer bounds the whole prediction
+    assert prediction.confidence == pytest.approx(0.85)
+
+    analysis = prediction.to_analysis("en")
+    assert analysis["stage"] == "veraison"
+    assert "mildew-like signs" in analysis["summary"]
+
+
+def test_unsure_issue_lowers_confidence():
+    prediction = _bundle([0.0, 0.99, 0.01], mildew=0.4).predict([0.0] * len(FEATURE_NAMES))
+    assert prediction.issues == []
+    assert prediction.confidence == pytest.approx(0.6)
+
+
+def test_no_prediction_without_trained_model():
+    scanner = LocalScanner("", threshold=0.85)
+    assert not scanner.available
+    # A plain purple image must not come back as a "harvest" stage guess
+    assert asyncio.run(scanner.predict(_jpeg(Image.new("RGB", (64, 64), (110, 30, 140))))) is None
+    assert scanner.get_stats()["predictions"] == 0
+
+
+@pytest.fixture
+def analyze(monkeypatch):
+    """analyze_photo with storage, DB and the vision model replaced; returns (run, vision calls)"""
+    calls = []
+
+    async def noop(*args, **kwargs):
+        return None
+
+    async def vision(image, mime_type, lang, image_hash):
+        calls.append(image_hash)
+        return {"stage": "fruit_set", "issues": [], "summary": "From the vision model", "next_actions": []}
+
+    async def find(*args, **kwargs):
+        return None
+
+    for name in ("save_thumbnail", "set_dhash", "store_analysis"):
+        monkeypatch.setattr(scan, name, noop)
+    monkeypatch.setattr(scan.near_duplicates, "find", find)
+    monkeypatch.setattr(scan, "analyze_image_with_ai", vision)
+    monkeypatch.setattr(scan, "admission", AdmissionController(max_limit=4, min_limit=1, latency_target=10))
+    monkeypatch.setattr(LLMGateway, "available", property(lambda self: True))
+
+    def run(scanner):
+        monkeypatch.setattr(scan, "local_scanner", scanner)
+        data = _jpeg(_noisy_image())
+        photo = SavedPhoto("abc.jpg", "uploads/abc.jpg", data, "abc", "image/jpeg")
+        result, image = asyncio.run(scan.analyze_photo(None, "farm-1", photo, "en"))
+        return result
+
+    return run, calls
+
+
+def _scanner_with(bundle: ModelBundle) -> LocalScanner:
+    scanner = LocalScanner("", threshold=CONFIDENCE_THRESHOLD)
+    scanner.model = bundle
+    return scanner
+
+
+def test_confident_local_prediction_skips_vision(analyze):
+    run, calls = analyze
+    result = run(_scanner_with(_bundle([0.01, 0.98, 0.01], mildew=0.02)))
+    assert calls == []
+    assert result["stage"] == "veraison"
+    assert result["local_scan"]["source"] == "model"
+
+
+def test_unsure_local_prediction_falls_back_to_vision(analyze):
+    run, calls = analyze
+    result = run(_scanner_with(_bundle([0.3, 0.4, 0.3], mildew=0.02)))
+    assert calls == ["abc"]
+    assert result["summary"] == "From the vision model"
+    assert "local_scan" not in result
@@ -0,0 +1,39 @@
+"""
+Tests for fast / quality model routing.
+Run from backend directory: python -m pytest tests/test_model_router.py
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.model_router import ModelRouter, FAST, QUALITY
+
+
+@pytest.fixture
+def router():
+    return ModelRouter()
+
+
+@pytest.mark.parametrize("message", [
+    "मेरे खेत का मौसम",
+    "आज का काम",
+    "weather tomorrow",
+    "protect the vines tonight",
+])
+def test_simple_messages_stay_fast(router, message):
+    assert router.route_chat(message, needs_context=False).tier == FAST
+
+
+@pytest.mark.parametrize("message", [
+    "पाने पिवळी कशामुळे होतात",
+    "पत्ते पीले क्यों हो रहे हैं",
+    "why are my berries cracking",
+    "¿por qué se agrietan las uvas?",
+])
+def test_diagnosis_questions_go_to_quality(router, message):
+    decision = router.route_chat(message, needs_context=False)
+    assert decision.tier == QUALITY
+    assert decision.reason == "intent"
@@ -0,0 +1,55 @@
+"""
+Tests for perceptual hashing and the near-duplicate BK-tree.
+Run from backend directory: python -m pytest tests/test_near_duplicates.py
+"""
+import os
+import random
+import sys
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image, ImageDraw, ImageEnhance
+
+from app.services.image_pipeline import dhash
+from app.services.near_duplicates import BKTree, hamming
+
+
+def _scene() -> Image.Image:
+    image = Image.new("RGB", (320, 240), (40, 120, 40))
+    draw = ImageDraw.Draw(image)
+    draw.ellipse((60, 40, 200, 200), fill=(110, 30, 140))
+    draw.rectangle((220, 20, 300, 120), fill=(200, 200, 190))
+    return image
+
+
+def test_dhash_is_stable_under_small_edits():
+    original = _scene()
+    brighter = ImageEnhance.Brightness(original).enhance(1.1)
+    resized = original.resize((160, 120))
+    different = original.transpose(Image.FLIP_LEFT_RIGHT)
+    assert hamming(dhash(original), dhash(brighter)) <= 4
+    assert hamming(dhash(original), dhash(resized)) <= 4
+    assert hamming(dhash(original), dhash(different)) > 10
+
+
+def test_bk_tree_matches_brute_force():
+    rng = random.Random(7)
+    when = datetime(2026, 6, 1)
+    hashes = [rng.getrandbits(64) for _ in range(300)]
+    tree = BKTree()
+    for i, value in enumerate(hashes):
+        tree.add(value, f"photo-{i}", when)
+    # A repeated hash adds a photo to the existing node
+    tree.add(hashes[0], "photo-again", when)
+    assert tree.size == 301
+
+    for query in hashes[:20] + [hashes[5] ^ 0b1011]:
+        expected = {
+            (hamming(query, value), f"photo-{i}") for i, value in enumerate(hashes)
+            if hamming(query, value) <= 12
+        }
+        if hamming(query, hashes[0]) <= 12:
+            expected.add((hamming(query, hashes[0]), "photo-again"))
+        found = {(distance, sha256) for distance, sha256, at in tree.search(query, 12)}
+        assert found == expected
@@ -0,0 +1,132 @@
+"""
+Tests for the photo storage backends (S3 against an in-memory stub client).
+Run from backend directory: python -m pytest tests/test_photo_storage.py
+"""
+import asyncio
+import io
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services import photo_storage as storage_module
+from app.services.photo_storage import LocalPhotoStorage, PhotoStorage, S3PhotoStorage
+
+
+class ClientError(Exception):
+    def __init__(self, code: str):
+        super().__init__(code)
+        self.response = {"Error": {"Code": code}}
+
+
+class StubS3Client:
+    """The subset of the boto3 S3 client the backend uses, kept in a dict"""
+
+    class exceptions:
+        ClientError = ClientError
+
+    def __init__(self):
+        self.objects = {}
+        self.uploads = {}
+
+    def put_object(self, Bucket, Key, Body):
+        self.objects[(Bucket, Key)] = bytes(Body)
+
+    def get_object(self, Bucket, Key, Range=None):
+        if (Bucket, Key) not in self.objects:
+            raise ClientError("NoSuchKey")
+        data = self.objects[(Bucket, Key)]
+        if Range:
+            start, end = (int(part) for part in Range.removeprefix("bytes=").split("-"))
+            data = data[start:end + 1]
+        return {"Body": io.BytesIO(data)}
+
+    def head_object(self, Bucket, Key):
+        if (Bucket, Key) not in self.objects:
+            raise ClientError("404")
+        return {"ContentLength": len(self.objects[(Bucket, Key)])}
+
+    def delete_object(self, Bucket, Key):
+        self.objects.pop((Bucket, Key), None)
+
+    def create_multipart_upload(self, Bucket, Key):
+        upload_id = f"upload-{len(self.uploads)}"
+        self.uploads[upload_id] = {}
+        return {"UploadId": upload_id}
+
+    def upload_part(self, Bucket, Key, UploadId, PartNumber, Body):
+        self.uploads[UploadId][PartNumber] = Body
+        return {"ETag": f'"{PartNumber}"'}
+
+    def complete_multipart_upload(self, Bucket, Key, UploadId, MultipartUpload):
+        parts = self.uploads.pop(UploadId)
+        self.objects[(Bucket, Key)] = b"".join(parts[p["PartNumber"]] for p in MultipartUpload["Parts"])
+
+    def abort_multipart_upload(self, Bucket, Key, UploadId):
+        self.uploads.pop(UploadId, None)
+
+    def copy_object(self, Bucket, Key, CopySource):
+        self.objects[(Bucket, Key)] = self.objects[(CopySource["Bucket"], CopySource["Key"])]
+
+
+@pytest.fixture
+def s3():
+    return S3PhotoStorage("photos-bucket", prefix="photos", client=StubS3Client())
+
+
+def test_storage_base_is_abstract():
+    with pytest.raises(TypeError):
+        PhotoStorage()
+
+
+def test_s3_put_get_exists_range(s3):
+    name = "abcdef.jpg"
+    assert not asyncio.run(s3.exists(name))
+    assert asyncio.run(s3.get(name)) is None
+
+    asyncio.run(s3.put(name, b"0123456789"))
+    assert ("photos-bucket", "photos/ab/cd/abcdef.jpg") in s3.client.objects
+    assert asyncio.run(s3.exists(name))
+    assert asyncio.run(s3.get(name)) == b"0123456789"
+    assert asyncio.run(s3.get(name, (2, 5))) == b"2345"
+
+    asyncio.run(s3.delete(name))
+    assert not asyncio.run(s3.exists(name))
+
+
+def test_s3_multipart_upload(s3, monkeypatch):
+    monkeypatch.setattr(storage_module, "S3_PART_SIZE", 4)
+
+    async def upload():
+        upload = await s3.begin_upload()
+        for chunk in (b"abcd", b"efgh", b"ij"):
+            await upload.write(chunk)
+        await upload.commit("ffee.jpg")
+
+    asyncio.run(upload())
+    assert asyncio.run(s3.get("ffee.jpg")) == b"abcdefghij"
+    # Only the final key is left behind
+    assert list(s3.client.objects) == [("photos-bucket", "photos/ff/ee/ffee.jpg")]
+
+
+def test_local_put_get_range(tmp_path):
+    local = LocalPhotoStorage(tmp_path)
+    asyncio.run(local.put("abcdef.jpg", b"0123456789"))
+    assert (tmp_path / "ab" / "cd" / "abcdef.jpg").is_file()
+    assert asyncio.run(local.get("abcdef.jpg", (7, 9))) == b"789"
+    assert asyncio.run(local.get("missing.jpg")) is None
+
+
+def test_s3_misconfiguration_fails_at_startup(monkeypatch):
+    monkeypatch.setattr(storage_module, "STORAGE_BACKEND", "s3")
+    monkeypatch.setattr(storage_module, "BOTO3_AVAILABLE", True)
+    monkeypatch.delenv("S3_BUCKET", raising=False)
+    with pytest.raises(RuntimeError):
+        storage_module.create_storage()
+
+    monkeypatch.setattr(storage_module, "BOTO3_AVAILABLE", False)
+    monkeypatch.setenv("S3_BUCKET", "photos-bucket")
+    with pytest.raises(RuntimeError):
+        storage_module.create_storage()
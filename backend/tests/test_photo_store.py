@@ -0,0 +1,121 @@
+"""
+Tests for content-addressed photo storage and photo reference counting.
+Run from backend directory: python -m pytest tests/test_photo_store.py
+"""
+import asyncio
+import io
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi import UploadFile
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+from app.db import Base
+from app.models import PhotoBlob, ScanResult
+from app.services import photo_store
+from app.services.photo_storage import LocalPhotoStorage
+from app.services.photo_store import (
+    add_reference, release, save_thumbnail, save_upload, sniff_image_type, UnsupportedImage, UploadTooLarge
+)
+
+JPEG = b"\xff\xd8\xff\xe0" + b"jpeg body" * 10
+PNG = b"\x89PNG\r\n\x1a\n" + b"png body" * 10
+
+
+def _upload(data: bytes, filename: str = "photo.png") -> UploadFile:
+    return UploadFile(file=io.BytesIO(data), filename=filename)
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    """A session factory on a fresh SQLite database, with photos stored under tmp_path"""
+    storage = LocalPhotoStorage(tmp_path / "uploads")
+    monkeypatch.setattr(photo_store, "photo_storage", storage)
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'photos.db'}")
+
+    async def create():
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+
+    asyncio.run(create())
+    yield async_sessionmaker(engine, expire_on_commit=False), storage
+    asyncio.run(engine.dispose())
+
+
+def test_sniff_image_type():
+    assert sniff_image_type(JPEG) == (".jpg", "image/jpeg")
+    assert sniff_image_type(PNG) == (".png", "image/png")
+    assert sniff_image_type(b"RIFF\x00\x00\x00\x00WEBPVP8 ") == (".webp", "image/webp")
+    assert sniff_image_type(b"GIF89a...") == (".gif", "image/gif")
+    assert sniff_image_type(b"\x00\x00\x00\x18ftypheic\x00\x00") == (".heic", "image/heic")
+    assert sniff_image_type(b"<html>not a photo</html>") is None
+
+
+def test_same_photo_is_stored_once(store):
+    sessions, storage = store
+
+    async def run():
+        async with sessions() as db:
+            first = await save_upload(_upload(JPEG, "a.png"), db)
+            second = await save_upload(_upload(JPEG, "b.webp"), db)
+            blobs = (await db.execute(select(PhotoBlob))).scalars().all()
+        return first, second, blobs
+
+    first, second, blobs = asyncio.run(run())
+    assert not first.duplicate and second.duplicate
+    assert first.photo_path == second.photo_path
+    # The extension and MIME type come from the bytes, not the filename
+    assert first.name.endswith(".jpg") and first.mime_type == "image/jpeg"
+    assert second.mime_type == "image/jpeg"
+    assert [blob.path for blob in blobs] == [first.photo_path]
+    assert asyncio.run(storage.get(first.name)) == JPEG
+
+
+def test_rejected_uploads_keep_nothing(store):
+    sessions, storage = store
+
+    async def run():
+        async with sessions() as db:
+            with pytest.raises(UnsupportedImage):
+                await save_upload(_upload(b"<html>not a photo</html>", "photo.jpg"), db)
+            with pytest.raises(UploadTooLarge):
+                await save_upload(_upload(PNG), db, max_bytes=16)
+            return (await db.execute(select(PhotoBlob))).scalars().all()
+
+    assert asyncio.run(run()) == []
+    assert [path for path in storage.root.rglob("*") if path.is_file()] == []
+
+
+def test_photo_is_deleted_with_its_last_reference(store):
+    sessions, storage = store
+
+    async def run():
+        async with sessions() as db:
+            photo = await save_upload(_upload(PNG), db)
+            await save_thumbnail(photo, b"thumbnail")
+            db.add(ScanResult(sha256=photo.sha256, lang="en", model_version="v1", result="{}"))
+            await add_reference(db, photo.sha256)
+            await add_reference(db, photo.sha256)
+            await db.commit()
+
+            await release(db, [photo.sha256])
+            kept = await db.get(PhotoBlob, photo.sha256)
+            kept_refs = kept.ref_count
+            kept_file = await storage.exists(photo.name)
+
+            await release(db, [photo.sha256])
+            db.expunge_all()
+            gone = await db.get(PhotoBlob, photo.sha256)
+            results = (await db.execute(select(ScanResult))).scalars().all()
+        return photo, kept_refs, kept_file, gone, results
+
+    photo, kept_refs, kept_file, gone, results = asyncio.run(run())
+    assert kept_refs == 1 and kept_file
+    assert gone is None and results == []
+    assert not asyncio.run(storage.exists(photo.name))
+    assert not asyncio.run(storage.exists(photo_store.thumbnail_name(photo.name)))
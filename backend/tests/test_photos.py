@@ -0,0 +1,82 @@
+"""
+Tests for photo serving: ETags, 304 and Range requests.
+Run from backend directory: python -m pytest tests/test_photos.py
+"""
+import asyncio
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.routers import photos
+from app.services.photo_storage import LocalPhotoStorage
+
+SHA256 = "ab" * 32
+NAME = f"{SHA256}.jpg"
+BODY = bytes(range(100))
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    storage = LocalPhotoStorage(tmp_path)
+    asyncio.run(storage.put(NAME, BODY))
+    monkeypatch.setattr(photos, "photo_storage", storage)
+    app = FastAPI()
+    app.include_router(photos.router, prefix="/api/photos")
+    return TestClient(app)
+
+
+def test_full_response_has_content_hash_etag(client):
+    response = client.get(f"/api/photos/{NAME}")
+    assert response.status_code == 200
+    assert response.content == BODY
+    assert response.headers["etag"] == f'"{SHA256}"'
+    assert "immutable" in response.headers["cache-control"]
+
+
+def test_if_none_match_gives_304(client):
+    response = client.get(f"/api/photos/{NAME}", headers={"If-None-Match": f'W/"{SHA256}"'})
+    assert response.status_code == 304
+    assert response.content == b""
+
+
+@pytest.mark.parametrize("header, content_range, body", [
+    ("bytes=10-19", "bytes 10-19/100", BODY[10:20]),
+    ("bytes=90-", "bytes 90-99/100", BODY[90:]),
+    ("bytes=-5", "bytes 95-99/100", BODY[95:]),
+    ("bytes=95-500", "bytes 95-99/100", BODY[95:]),
+])
+def test_range_gives_206(client, header, content_range, body):
+    response = client.get(f"/api/photos/{NAME}", headers={"Range": header})
+    assert response.status_code == 206
+    assert response.headers["content-range"] == content_range
+    assert response.content == body
+
+
+def test_unsatisfiable_range_gives_416(client):
+    response = client.get(f"/api/photos/{NAME}", headers={"Range": "bytes=200-300"})
+    assert response.status_code == 416
+    assert response.headers["content-range"] == "bytes */100"
+
+
+@pytest.mark.parametrize("header", ["bytes=5-3", "bytes=200-100", "items=0-9"])
+def test_invalid_range_is_ignored(client, header):
+    response = client.get(f"/api/photos/{NAME}", headers={"Range": header})
+    assert response.status_code == 200
+    assert response.content == BODY
+    assert "content-range" not in response.headers
+
+
+def test_stale_if_range_sends_whole_photo(client):
+    response = client.get(f"/api/photos/{NAME}", headers={"Range": "bytes=0-9", "If-Range": '"other"'})
+    assert response.status_code == 200
+    assert response.content == BODY
+
+
+def test_path_names_are_rejected(client):
+    assert client.get("/api/photos/..%2Fsecret.jpg").status_code == 404
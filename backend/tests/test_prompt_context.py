@@ -0,0 +1,70 @@
+"""
+Tests for topic-based context selection and the context token budget.
+Run from backend directory: python -m pytest tests/test_prompt_context.py
+"""
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.farm_context_cache import compact_json
+from app.services.prompt_context import build_context_json, select_sections, PromptStats
+
+
+def test_select_sections_by_topic():
+    assert select_sections("Will it rain this week?") == ["latest_status", "weather_forecast"]
+    assert select_sections("Should I irrigate tomorrow?") == [
+        "latest_status", "weather_forecast", "recent_irrigation", "block"
+    ]
+    assert select_sections("क्या बारिश होगी?") == ["latest_status", "weather_forecast"]
+    assert select_sections("What is the brix now?") == ["latest_status", "recent_brix"]
+    # Keywords must start a word
+    assert select_sections("I went to a pruning training") == []
+    assert select_sections("Hello!") == []
+
+
+def test_context_within_budget_is_kept_whole():
+    context = {"latest_status": {"stage": "veraison"}, "recent_brix": [{"brix": 16.5}, {"brix": 15.0}]}
+    context_json, tokens = build_context_json(context, ["latest_status", "recent_brix", "block"], budget=400)
+    assert json.loads(context_json) == context
+    assert tokens < 400
+
+
+def test_over_budget_trims_the_longest_list_before_dropping_sections():
+    scouting = [{"issue": "mildew", "severity": 3, "notes": "spots on the lower leaves " * 3}] * 10
+    brix = [{"brix": 16.5}, {"brix": 15.0}]
+    context = {"latest_status": {"stage": "veraison"}, "recent_scouting": scouting, "recent_brix": brix}
+    sections = ["latest_status", "recent_scouting", "recent_brix"]
+
+    context_json, tokens = build_context_json(context, sections, budget=80)
+    trimmed = json.loads(context_json)
+    assert tokens <= 80
+    assert trimmed["latest_status"] == {"stage": "veraison"}
+    # The newest entries of the long list survive; the short list is untouched
+    assert 1 <= len(trimmed["recent_scouting"]) < 10
+    assert trimmed["recent_brix"] == brix
+
+    # Once lists are down to one entry, the lowest-priority sections go
+    context_json, tokens = build_context_json(context, sections, budget=12)
+    assert json.loads(context_json) == {"latest_status": {"stage": "veraison"}}
+
+
+def test_pre_encoded_sections_are_reused():
+    encoded = {"latest_status": compact_json({"stage": "from snapshot"})}
+    context = {"latest_status": {"stage": "ignored"}, "weather_forecast": {"rain": 0}}
+    context_json, _ = build_context_json(context, ["latest_status", "weather_forecast"], encoded)
+    assert json.loads(context_json) == {"latest_status": {"stage": "from snapshot"}, "weather_forecast": {"rain": 0}}
+    # The caller's cached encodings are not modified
+    assert list(encoded) == ["latest_status"]
+
+
+def test_prompt_stats_per_site():
+    stats = PromptStats()
+    stats.record("chat", 300, 100)
+    stats.record("chat", 500, 200)
+    stats.record("advice", 800)
+    assert stats.get_stats() == {
+        "chat": {"prompts": 2, "avg_prompt_tokens": 400.0, "avg_context_tokens": 150.0, "max_prompt_tokens": 500},
+        "advice": {"prompts": 1, "avg_prompt_tokens": 800.0, "avg_context_tokens": 0.0, "max_prompt_tokens": 800},
+    }
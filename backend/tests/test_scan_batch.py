@@ -0,0 +1,120 @@
+"""
+Tests for batch scan upload validation and the photos a batch log records.
+Run from backend directory: python -m pytest tests/test_scan_batch.py
+"""
+import asyncio
+import io
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi import HTTPException, UploadFile
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from starlette.datastructures import Headers
+
+from app.db import Base
+from app.models import PhotoBlob, ScoutingLog, ScoutingLogPhoto
+from app.routers import logs, scan
+from app.services import photo_store
+from app.services.image_pipeline import ProcessedImage
+from app.services.near_duplicates import NearDuplicateIndex
+from app.services.photo_store import SavedPhoto
+
+JPEG = b"\xff\xd8\xff\xe0"
+
+
+def _upload(size: int, content_type: str = "image/jpeg", declared: bool = True, data: bytes = JPEG) -> UploadFile:
+    return UploadFile(
+        file=io.BytesIO(data + b"x" * (size - len(data))), size=size if declared else None, filename="photo.jpg",
+        headers=Headers({"content-type": content_type})
+    )
+
+
+@pytest.fixture
+def stored(monkeypatch):
+    saved = []
+
+    async def get_scan_language(db, farm_id, lang):
+        return "en"
+
+    async def save(data, db):
+        saved.append(data)
+        raise AssertionError("nothing should be stored")
+
+    monkeypatch.setattr(scan, "get_scan_language", get_scan_language)
+    monkeypatch.setattr(scan, "save_upload", save)
+    monkeypatch.setattr(scan, "save_photo", save)
+    monkeypatch.setattr(scan, "MAX_UPLOAD_BYTES", 100)
+    return saved
+
+
+@pytest.mark.parametrize("files, status", [
+    ([_upload(10), _upload(500)], 413),
+    ([_upload(10), _upload(10, "text/plain")], 400),
+    # Only the streamed size reveals these
+    ([_upload(10), _upload(500, declared=False)], 413),
+    ([_upload(10), _upload(10, data=b"<html>")], 400),
+])
+def test_rejected_batch_stores_nothing(stored, files, status):
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(scan.scan_batch(
+            farm_id="farm-1", block_id=None, files=files, notes=None, lang="en", mode="sync", db=None
+        ))
+    assert error.value.status_code == status
+    assert stored == []
+
+
+def test_batch_log_records_every_photo(tmp_path, monkeypatch):
+    deleted = []
+
+    async def delete(name):
+        deleted.append(name)
+
+    monkeypatch.setattr(photo_store.photo_storage, "delete", delete)
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'scan.db'}")
+    hashes = {"a" * 64: 0x0F0F, "b" * 64: 0xF0F0}
+
+    async def run():
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        sessions = async_sessionmaker(engine, expire_on_commit=False)
+        async with sessions() as db:
+            photos = []
+            for sha256, dhash in hashes.items():
+                db.add(PhotoBlob(
+                    sha256=sha256, path=f"uploads/{sha256}.jpg", mime_type="image/jpeg", size=4, dhash=f"{dhash:016x}"
+                ))
+                photos.append((SavedPhoto(f"{sha256}.jpg", f"uploads/{sha256}.jpg", JPEG, sha256, "image/jpeg"),
+                               ProcessedImage(JPEG, "image/jpeg", dhash=dhash)))
+            await db.commit()
+            result = {"issues": [], "summary": "Healthy canopy"}
+            # The same photo twice in one batch is one reference
+            log = await scan.create_scan_log(db, "farm-1", None, None, result, photos + photos[:1])
+
+            linked = (await db.execute(
+                select(ScoutingLogPhoto.sha256).order_by(ScoutingLogPhoto.position)
+            )).scalars().all()
+            refs = (await db.execute(select(PhotoBlob.ref_count))).scalars().all()
+            tree = await NearDuplicateIndex()._build("farm-1", db)
+
+            await logs.delete_scouting_log(log.id, db=db)
+            remaining = (await db.execute(select(PhotoBlob))).scalars().all()
+            links = (await db.execute(select(ScoutingLogPhoto))).scalars().all()
+            log_rows = (await db.execute(select(ScoutingLog))).scalars().all()
+        await engine.dispose()
+        return log, linked, refs, tree, remaining, links, log_rows
+
+    log, linked, refs, tree, remaining, links, log_rows = asyncio.run(run())
+    assert log.photo_path == f"uploads/{'a' * 64}.jpg"
+    assert linked == list(hashes)
+    assert refs == [1, 1]
+    # The second photo of the batch is found as a near-duplicate too
+    assert tree.size == 2
+    assert remaining == [] and links == [] and log_rows == []
+    assert sorted(deleted) == sorted(
+        name for sha256 in hashes for name in (f"{sha256}.jpg", f"{sha256}.thumb.jpg")
+    )
@@ -0,0 +1,106 @@
+"""
+Tests for background (mode=async) scan jobs.
+Run from backend directory: python -m pytest tests/test_scan_jobs.py
+"""
+import asyncio
+import io
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi import UploadFile
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from starlette.datastructures import Headers
+
+from app.db import Base
+from app.routers import scan
+from app.services import photo_store
+from app.services.photo_storage import LocalPhotoStorage
+from app.services.scan_queue import ScanQueue
+
+JPEG = b"\xff\xd8\xff\xe0" + b"jpeg body" * 10
+
+
+def _upload(data: bytes = JPEG) -> UploadFile:
+    return UploadFile(
+        file=io.BytesIO(data), size=len(data), filename="photo.jpg",
+        headers=Headers({"content-type": "image/jpeg"})
+    )
+
+
+@pytest.fixture
+def queued(tmp_path, monkeypatch):
+    """scan_image wired to a tmp database and photo store; run_scan records what the job received"""
+    storage = LocalPhotoStorage(tmp_path / "uploads")
+    monkeypatch.setattr(photo_store, "photo_storage", storage)
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'scan.db'}")
+    sessions = async_sessionmaker(engine, expire_on_commit=False)
+    monkeypatch.setattr(scan, "AsyncSessionLocal", sessions)
+    monkeypatch.setattr(scan, "scan_queue", ScanQueue(workers=1, max_pending=5))
+    received = []
+
+    async def get_scan_language(db, farm_id, lang):
+        return "en"
+
+    async def run_scan(db, farm_id, block_id, notes, lang, photo, progress=None):
+        received.append(photo)
+        progress("analyzing")
+        return {"stage": "veraison", "issues": [], "summary": "ok", "next_actions": []}
+
+    monkeypatch.setattr(scan, "get_scan_language", get_scan_language)
+    monkeypatch.setattr(scan, "run_scan", run_scan)
+
+    async def create():
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+
+    asyncio.run(create())
+    yield sessions, storage, received
+    asyncio.run(engine.dispose())
+
+
+async def _submit(sessions):
+    async with sessions() as db:
+        return await scan.scan_image(
+            farm_id="farm-1", block_id=None, file=_upload(), notes=None, lang="en", mode="async", db=db
+        )
+
+
+def test_async_scan_reloads_the_photo_from_storage(queued):
+    sessions, storage, received = queued
+
+    async def run():
+        response = await _submit(sessions)
+        pending = scan.jobs.get(response["job_id"])
+        done = await scan.jobs.wait(response["job_id"], timeout=5)
+        return response, pending, done
+
+    response, pending, done = asyncio.run(run())
+    assert response["status"] == "pending"
+    assert pending["status"] == "pending" and pending["progress"] == "queued"
+    assert done["status"] == "done" and done["result"]["stage"] == "veraison"
+    # The job got the stored bytes back by name, not the request's copy
+    [photo] = received
+    assert photo.photo_path == response["photo_path"]
+    assert photo.data == JPEG and photo.duplicate
+
+
+def test_async_scan_fails_when_the_photo_is_gone(queued, monkeypatch):
+    sessions, storage, received = queued
+
+    async def get(name, byte_range=None):
+        return None
+
+    monkeypatch.setattr(storage, "get", get)
+
+    async def run():
+        response = await _submit(sessions)
+        return await scan.jobs.wait(response["job_id"], timeout=5)
+
+    job = asyncio.run(run())
+    assert job["status"] == "failed"
+    assert "no longer stored" in job["error"]
+    assert received == []
@@ -0,0 +1,97 @@
+"""
+Tests for reading scan uploads in chunks under the size limit.
+Run from backend directory: python -m pytest tests/test_upload_streaming.py
+"""
+import asyncio
+import io
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi import UploadFile
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+from app.db import Base
+from app.services import photo_store
+from app.services.photo_storage import LocalPhotoStorage
+from app.services.photo_store import read_upload, save_upload, UploadTooLarge
+
+PNG = b"\x89PNG\r\n\x1a\n" + bytes(range(256)) * 4
+
+
+class CountingFile(io.BytesIO):
+    """An upload body that records the size of each read"""
+
+    def __init__(self, data: bytes):
+        super().__init__(data)
+        self.reads = []
+
+    def read(self, size=-1):
+        chunk = super().read(size)
+        self.reads.append(len(chunk))
+        return chunk
+
+
+@pytest.fixture
+def chunked(tmp_path, monkeypatch):
+    """64-byte chunks, photos stored under tmp_path and a session factory on a fresh database"""
+    monkeypatch.setattr(photo_store, "CHUNK_SIZE", 64)
+    storage = LocalPhotoStorage(tmp_path / "uploads")
+    monkeypatch.setattr(photo_store, "photo_storage", storage)
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'uploads.db'}")
+
+    async def create():
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+
+    asyncio.run(create())
+    yield async_sessionmaker(engine, expire_on_commit=False), storage
+    asyncio.run(engine.dispose())
+
+
+def test_upload_is_streamed_to_storage_in_chunks(chunked, monkeypatch):
+    sessions, storage = chunked
+    body = CountingFile(PNG)
+    writes = []
+    begin = storage.begin_upload
+
+    async def begin_upload():
+        upload = await begin()
+        original = upload.write
+
+        async def counting_write(chunk):
+            writes.append(len(chunk))
+            await original(chunk)
+
+        upload.write = counting_write
+        return upload
+
+    monkeypatch.setattr(storage, "begin_upload", begin_upload)
+
+    async def run():
+        async with sessions() as db:
+            return await save_upload(UploadFile(file=body, filename="photo.png"), db)
+
+    photo = asyncio.run(run())
+    assert writes == [64] * (len(PNG) // 64) + [len(PNG) % 64]
+    assert max(body.reads) == 64
+    assert photo.size == len(PNG)
+    assert asyncio.run(storage.get(photo.name)) == PNG
+    # Nothing is left in the incoming directory
+    assert list(storage.incoming.iterdir()) == []
+
+
+def test_reading_stops_at_the_first_chunk_over_the_limit(chunked):
+    body = CountingFile(PNG)
+    with pytest.raises(UploadTooLarge, match="larger than"):
+        asyncio.run(read_upload(UploadFile(file=body, filename="photo.png"), max_bytes=200))
+    # 4 chunks of 64 bytes pass 200; the rest of the body is never read
+    assert body.reads == [64, 64, 64, 64]
+
+
+def test_upload_at_the_limit_is_accepted(chunked):
+    data = asyncio.run(read_upload(UploadFile(file=io.BytesIO(PNG), filename="photo.png"), max_bytes=len(PNG)))
+    assert data == PNG
@@ -0,0 +1,84 @@
+"""
+Tests for async weekly advice: immediate rule-based answer, background job, admission.
+Run from backend directory: python -m pytest tests/test_weekly_advice.py
+"""
+import asyncio
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.models import Farm
+from app.routers import ai
+from app.services.admission import AdmissionController
+from app.services.llm_gateway import LLMGateway
+
+
+class FarmSession:
+    """The one query the route makes before _load_advice_inputs"""
+
+    def __init__(self, farm: Farm):
+        self.farm = farm
+
+    async def get(self, model, farm_id):
+        return self.farm if farm_id == self.farm.id else None
+
+
+@pytest.fixture
+def advice(monkeypatch):
+    """Weekly advice with a fresh cache and admission controller; get_ai_advice records its calls"""
+    controller = AdmissionController(max_limit=1, min_limit=1, latency_target=10)
+    monkeypatch.setattr(ai, "admission", controller)
+    monkeypatch.setattr(ai, "cache", ai.AdviceCache())
+    monkeypatch.setattr(LLMGateway, "available", property(lambda self: True))
+    calls = []
+
+    async def load_advice_inputs(farm, db):
+        return None, {}, []
+
+    async def get_ai_advice(farm, latest_status, forecast, tasks, lang):
+        calls.append(farm.id)
+        await asyncio.sleep(0.05)
+        return {"summary": "AI advice", "bullets": ["Scout the west block"]}
+
+    monkeypatch.setattr(ai, "_load_advice_inputs", load_advice_inputs)
+    monkeypatch.setattr(ai, "get_ai_advice", get_ai_advice)
+    return controller, calls, FarmSession(Farm(id="farm-1", lat=19.9, lon=73.8, preferred_language="en"))
+
+
+def test_async_returns_rule_based_advice_then_the_ai_job(advice):
+    controller, calls, db = advice
+
+    async def run():
+        first = await ai.get_weekly_advice(farm_id="farm-1", mode="async", db=db)
+        # A second load while the job runs joins it
+        second = await ai.get_weekly_advice(farm_id="farm-1", mode="async", db=db)
+        job = await ai.jobs.wait(first["job_id"], timeout=5)
+        cached = await ai.get_weekly_advice(farm_id="farm-1", mode="async", db=db)
+        return first, second, job, cached
+
+    first, second, job, cached = asyncio.run(run())
+    assert first["source"] == "rule_based" and first["status"] == "pending"
+    assert second["job_id"] == first["job_id"]
+    assert job["status"] == "done" and job["result"]["source"] == "ai"
+    assert cached["summary"] == "AI advice"
+    assert calls == ["farm-1"]
+    assert controller.in_flight == 0
+
+
+def test_async_job_is_shed_under_backpressure(advice):
+    controller, calls, db = advice
+    controller.admit("chat")
+
+    async def run():
+        response = await ai.get_weekly_advice(farm_id="farm-1", mode="async", db=db)
+        return await ai.jobs.wait(response["job_id"], timeout=5)
+
+    job = asyncio.run(run())
+    assert job["result"]["degraded"] and job["result"]["source"] == "rule_based"
+    assert calls == []
+    # Not cached: once the model catches up, the next load starts an AI job
+    assert ai.cache.get("advice_farm-1_en") is None
+    assert controller.get_stats()["shed"] == {"advice": 1}
@@ -0,0 +1,141 @@
+"""
+Tests for the write-behind insert queue.
+Run from backend directory: python -m pytest tests/test_write_behind.py
+"""
+import asyncio
+import logging
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import Column, String, select
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.orm import declarative_base
+
+from app.db import Base as AppBase
+from app.models import ChatMessage
+from app.routers import chat
+from app.services import write_behind as write_behind_module
+from app.services.write_behind import WriteBehindQueue
+
+Base = declarative_base()
+
+
+class Note(Base):
+    __tablename__ = "notes"
+
+    id = Column(String, primary_key=True)
+    text = Column(String, nullable=False)
+
+
+async def _notes_db(tmp_path, monkeypatch, metadata=Base.metadata):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'wb.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(metadata.create_all)
+    sessions = async_sessionmaker(engine, expire_on_commit=False)
+    monkeypatch.setattr(write_behind_module, "AsyncSessionLocal", sessions)
+    return engine, sessions
+
+
+class FlakySessions:
+    """A session factory that fails its first `failures` calls, like a database that is briefly down"""
+
+    def __init__(self, sessions, failures: int):
+        self.sessions = sessions
+        self.failures = failures
+
+    def __call__(self):
+        if self.failures > 0:
+            self.failures -= 1
+            raise ConnectionError("database is restarting")
+        return self.sessions()
+
+
+def test_failing_batch_keeps_good_rows(tmp_path, monkeypatch):
+    async def run():
+        engine, sessions = await _notes_db(tmp_path, monkeypatch)
+        async with sessions() as db:
+            db.add(Note(id="taken", text="already there"))
+            await db.commit()
+
+        queue = WriteBehindQueue(enabled=True, batch_size=100, interval=1, max_attempts=2)
+        queue.enqueue(Note, [{"id": "a", "text": "one"}, {"id": "taken", "text": "clash"}, {"id": "b", "text": "two"}])
+        await queue.flush()
+        # First failure: rows kept for the next flush
+        assert len(queue.pending) == 3
+        await queue.flush()
+
+        async with sessions() as db:
+            ids = set((await db.execute(select(Note.id))).scalars())
+        await engine.dispose()
+        return queue, ids
+
+    queue, ids = asyncio.run(run())
+    assert ids == {"a", "b", "taken"}
+    assert queue.pending == []
+    assert [row["id"] for model, row in queue.dead_letter] == ["taken"]
+    assert queue.get_stats()["written"] == 2
+
+
+def test_close_retries_until_the_database_is_back(tmp_path, monkeypatch):
+    async def run():
+        engine, sessions = await _notes_db(tmp_path, monkeypatch)
+        # More failures than flush() alone would retry before dead-lettering
+        monkeypatch.setattr(write_behind_module, "AsyncSessionLocal", FlakySessions(sessions, failures=4))
+        queue = WriteBehindQueue(enabled=True, batch_size=100, interval=1, max_attempts=2, close_timeout=5)
+        queue.enqueue(Note, [{"id": "a", "text": "one"}, {"id": "b", "text": "two"}])
+        await queue.close()
+        async with sessions() as db:
+            ids = set((await db.execute(select(Note.id))).scalars())
+        await engine.dispose()
+        return queue, ids
+
+    queue, ids = asyncio.run(run())
+    assert ids == {"a", "b"}
+    assert queue.pending == [] and len(queue.dead_letter) == 0
+    assert queue.get_stats()["batches"] == 1
+
+
+def test_close_writes_rows_one_by_one_after_the_deadline(tmp_path, monkeypatch, caplog):
+    async def run():
+        engine, sessions = await _notes_db(tmp_path, monkeypatch)
+        async with sessions() as db:
+            db.add(Note(id="taken", text="already there"))
+            await db.commit()
+        queue = WriteBehindQueue(enabled=True, batch_size=100, interval=1, close_timeout=0)
+        queue.enqueue(Note, [{"id": "a", "text": "one"}, {"id": "taken", "text": "clash"}, {"id": "b", "text": "two"}])
+        await queue.close()
+        async with sessions() as db:
+            ids = set((await db.execute(select(Note.id))).scalars())
+        await engine.dispose()
+        return queue, ids
+
+    with caplog.at_level(logging.ERROR, logger=write_behind_module.__name__):
+        queue, ids = asyncio.run(run())
+    assert ids == {"a", "b", "taken"}
+    assert [row["id"] for model, row in queue.dead_letter] == ["taken"]
+    assert "Dropped 1 rows" in caplog.text and "taken" in caplog.text
+
+
+def test_chat_turn_writes_user_message_inline(tmp_path, monkeypatch):
+    queue = WriteBehindQueue(enabled=True, batch_size=100, interval=1)
+    monkeypatch.setattr(chat, "write_behind", queue)
+    monkeypatch.setattr(chat.chat_memory, "schedule_refresh", lambda session_id: None)
+
+    async def run():
+        engine, sessions = await _notes_db(tmp_path, monkeypatch, AppBase.metadata)
+        async with sessions() as db:
+            rows = chat.new_turn_rows("farm-1", "session-1", "why are my leaves yellow")
+            await chat.save_chat_turn(db, rows, "farm-1", "session-1", "Check for nitrogen deficiency")
+        async with sessions() as db:
+            before = (await db.execute(select(ChatMessage.role))).scalars().all()
+        await queue.flush()
+        async with sessions() as db:
+            after = (await db.execute(select(ChatMessage.role).order_by(ChatMessage.created_at))).scalars().all()
+        await engine.dispose()
+        return before, after
+
+    before, after = asyncio.run(run())
+    assert before == ["user"]
+    assert after == ["user", "assistant"]